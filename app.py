@@ -3,9 +3,9 @@ import eventlet
 eventlet.monkey_patch()
 
 from flask import Flask, render_template, request, redirect, url_for, flash, session, g, jsonify
-from flask_socketio import SocketIO, emit, disconnect
+from flask_socketio import SocketIO, emit, disconnect, join_room, leave_room
+from eventlet import tpool
 import yfinance as yf
-import plotly.graph_objects as go
 import math
 import json
 import requests
@@ -15,8 +15,19 @@ from datetime import datetime, timedelta
 from backend.accounts_to_database import AccountEndpoint
 from backend.utilities import Utilities
 from backend.trading import TradingEndpoint
+from backend.order_queue import OrderQueue
 from backend.leaderboard import LeaderboardEndpoint
 from backend.depot_system import DepotEndpoint
+from backend.quote_service import QuoteService
+from backend.quote_broadcaster import QuoteBroadcaster, LIVE_NAMESPACE
+from backend.user_events import UserEvents, UserEventRelay
+from backend.connection_pool import ConnectionPool
+from backend.ticker_validity import TickerValidity
+from backend.symbol_index import SymbolIndex
+from backend.fundamentals import FundamentalsCache, YFINANCE_TIMEOUT_SECONDS
+from backend.ohlc_store import OhlcStore
+from backend.chart_data import ohlc_payload, line_payload
+from backend.downsampling import max_points_for_width, PIXELS_PER_CANDLE, PIXELS_PER_LINE_POINT
 from backend.tokens import TokenEndpoint
 from backend.user_settings import Settings
 from backend.tichu_to_database import handle_game_move, handle_player_connect, handle_player_disconnect
@@ -63,30 +74,31 @@ def __init__():
 
 __init__()
 
+db_pool = ConnectionPool(DATABASE_FILE)
+
 def get_db() -> sqlite3.Connection:
     db = getattr(g, '_database', None)
     if db is None:
-        db = g._database = sqlite3.connect(DATABASE_FILE)
+        db = g._database = db_pool.acquire()
     return db
 
 @app.teardown_appcontext
 def close_connection(exception):
-    """Schließt die DB-Verbindung. Committet bei Erfolg, macht Rollback bei Fehler."""
-    db = getattr(g, '_database', None)
+    """Gibt die DB-Verbindung an den Pool zurück. Committet bei Erfolg, macht Rollback bei Fehler."""
+    db = g.pop('_database', None)
     if db is not None:
-        if exception is None:
-            db.commit()  # Bei Erfolg: Änderungen speichern.
-        else:
-            db.rollback() # Bei Fehler: Änderungen verwerfen.
-        db.close() # Verbindung immer schließen.
+        db_pool.release(db, commit=exception is None)
 
 @app.before_request
 def load_user_settings():
-    """Lädt die Benutzereinstellungen vor jeder Anfrage, wenn der Benutzer eingeloggt ist."""
+    """
+    Lädt die Benutzereinstellungen vor jeder Anfrage, wenn der Benutzer eingeloggt ist.
+    Sie kommen aus dem Cache des Workers, eine DB-Verbindung wird nur bei einem Fehltreffer geholt.
+    """
     g.user_settings = None
     if 'user_id' in session:
-        conn = get_db()
-        g.user_settings = Settings.get_settings(conn, session['user_id'])
+        g.user_settings = Settings.get_cached_settings(
+            get_db, session['user_id'], session.get('settings_version', 0))
 
 # --- eigener Decorator ---
 def login_required(f):
@@ -126,6 +138,8 @@ AVAILABLE_QUALITIES = [
 ]
 #-//-
 
+MAX_SEARCH_QUERY_LENGTH = 64  # Längere Eingaben sind keine sinnvollen Aktiennamen
+
 def do_login(conn, identifier:str=None , password:str=None, instant_login_result:dict=None) -> bool:
     """
         Diese Funktion meldet den Benutzer in der Session an. Entweder über AccountEndpoint oder per user_id.
@@ -324,9 +338,9 @@ def reset_password_enter_token_page():
 def get_stock_basic_info_yfinance(ticker_symbol):
     try:
         stock = yf.Ticker(ticker_symbol)
-        info = stock.info
+        info = FundamentalsCache.get_info(ticker_symbol, conn=get_db())
         if not info or (info.get('longName') is None and info.get('shortName') is None and info.get('symbol') is None):
-            quick_hist = stock.history(period="1d")
+            quick_hist = tpool.execute(stock.history, period="1d", timeout=YFINANCE_TIMEOUT_SECONDS)
             if quick_hist.empty:
                 return None, f"Keine Informationen für Ticker '{ticker_symbol}' gefunden (yfinance). Ist der Ticker korrekt?"
             company_name = info.get('symbol', ticker_symbol)
@@ -367,9 +381,9 @@ def get_stock_detailed_data(ticker_symbol) -> dict:
     stock_data = {'ticker': ticker_symbol, 'error': None}
     try:
         stock = yf.Ticker(ticker_symbol)
-        info = stock.info
+        info = FundamentalsCache.get_info(ticker_symbol, conn=get_db())
         if not info or (info.get('longName') is None and info.get('shortName') is None and info.get('symbol') is None):
-            quick_hist = stock.history(period="1d")
+            quick_hist = tpool.execute(stock.history, period="1d", timeout=YFINANCE_TIMEOUT_SECONDS)
             if quick_hist.empty:
                 stock_data['error'] = f"Keine detaillierten Informationen für Ticker '{ticker_symbol}' gefunden."
                 return stock_data
@@ -378,22 +392,8 @@ def get_stock_detailed_data(ticker_symbol) -> dict:
             stock_data['name'] = info.get('longName', info.get('shortName', ticker_symbol))
 
         stock_data['info'] = info
-        try:
-            stock_data['financials_html'] = stock.financials.to_html(classes='table table-sm table-striped table-hover', border=0) if not stock.financials.empty else "Keine Finanzdaten verfügbar."
-        except Exception as e:
-            print(f"Fehler beim Laden der Finanzdaten für {ticker_symbol}: {e}")
-            stock_data['financials_html'] = "Finanzdaten konnten nicht geladen werden."
-
-        try:
-            stock_data['major_holders_html'] = stock.major_holders.to_html(classes='table table-sm table-striped table-hover', border=0) if stock.major_holders is not None and not stock.major_holders.empty else "Keine Daten zu Haupteignern verfügbar."
-        except Exception as e:
-            print(f"Fehler beim Laden der Haupteigner für {ticker_symbol}: {e}")
-            stock_data['major_holders_html'] = "Daten zu Haupteignern konnten nicht geladen werden."
-        try:
-            stock_data['recommendations_html'] = stock.recommendations.tail(5).to_html(classes='table table-sm table-striped table-hover', border=0) if stock.recommendations is not None and not stock.recommendations.empty else "Keine Empfehlungen verfügbar."
-        except Exception as e:
-            print(f"Fehler beim Laden der Empfehlungen für {ticker_symbol}: {e}")
-            stock_data['recommendations_html'] = "Empfehlungen konnten nicht geladen werden."
+        # Finanzdaten, Haupteigner und Empfehlungen ändern sich selten -> fertiges HTML aus dem Cache
+        stock_data.update(get_or_generate_stock_fragments(get_db(), ticker_symbol))
 
         quote_info = {
             "Preis": info.get("currentPrice", info.get("regularMarketPrice", "N/A")),
@@ -465,248 +465,154 @@ def determine_actual_interval_and_period(selected_period, selected_quality):
                            f"auf '{period_display_actual}' angepasst, um Intervall '{actual_interval}' zu unterstützen.")
     return actual_period, actual_interval, adjustment_note
 
-def generate_stock_plotly_chart(ticker_symbol, period="1y", interval="1d", quality_note=None, remove_gaps=True, dark_mode=False, show_axis_titles=True, chart_height=None, margin_l=50, margin_r=20, margin_t=80, margin_b=50):
-    chart_html = None
-    error_msg = quality_note if quality_note else None
-    company_name = ticker_symbol
+def describe_chart_error(ticker_symbol, company_name, period, interval, error: Exception) -> str:
+    """Übersetzt einen Fehler beim Laden der Kursdaten in eine verständliche Meldung."""
+    exception_str = str(error)
+    display_ticker_name = company_name if company_name and company_name != ticker_symbol else ticker_symbol
+    current_err_intro = f"Fehler beim Generieren des Charts für '{display_ticker_name}' (Periode: {period}, Intervall: {interval}): "
+    if "HTTP Error 404" in exception_str:
+        return f"{current_err_intro}Daten nicht gefunden (HTTP 404). Wahrscheinlich ist diese Aktie nicht bei yfinance"
+    elif "No data found for this date range" in exception_str or "yfinance failed to decrypt Yahoo data" in exception_str:
+        return f"{current_err_intro}Keine Daten für diese Auswahl. Die Kombination ist evtl. ungültig oder der Ticker nicht verfügbar."
+    elif "pattern_forms:" in exception_str and "No pattern found for" in exception_str:
+        return f"{current_err_intro}Das Tickersymbol '{ticker_symbol}' scheint ungültig oder nicht unterstützt zu sein."
+    return f"{current_err_intro}{exception_str}"
+
+def get_company_name(conn, ticker_symbol) -> str:
+    """Name des Unternehmens aus den gespeicherten Stammdaten, sonst der Ticker."""
     try:
-        stock = yf.Ticker(ticker_symbol)
-        info_temp = stock.info
-        if info_temp and (info_temp.get('longName') or info_temp.get('shortName')):
-            company_name = info_temp.get('longName', info_temp.get('shortName', ticker_symbol))
-        elif info_temp and info_temp.get('market') == 'cccrypto_market':
-            company_name = info_temp.get('name', company_name)
-
-        hist_data = stock.history(period=period, interval=interval, auto_adjust=True, prepost=False)
-
-        if hist_data.empty:
-            current_err = f"Keine Kursdaten für '{ticker_symbol}' mit Periode '{period}' und Intervall '{interval}' gefunden."
-            error_msg = (error_msg + " | " if error_msg else "") + current_err
-        else:
-            font_color = '#cdd3da' if dark_mode else '#1c1e21'
-            grid_color = 'rgba(255, 255, 255, 0.1)' if dark_mode else 'rgba(0, 0, 0, 0.1)'
-
-            # Farben für Candlesticks definieren
-            increasing_color:str = '#1a8754'
-            decreasing_color:str = '#FF4136' if dark_mode else '#dc3545'
-
-            fig = go.Figure()
-            fig.add_trace(go.Candlestick(x=hist_data.index,
-                                         open=hist_data['Open'], high=hist_data['High'],
-                                         low=hist_data['Low'], close=hist_data['Close'],
-                                         name=f'{ticker_symbol}',
-                                         increasing_line_color=increasing_color,
-                                         decreasing_line_color=decreasing_color
-                            )
-            )
-
-            period_display = next((p[1] for p in AVAILABLE_PERIODS if p[0] == period), period)
-            interval_map_for_display = {"1m": "1 Min", "2m": "2 Min", "5m": "5 Min", "15m": "15 Min",
-                                        "30m": "30 Min", "60m": "1 Std", "1h": "1 Std", "90m": "90 Min",
-                                        "1d": "Täglich", "1wk": "Wöchentlich", "1mo": "Monatlich",
-                                        "3mo": "Quartalsweise"}
-            interval_display = interval_map_for_display.get(interval, interval)
-
-            title_text = f'Kurs: {company_name} ({ticker_symbol})<br><span style="font-size:0.8em;">Zeitraum: {period_display}, Auflösung: {interval_display}</span>' if show_axis_titles else ''
-
-            yaxis_settings = {
-                "gridcolor": grid_color, "linecolor": grid_color,
-                "zeroline": False, "showticklabels": True
-            }
-            if not show_axis_titles:  # Dies ist ein Widget
-                yaxis_settings["automargin"] = True
-
-            fig.update_layout(
-                title=title_text,
-                xaxis_title='Datum / Uhrzeit' if show_axis_titles else '',
-                yaxis_title='Preis' if show_axis_titles else '',
-                xaxis_rangeslider_visible=False,
-                margin=dict(l=margin_l, r=margin_r, t=margin_t, b=margin_b),
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                font=dict(color=font_color),
-                xaxis=dict(gridcolor=grid_color, linecolor=grid_color, zeroline=False, showticklabels=show_axis_titles),
-                yaxis=yaxis_settings,
-                height=chart_height,
-                showlegend=False
-            )
-
-            if remove_gaps:
-                if interval in ["1d", "1wk", "1mo", "3mo"]:
-                    fig.update_xaxes(rangebreaks=[dict(bounds=["sat", "mon"])])
-                elif 'm' in interval or 'h' in interval:
-                    fig.update_xaxes(rangebreaks=[
-                        dict(bounds=["sat", "mon"]),
-                        dict(pattern="hour", bounds=[16, 9.5])
-                    ])
-
-            plot_config = {'displayModeBar': False}
-            if not show_axis_titles:  # Dies ist ein Widget
-                plot_config['staticPlot'] = True
-            chart_html = fig.to_html(full_html=False, include_plotlyjs='cdn', config=plot_config)
+        info = FundamentalsCache.get_info(ticker_symbol, conn=conn)
+    except Exception:
+        return ticker_symbol
+    if info.get('longName') or info.get('shortName'):
+        return info.get('longName', info.get('shortName', ticker_symbol))
+    elif info.get('market') == 'cccrypto_market':
+        return info.get('name', ticker_symbol)
+    return ticker_symbol
+
+def is_profitable(history_summary: dict) -> bool:
+    """Ob der neueste Wert über dem ältesten liegt (history_summary siehe get_portfolio_summary)."""
+    return history_summary['newest_net_worth'] > history_summary['oldest_net_worth']
+
+WIDGET_CHART_PERIOD = "1y"
+WIDGET_CHART_INTERVAL = "1d"
+WIDGET_CHART_WIDTH = 400  # px, die Widgets auf der Suchseite sind schmal
+
+def get_or_generate_widget_chart(conn, ticker: str, force_refresh: bool = False) -> tuple[dict | None, str | None]:
+    """
+    Prüft zuerst, ob die Chart-Daten im Cache vorhanden und nicht älter als 24h sind.
+    Wenn nicht, werden sie aus dem Kerzen-Speicher erzeugt, gespeichert und zurückgegeben.
+    Gespeichert werden nur die Daten (einmal pro Ticker), die Farben für hell/dunkel setzt der Browser.
+    Gibt ein Tupel aus (chart_data, company_name) zurück.
+    """
+    cursor = conn.cursor()
+    twenty_four_hours_ago = (datetime.now() - timedelta(hours=24)).strftime('%Y-%m-%d %H:%M:%S')
 
+    # 1. Cache prüfen
+    if not force_refresh:
+        cursor.execute("""
+            SELECT chart_data, company_name FROM cached_chart_data
+            WHERE ticker = ? AND last_updated > ?""", (ticker, twenty_four_hours_ago))
+        result = cursor.fetchone()
+        if result:
+            return json.loads(result[0]), result[1]
+
+    # 2. Wenn nicht im Cache: Erzeugen, speichern und zurückgeben
+    company_name = get_company_name(conn, ticker)
+    try:
+        hist_data = OhlcStore.get_history(conn, ticker, period=WIDGET_CHART_PERIOD, interval=WIDGET_CHART_INTERVAL)
     except Exception as e:
-        exception_str = str(e)
-        display_ticker_name = company_name if company_name and company_name != ticker_symbol else ticker_symbol
-        current_err_intro = f"Fehler beim Generieren des Charts für '{display_ticker_name}' (Periode: {period}, Intervall: {interval}): "
-        if "HTTP Error 404" in exception_str:
-            current_err = f"{current_err_intro}Daten nicht gefunden (HTTP 404). Wahrscheinlich ist diese Aktie nicht bei yfinance"
-        elif "No data found for this date range" in exception_str or "yfinance failed to decrypt Yahoo data" in exception_str:
-            current_err = f"{current_err_intro}Keine Daten für diese Auswahl. Die Kombination ist evtl. ungültig oder der Ticker nicht verfügbar."
-        elif "pattern_forms:" in exception_str and "No pattern found for" in exception_str:
-            current_err = f"{current_err_intro}Das Tickersymbol '{ticker_symbol}' scheint ungültig oder nicht unterstützt zu sein."
-        else:
-            current_err = f"{current_err_intro}{exception_str}"
-        error_msg = (error_msg + " | " if error_msg and error_msg not in current_err else "") + current_err
-
-    return chart_html, error_msg, company_name
+        error_msg = describe_chart_error(ticker, company_name, WIDGET_CHART_PERIOD, WIDGET_CHART_INTERVAL, e)
+        print(f"[Chart-Gen] Fehler beim Generieren des Charts für {ticker}: {error_msg}")
+        return None, None
+    if hist_data.empty:
+        print(f"[Chart-Gen] Keine Kursdaten für {ticker} gefunden.")
+        return None, None
 
-def yfinance_ticker_is_valid(ticker_symbol: str) -> bool:
+    chart_data = {"ticker": ticker, "name": company_name, "interval": WIDGET_CHART_INTERVAL, **ohlc_payload(hist_data, max_points_for_width(WIDGET_CHART_WIDTH, PIXELS_PER_CANDLE))}
+    cursor.execute("""
+        INSERT OR REPLACE INTO cached_chart_data (ticker, chart_data, company_name, last_updated)
+        VALUES (?, ?, ?, ?)""", (ticker, json.dumps(chart_data), company_name, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+    # conn.commit() # Entfällt, da @app.teardown_appcontext dies übernimmt
+    return chart_data, company_name
+
+# Abschnitt -> (Schlüssel in stock_data, Text ohne Daten, Text bei Fehler)
+STOCK_FRAGMENT_SECTIONS = {
+    'financials': ('financials_html', "Keine Finanzdaten verfügbar.", "Finanzdaten konnten nicht geladen werden."),
+    'major_holders': ('major_holders_html', "Keine Daten zu Haupteignern verfügbar.", "Daten zu Haupteignern konnten nicht geladen werden."),
+    'recommendations': ('recommendations_html', "Keine Empfehlungen verfügbar.", "Empfehlungen konnten nicht geladen werden."),
+}
+STOCK_FRAGMENT_TTL = timedelta(hours=24)
+
+def render_stock_fragment(stock, section: str) -> str | None:
     """
-    Überprüft zuverlässiger, ob ein Ticker auf yfinance gültig ist und Marktdaten hat.
+    Holt die Daten eines Abschnitts von yfinance und gibt sie als HTML-Tabelle zurück (None = leer).
+    Blockiert im C-Code von yfinance und wird deshalb über tpool aufgerufen.
     """
-    if not ticker_symbol:
-        return False
-    try:
-        stock = yf.Ticker(ticker_symbol)
-        info = stock.info
-
-        # Primärer Check: Ist ein Preis verfügbar? Das ist die wichtigste Bedingung.
-        if info.get('regularMarketPrice') is not None or info.get('currentPrice') is not None:
-            return True
-
-        # Sekundärer Check: Wenn .info keine Preisdaten liefert (z.B. bei Indizes),
-        # prüfen, ob zumindest historische Daten vorhanden sind.
-        if 'longName' in info or 'shortName' in info:
-            if not stock.history(period="5d", interval="1d").empty:
-                return True
-
-        return False
-    except Exception:
-        # Jede Exception (z.B. HTTP-Fehler bei ungültigen Tickern) bedeutet,
-        # dass der Ticker nicht gültig ist.
-        return False
-
-def is_profitable(history_data: list[dict]) -> bool:
-    net_worths = [item['net_worth'] for item in history_data]
-    start_worth = net_worths[0]
-    end_worth = net_worths[-1]
-    return end_worth > start_worth
-
-def create_portfolio_graph(history_data: list[dict], dark_mode: bool = False, line_strength:int=4) -> str | None:
-    if not history_data or len(history_data) < 2:
-        return None
-
-    # Daten sind bereits nach Datum sortiert (neueste zuerst), für die Berechnung umkehren
-    history_data.reverse()
-    dates = [datetime.fromisoformat(item['date']) for item in history_data]
-    net_worths = [item['net_worth'] for item in history_data]
-
-    # Startwert ist der erste Wert in der (jetzt chronologischen) Liste
-    start_worth = net_worths[0]
-    percent_changes = [((val / start_worth) - 1) * 100 if start_worth != 0 else 0 for val in net_worths]
-
-    is_gain = net_worths[-1] > start_worth
-    bg_color = 'rgba(0,0,0,0)'
-
-    if dark_mode:
-        font_color = '#D3D3D3'
-        line_color = '#1a8754' if is_gain else '#FF4136'
-        grid_color = 'rgba(255, 255, 255, 0.1)'
+    if section == 'financials':
+        data = stock.financials
+    elif section == 'major_holders':
+        data = stock.major_holders
     else:
-        font_color = '#444'
-        line_color = '#1a8754' if is_gain else '#dc3545'
-        grid_color = 'rgba(230, 230, 230, 0.7)'
-
-    fig = go.Figure()
-    # Haupt-Trace für den Depotwert (linke Achse)
-    fig.add_trace(go.Scatter(
-        x=dates, y=net_worths, mode='lines',
-        line=dict(color=line_color, width=line_strength),
-        hoverinfo='y+x', name='Depotwert'
-    ))
-    # Unsichtbarer Trace für die Prozentwerte auf der zweiten Y-Achse
-    # Dies dient nur dazu, die Hover-Informationen zu steuern
-    fig.add_trace(go.Scatter(
-        x=dates, y=percent_changes, yaxis='y2',
-        mode='lines', line=dict(width=0), # Linie unsichtbar machen
-        hoverinfo='skip' # Nicht im Hover anzeigen
-    ))
-
-    fig.update_layout(
-        height=250,
-        margin=dict(l=50, r=45, t=5, b=20),
-        paper_bgcolor=bg_color,
-        plot_bgcolor=bg_color,
-        font=dict(color=font_color),
-        showlegend=False,
-        xaxis=dict(
-            showgrid=False,
-            tickvals=[dates[0], dates[-1]],
-            ticktext=[dates[0].strftime('%d. %b'), dates[-1].strftime('%d. %b')],
-            zeroline=False,
-            fixedrange=True  # Verschieben/Zoomen der X-Achse deaktivieren
-        ),
-        yaxis=dict(
-            title='', tickprefix='€', gridcolor=grid_color, zeroline=False,
-            fixedrange=True  # Verschieben/Zoomen der Y-Achse deaktivieren
-        ),
-        yaxis2=dict(
-            title="", overlaying='y', side='right', showgrid=False,
-            ticksuffix='%', tickfont=dict(color=font_color), zeroline=False,
-            fixedrange=True, # Verschieben/Zoomen der zweiten Y-Achse deaktivieren
-            showticklabels=True # Ticks auf der rechten Achse anzeigen
-        ),
-        # Hover-Modus so einstellen, dass beide Achsen angezeigt werden
-        hovermode='x unified'
-    )
-    return fig.to_html(full_html=False, include_plotlyjs='cdn', config={'displayModeBar': False})
+        data = stock.recommendations
+        data = data.tail(5) if data is not None else None
+    if data is None or data.empty:
+        return None
+    return data.to_html(classes='table table-sm table-striped table-hover', border=0)
 
-def get_or_generate_widget_chart(conn, ticker: str, dark_mode: bool) -> tuple[str | None, str | None]:
+def get_or_generate_stock_fragments(conn, ticker: str, force_refresh: bool = False) -> dict[str, str]:
     """
-    Prüft zuerst, ob der Chart im Cache vorhanden und nicht älter als 24h ist.
-    Wenn kein gültiger Chart vorhanden ist, wird er generiert, gespeichert und zurückgegeben.
-    Gibt ein Tupel aus (chart_html, company_name) zurück.
+    Gibt das HTML für Finanzdaten, Haupteigner und Empfehlungen zurück (Schlüssel wie in stock_data).
+    Abschnitte, die jünger als 24h im Cache liegen, werden ohne Netzwerkzugriff geliefert.
+    Fehler werden nicht gespeichert, damit der nächste Aufruf es erneut versucht.
     """
     cursor = conn.cursor()
-    twenty_four_hours_ago = datetime.now() - timedelta(hours=24)
-    dark_mode_int = int(dark_mode) if dark_mode is not None else 0
+    fragments = {}
+    if not force_refresh:
+        oldest_allowed = (datetime.now() - STOCK_FRAGMENT_TTL).strftime('%Y-%m-%d %H:%M:%S')
+        cursor.execute("SELECT section, html FROM cached_fragments WHERE ticker = ? AND last_updated > ?",
+                       (ticker, oldest_allowed))
+        fragments = dict(cursor.fetchall())
+
+    result = {}
+    stock = None
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    for section, (key, empty_text, error_text) in STOCK_FRAGMENT_SECTIONS.items():
+        if section in fragments:
+            result[key] = fragments[section]
+            continue
+        if stock is None:
+            stock = yf.Ticker(ticker)
+        try:
+            html = tpool.execute(render_stock_fragment, stock, section) or empty_text
+        except Exception as e:
+            print(f"Fehler beim Laden von '{section}' für {ticker}: {e}")
+            result[key] = error_text
+            continue
+        cursor.execute("""
+            INSERT OR REPLACE INTO cached_fragments (ticker, section, html, last_updated)
+            VALUES (?, ?, ?, ?)""", (ticker, section, html, now))
+        result[key] = html
+    return result
 
-    # 1. Cache prüfen
-    cursor.execute("""
-        SELECT chart_html, company_name FROM cached_charts 
-        WHERE ticker = ? AND dark_mode = ? AND last_updated > ?""", (ticker, dark_mode_int, twenty_four_hours_ago))
-    result = cursor.fetchone()
-    if result:
-        return result[0], result[1]
-
-    # 2. Wenn nicht im Cache: Generieren, speichern und zurückgeben
-    chart_html, error_msg, company_name = generate_stock_plotly_chart(
-        ticker_symbol=ticker,
-        period="1y",
-        interval="1d",
-        remove_gaps=True,
-        dark_mode=dark_mode,
-        show_axis_titles=False,
-        chart_height=150,
-        margin_l=0, margin_r=30, margin_t=5, margin_b=5
-    )
+def update_stock_fragments_cache(conn):
+    """
+    Täglicher Job: Aktualisiert die Tabellen der beliebten Aktien und löscht Einträge,
+    die seit einer Woche nicht mehr erneuert wurden (also auch nicht aufgerufen).
+    """
+    popular_stocks = DepotEndpoint.get_most_popular_stocks(conn)
+    for ticker in (popular_stocks or {}).keys():
+        get_or_generate_stock_fragments(conn, ticker, force_refresh=True)
 
-    if chart_html and not error_msg:
-        cursor.execute("""
-            INSERT OR REPLACE INTO cached_charts (ticker, dark_mode, chart_html, company_name, last_updated)
-            VALUES (?, ?, ?, ?, ?)""", (ticker, dark_mode_int, chart_html, company_name, datetime.now()))
-        # conn.commit() # Entfällt, da @app.teardown_appcontext dies übernimmt
-        return chart_html, company_name
-    elif error_msg:
-        print(f"[Chart-Gen] Fehler beim Generieren des Charts für {ticker}: {error_msg}")
-        return None, None
-    return None, None
+    one_week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S')
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM cached_fragments WHERE last_updated < ?", (one_week_ago,))
+    print(f"[Cache-Job] {cursor.rowcount} veraltete Tabellen-Fragmente gelöscht.")
 
 def update_popular_charts_cache(conn):
     """
-    Holt die beliebtesten Aktien und aktualisiert proaktiv deren Charts im Cache
-    für beide Modi (hell und dunkel).
+    Holt die beliebtesten Aktien und aktualisiert proaktiv deren Chart-Daten im Cache
+    (einmal pro Ticker, für hellen und dunklen Modus gemeinsam).
     """
     print("[Cache-Job] Starte proaktives Update der beliebten Charts...")
     popular_stocks = DepotEndpoint.get_most_popular_stocks(conn)
@@ -716,9 +622,7 @@ def update_popular_charts_cache(conn):
 
     for ticker in popular_stocks.keys():
         print(f"[Cache-Job] Aktualisiere Cache für Ticker: {ticker}")
-        # Cache für beide Modi füllen
-        get_or_generate_widget_chart(conn, ticker, dark_mode=True)
-        get_or_generate_widget_chart(conn, ticker, dark_mode=False)
+        get_or_generate_widget_chart(conn, ticker, force_refresh=True)
     print("[Cache-Job] Proaktives Update abgeschlossen.")
 
 #<//-------KI-------//>
@@ -744,71 +648,112 @@ def dashboard_page():
         flash("Fehler: Dein Benutzerkonto konnte nicht gefunden werden.", 'error')
         return redirect(url_for('logout'))
 
-    # Platzhalter-Daten für den Graphen
-    history_data = LeaderboardEndpoint.fetch_and_group_leaderboard(conn)
-
-    if not session.get('user_id') in history_data.keys():
-        LeaderboardEndpoint.insert_current_net_worth_for_user(conn, user_id)
-        history_data = LeaderboardEndpoint.fetch_and_group_leaderboard(conn)
-
-    # Sicherer Zugriff auf die Benutzer-spezifischen Daten mit Fallback, falls keine Historie vorhanden.
-    history_data = history_data.get(session.get('user_id'), [
-        {"date": datetime.now().strftime('%Y-%m-%d %H:%M:%S'), "net_worth": 50000.0},
-        {"date": datetime.now().strftime('%Y-%m-%d %H:%M:%S'), "net_worth": 50000.0},
-    ])
-
-    # NEU: Dark-Mode-Status aus dem globalen 'g'-Objekt holen
-    dark_mode_status = g.user_settings and g.user_settings.get('dark_mode') == 1
-
-    graph_html = create_portfolio_graph(history_data, dark_mode=dark_mode_status)
+    history_summary = get_portfolio_summary(conn, user_id)
 
     # Die `conn` wird hoffentlich durch @app.teardown_appcontext geschlossen
     return render_template(
         'depot.html',
         depot=depot_data,
-        graph_html=graph_html,
-        is_profitable=is_profitable(history_data)
+        depot_etag=DepotEndpoint.valuation_etag(depot_data),
+        # Ausgangspunkt für die Änderungen, die /api/refresh-depot meldet
+        depot_snapshot=DepotEndpoint.valuation_snapshot(depot_data),
+        # Die Datenreihe holt der Browser mit seiner Breite über /api/portfolio-history
+        show_graph=history_summary['entries'] >= 2,
+        is_profitable=is_profitable(history_summary)
     )
 
 
+def get_portfolio_summary(conn, user_id: int) -> dict:
+    """
+    Anzahl (bis 2), ältester und neuester Wert der Depot-Historie, ohne die ganze Historie zu laden.
+    Erster Eintrag und Platzhalter wie bei get_portfolio_history.
+    """
+    summary = LeaderboardEndpoint.get_user_history_summary(conn, user_id)
+
+    if not summary['entries']:
+        LeaderboardEndpoint.insert_current_net_worth_for_user(conn, user_id)
+        summary = LeaderboardEndpoint.get_user_history_summary(conn, user_id)
+
+    # Fallback, falls keine Historie vorhanden (entspricht den zwei Platzhaltern von get_portfolio_history).
+    if not summary['entries']:
+        summary = {"entries": 2, "oldest_net_worth": 50000.0, "newest_net_worth": 50000.0}
+    return summary
+
+
+def get_portfolio_history(conn, user_id: int) -> list[dict]:
+    """Die Depot-Historie eines Benutzers (neueste zuerst), bei Bedarf mit erstem Eintrag oder Platzhaltern."""
+    history_data = LeaderboardEndpoint.get_user_history(conn, user_id)
+
+    if not history_data:
+        LeaderboardEndpoint.insert_current_net_worth_for_user(conn, user_id)
+        history_data = LeaderboardEndpoint.get_user_history(conn, user_id)
+
+    # Fallback, falls keine Historie vorhanden.
+    if not history_data:
+        history_data = [
+            {"date": datetime.now().strftime('%Y-%m-%d %H:%M:%S'), "net_worth": 50000.0},
+            {"date": datetime.now().strftime('%Y-%m-%d %H:%M:%S'), "net_worth": 50000.0},
+        ]
+    return history_data
+
+
+@app.route('/api/portfolio-history')
+@login_required
+def api_portfolio_history():
+    """
+    Depot-Verlauf als kompakte Spalten (siehe backend/chart_data.py), gezeichnet wird im Browser.
+    Mit ?width= (Breite des Graphen in Pixeln) wird die Reihe per LTTB auf die darstellbaren Punkte verkleinert.
+    """
+    history_data = get_portfolio_history(get_db(), session['user_id'])
+    max_points = max_points_for_width(request.args.get('width', type=int), PIXELS_PER_LINE_POINT)
+    response = jsonify({"success": True, **line_payload(history_data, max_points)})
+    response.headers['Cache-Control'] = 'private, max-age=60'
+    return response
+
+
 @app.route('/search')
 def search_stock_page():
     query = request.args.get('keywords', '').strip()
     results, error = None, None
-    dark_mode_status = g.user_settings and g.user_settings.get('dark_mode')
 
     conn = get_db()
 
     #Die drei Aktien, in denen gerade alle Nutzer zusammen am meisten Geld investiert haben
     popular_stocks = DepotEndpoint.get_most_popular_stocks(conn)
 
+    popular_stocks_charts = {}
     if popular_stocks:
-        chart_period = "1y"
-        period_display_text = next((p[1] for p in AVAILABLE_PERIODS if p[0] == chart_period), chart_period)
+        period_display_text = next((p[1] for p in AVAILABLE_PERIODS if p[0] == WIDGET_CHART_PERIOD), WIDGET_CHART_PERIOD)
 
-        popular_stocks_charts = {}
         for ticker, total_value in popular_stocks.items():
-            chart_html, company_name = get_or_generate_widget_chart(conn, ticker, dark_mode_status)
+            chart_data, company_name = get_or_generate_widget_chart(conn, ticker)
             popular_stocks_charts[ticker] = {
-                'chart': chart_html,
+                'chart_data': chart_data,
                 'name': company_name if company_name else ticker, # Fallback auf Ticker
                 'period_display': period_display_text,
                 'total_value': total_value
             }
 
     if query:
-        if not ALPHA_VANTAGE_API_KEY:
-            error = "Suche ist deaktiviert, da der Alpha Vantage API Key fehlt."
-        else:
-            raw_results, error = search_alpha_vantage(query)
-            if raw_results:
-                results = []
-                for res in raw_results:
-                    res['yfinance_valid'] = yfinance_ticker_is_valid(res['1. symbol'])
-                    results.append(res)
-                results.sort(key=lambda x: x['yfinance_valid'], reverse=True)
-            elif not error:
-                flash(f"Keine Ergebnisse für '{query}' gefunden.", 'info')
+        # Zuerst im lokalen Symbolverzeichnis suchen, nur bei keinem Treffer Alpha Vantage fragen
+        raw_results = SymbolIndex.search(conn, query)
+        if not raw_results:
+            if not ALPHA_VANTAGE_API_KEY:
+                error = "Suche ist deaktiviert, da der Alpha Vantage API Key fehlt."
+            else:
+                raw_results, error = search_alpha_vantage(query)
+                if raw_results:
+                    SymbolIndex.ingest_alpha_vantage(conn, raw_results)
+        if raw_results:
+            # Alle Treffer parallel prüfen, bekannte Ticker kommen aus dem Cache
+            validity = TickerValidity.validate_many(conn, [res['1. symbol'] for res in raw_results])
+            results = []
+            for res in raw_results:
+                res['yfinance_valid'] = validity.get(res['1. symbol'], False)
+                results.append(res)
+            results.sort(key=lambda x: x['yfinance_valid'], reverse=True)
+        elif not error:
+            flash(f"Keine Ergebnisse für '{query}' gefunden.", 'info')
 
         if error:
             flash(error, 'error')
@@ -826,13 +771,43 @@ def search_stock_page():
 def trade_page(ticker_symbol):
     conn = get_db()
     ticker_symbol = ticker_symbol.upper()
+
+    # Schritt 1: Formular-Absendung verarbeiten. Market-Aufträge werden nur eingereiht,
+    # deshalb wird hier weder der Kurs noch .info abgefragt.
+    if request.method == 'POST':
+        if not TickerValidity.is_valid(conn, ticker_symbol):
+            flash(f"Ticker '{ticker_symbol}' nicht gefunden. Handel nicht möglich.", 'error')
+            return redirect(url_for('search_stock_page'))
+        try:
+            order_details = {
+                "ticker": ticker_symbol,
+                "order_type": request.form['order_type'],
+                "quantity": int(request.form['quantity']),
+                "limit_price": float(request.form.get('limit_price')) if request.form.get('limit_price') else None,
+                "stop_price": float(request.form.get('stop_price')) if request.form.get('stop_price') else None,
+            }
+
+            result = TradingEndpoint.place_order(conn, session['user_id'], order_details)
+
+            if result.get('success'):
+                # conn.commit() # Entfällt, da @app.teardown_appcontext dies übernimmt
+                flash(result.get('message'), 'success')
+                return redirect(url_for('my_orders_page'))
+            else:
+                flash(result.get('message'), 'error')
+                return redirect(url_for('trade_page', ticker_symbol=ticker_symbol))
+
+        except (KeyError, ValueError) as e:
+            flash(f'Ungültige Eingabe im Formular. Bitte überprüfen Sie Ihre Daten. Fehler: {e}', 'error')
+            return redirect(url_for('trade_page', ticker_symbol=ticker_symbol))
+
     basic_info, _ = get_stock_basic_info_yfinance(ticker_symbol)
 
     if not basic_info:
         flash(f"Ticker '{ticker_symbol}' nicht gefunden. Handel nicht möglich.", 'error')
         return render_template('trade_error.html', ticker=ticker_symbol)
 
-    # Schritt 1: Alle Daten für die Anzeige sammeln
+    # Schritt 2: Alle Daten für die Anzeige sammeln
     context = {
         "stock": basic_info.get('info_dict'),
         "ticker": ticker_symbol,
@@ -866,32 +841,7 @@ def trade_page(ticker_symbol):
                 rel_pl = (abs_pl / purchase_value) * 100
                 context["relative_profit_loss"] = rel_pl
 
-    # Schritt 2: Formular-Absendung verarbeiten
-    if request.method == 'POST':
-        try:
-            order_details = {
-                "ticker": ticker_symbol,
-                "order_type": request.form['order_type'],
-                "quantity": int(request.form['quantity']),
-                "limit_price": float(request.form.get('limit_price')) if request.form.get('limit_price') else None,
-                "stop_price": float(request.form.get('stop_price')) if request.form.get('stop_price') else None,
-            }
-
-            result = TradingEndpoint.place_order(conn, session['user_id'], order_details)
-
-            if result.get('success'):
-                # conn.commit() # Entfällt, da @app.teardown_appcontext dies übernimmt
-                flash(result.get('message'), 'success')
-                return redirect(url_for('my_orders_page'))
-            else:
-                flash(result.get('message'), 'error')
-                return redirect(url_for('trade_page', ticker_symbol=ticker_symbol))
-
-        except (KeyError, ValueError) as e:
-            flash(f'Ungültige Eingabe im Formular. Bitte überprüfen Sie Ihre Daten. Fehler: {e}', 'error')
-            return redirect(url_for('trade_page', ticker_symbol=ticker_symbol))
-
-    # Schritt 3: Seite bei GET-Request rendern
+    # Schritt 3: Seite rendern
     return render_template('trade_page.html', **context)
 
 
@@ -907,30 +857,20 @@ def stock_detail_page(ticker_symbol):
     if not any(p[0] == selected_period for p in AVAILABLE_PERIODS): selected_period = '1y'
     if not any(q[0] == selected_quality for q in AVAILABLE_QUALITIES): selected_quality = 'normal'
 
-    actual_period, actual_interval, adjustment_note = determine_actual_interval_and_period(selected_period, selected_quality)
+    _, _, adjustment_note = determine_actual_interval_and_period(selected_period, selected_quality)
 
-    # Dark-Mode-Status aus dem globalen 'g'-Objekt holen
-    dark_mode_status = g.user_settings and g.user_settings.get('dark_mode') == 1
+    # Der Chart wird im Browser über /api/chart geladen und gezeichnet
+    chart_url = url_for('api_chart', ticker_symbol=ticker_symbol, period=selected_period, quality=selected_quality)
 
-    chart_html, chart_error_msg, _ = generate_stock_plotly_chart(ticker_symbol,
-                                                                 period=actual_period,
-                                                                 interval=actual_interval,
-                                                                 quality_note=adjustment_note,
-                                                                 remove_gaps=remove_gaps_bool,
-                                                                 dark_mode=dark_mode_status) # Dark mode übergeben
-
-    overall_error = chart_error_msg if chart_error_msg else stock_details.get('error')
-    if overall_error and adjustment_note and "Hinweis:" in adjustment_note and "Fehler:" not in adjustment_note:
-        if not chart_error_msg and not stock_details.get('error'):
-             overall_error = adjustment_note
-        elif adjustment_note not in overall_error :
-             overall_error = f"{adjustment_note} | {overall_error}"
+    overall_error = stock_details.get('error')
+    if adjustment_note:
+        overall_error = f"{adjustment_note} | {overall_error}" if overall_error else adjustment_note
 
 
     return render_template('stock_detail_page.html',
                            ticker=ticker_symbol,
                            details=stock_details,
-                           chart_html=chart_html,
+                           chart_url=chart_url,
                            error=overall_error,
                            current_period=selected_period,
                            current_quality=selected_quality,
@@ -939,6 +879,47 @@ def stock_detail_page(ticker_symbol):
                            available_qualities=AVAILABLE_QUALITIES)
 
 
+@app.route('/api/chart/<string:ticker_symbol>')
+def api_chart(ticker_symbol):
+    """
+    Kursdaten für den Chart auf der Detailseite als kompakte Spalten (siehe backend/chart_data.py).
+    Zeitraum und Qualität werden wie auf der Detailseite in Periode und Intervall übersetzt.
+    Mit ?width= (Breite des Charts in Pixeln) werden zu viele Kerzen zusammengefasst.
+    """
+    ticker_symbol = ticker_symbol.upper()
+    selected_period = request.args.get('period', '1y')
+    selected_quality = request.args.get('quality', 'normal')
+    max_points = max_points_for_width(request.args.get('width', type=int), PIXELS_PER_CANDLE)
+    if not any(p[0] == selected_period for p in AVAILABLE_PERIODS): selected_period = '1y'
+    if not any(q[0] == selected_quality for q in AVAILABLE_QUALITIES): selected_quality = 'normal'
+    actual_period, actual_interval, _ = determine_actual_interval_and_period(selected_period, selected_quality)
+
+    conn = get_db()
+    company_name = get_company_name(conn, ticker_symbol)
+    try:
+        hist_data = OhlcStore.get_history(conn, ticker_symbol, period=actual_period, interval=actual_interval)
+    except Exception as e:
+        return jsonify({"success": False, "message": describe_chart_error(ticker_symbol, company_name, actual_period, actual_interval, e)}), 502
+
+    if hist_data.empty:
+        return jsonify({
+            "success": False,
+            "message": f"Keine Kursdaten für '{ticker_symbol}' mit Periode '{actual_period}' und Intervall '{actual_interval}' gefunden."
+        }), 404
+
+    response = jsonify({
+        "success": True,
+        "ticker": ticker_symbol,
+        "name": company_name,
+        "period": actual_period,
+        "period_display": next((p[1] for p in AVAILABLE_PERIODS if p[0] == actual_period), actual_period),
+        "interval": actual_interval,
+        **ohlc_payload(hist_data, max_points)
+    })
+    response.headers['Cache-Control'] = 'private, max-age=60'
+    return response
+
+
 @app.route('/leaderboard')
 def leaderboard_page():
     page = request.args.get('page', 1, type=int)
@@ -974,31 +955,61 @@ def leaderboard_page():
     )
 #------------
 
-@app.route('/api/refresh-depot', methods=['POST'])
+@app.route('/api/refresh-depot')
 @login_required
 def api_refresh_depot():
-    now = datetime.now()
-    last_refresh_str = session.get('last_depot_refresh')
-
-    if last_refresh_str:
-        last_refresh = datetime.fromisoformat(last_refresh_str)
-        if (now - last_refresh) < timedelta(seconds=60):
-            # Gib eine Fehlermeldung zurück, wenn zu früh aktualisiert wird
-            return jsonify({
-                "success": False,
-                "message": "Bitte warte 60 Sekunden."
-            }), 429
+    """
+    Bewertung des Depots als JSON, nur aus zwischengespeicherten Kursen (kein Abruf bei yfinance).
+    Schickt der Browser die letzte ETag mit (If-None-Match) und hat sich nichts geändert, gibt es nur 304.
+    Die Änderungen pro Position beziehen sich auf den Snapshot, den der Browser in ?baseline= mitschickt
+    (jeder Tab hat seinen eigenen). Die Sitzung wird nicht verändert, es gibt also kein neues Cookie.
+    Früher war das ein POST mit 60 Sekunden Sperre, weil jeder Aufruf yfinance gefragt hat. Jetzt kostet
+    ein Aufruf nur die Depot-Abfrage (bei 304 nur den Vergleich der Prüfsumme), die Sperre entfällt daher.
+    """
+    depot = DepotEndpoint.get_depot_details(get_db(), session['user_id'], cached_only=True)
+    if depot is None:
+        return jsonify({"success": False, "message": "Benutzerkonto nicht gefunden."}), 404
 
-    user_id = session['user_id']
-    db = get_db()
+    etag = DepotEndpoint.valuation_etag(depot)
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        DepotEndpoint.add_valuation_deltas(depot, DepotEndpoint.parse_snapshot(request.args.get('baseline')))
+        depot.pop("user_id")
+        response = jsonify({"success": True, "message": "Aktualisiert", **depot,
+                            "snapshot": DepotEndpoint.valuation_snapshot(depot)})
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
-    # Depot-Aktualisierung im Depot-System aufrufen (Annahme: es gibt eine solche Funktion)
-    # Für dieses Beispiel rufen wir einfach get_depot_details auf, um die Logik zu simulieren
-    DepotEndpoint.get_depot_details(db, user_id)
 
-    session['last_depot_refresh'] = now.isoformat()
-    # Entferne flash() und gib die Nachricht direkt im JSON zurück
-    return jsonify({"success": True, "message": "Erfolgreich!"})
+@app.route('/api/search')
+def api_search():
+    """
+    Autovervollständigung für die Aktiensuche. Antwortet nur aus dem lokalen Symbolverzeichnis,
+    Alpha Vantage wird erst beim Abschicken der Suche (/search) gefragt.
+    """
+    query = request.args.get('q', '').strip()[:MAX_SEARCH_QUERY_LENGTH]
+    limit = max(1, min(request.args.get('limit', 8, type=int), 20))
+    matches = SymbolIndex.search(get_db(), query, limit=limit) if query else []
+    response = jsonify({
+        "success": True,
+        "results": [
+            {"symbol": m['1. symbol'], "name": m['2. name'], "type": m['3. type'],
+             "region": m['4. region'], "currency": m['8. currency']}
+            for m in matches
+        ]
+    })
+    # Der Browser darf gleiche Anfragen (z.B. nach Backspace) kurz selbst beantworten
+    response.headers['Cache-Control'] = 'private, max-age=300'
+    return response
+
+
+@app.route('/api/quote-stats')
+@login_required
+def api_quote_stats():
+    """Zeigt, wie viele Kursabfragen aus dem Cache bedient wurden und wie viele yfinance erreicht haben."""
+    return jsonify(QuoteService.get_stats())
 
 
 @app.route('/my_orders')
@@ -1009,19 +1020,27 @@ def my_orders_page():
     open_orders = TradingEndpoint.get_user_orders(db, session['user_id'], status_filter='OPEN')
     closed_orders = TradingEndpoint.get_user_orders(db, session['user_id'], status_filter='CLOSED')
 
-    # Aktuelle Preise für offene Aufträge in einem Batch holen
+    # Aktuelle Preise für offene Aufträge in einem Batch über den Kursdienst holen
     prices = {}
     open_tickers = {order['ticker'] for order in open_orders}
     if open_tickers:
-        try:
-            data = yf.download(list(open_tickers), period="1d", progress=False, auto_adjust=True)['Close']
-            if not data.empty:
-                latest_prices = data.iloc[-1]
-                prices = latest_prices.to_dict()
-        except Exception as e:
-            print(f"Fehler beim Holen der Kurse für offene Orders: {e}")
+        prices = {ticker: price for ticker, price in QuoteService.get_prices(open_tickers, conn=db).items() if price is not None}
+
+    # Eingereihte Market-Aufträge, die der Hintergrund-Job noch nicht ausgeführt hat
+    pending_orders = OrderQueue.get_pending_for_user(db, session['user_id'])
+
+    return render_template('my_orders.html', open_orders=open_orders, closed_orders=closed_orders, prices=prices,
+                           pending_orders=pending_orders)
+
 
-    return render_template('my_orders.html', open_orders=open_orders, closed_orders=closed_orders, prices=prices)
+@app.route('/api/order-status/<int:queue_id>')
+@login_required
+def api_order_status(queue_id):
+    """Status eines eingereihten Market-Auftrags (PENDING, PROCESSING, EXECUTED oder FAILED)."""
+    status = OrderQueue.get_status(get_db(), session['user_id'], queue_id)
+    if status is None:
+        return jsonify({"success": False, "message": "Auftrag nicht gefunden."}), 404
+    return jsonify({"success": True, **status})
 
 
 @app.route('/settings', methods=['GET', 'POST'])
@@ -1058,6 +1077,8 @@ def settings_page():
             else:
                 flash(f"Du kannst deinen Namen erst wieder am {change_status['next_change_date']} ändern.", 'error')
 
+        # Neue Version in der Sitzung, damit kein Worker mehr die alten Einstellungen aus dem Cache nimmt
+        session['settings_version'] = session.get('settings_version', 0) + 1
         # conn.commit() # Entfällt, da @app.teardown_appcontext dies übernimmt
         return redirect(url_for('settings_page'))
 
@@ -1125,6 +1146,42 @@ def on_message(data):
         emit('response_event', handle_game_move(user_id, data["content"]))
 
 
+# -- Live-Kurse (siehe backend/quote_broadcaster.py) und Push-Nachrichten (backend/user_events.py) --
+@socketio.on('connect', namespace=LIVE_NAMESPACE)
+def on_live_connect():
+    """Nur für eingeloggte Benutzer: Live-Kurse und die eigenen Auftrags-Nachrichten."""
+    user_id = session.get('user_id')
+    if not user_id:
+        return False  # Verbindung ablehnen
+    join_room(UserEvents.room(user_id))
+    UserEventRelay.connect(request.sid, user_id)
+    UserEventRelay.ensure_started(socketio, app, get_db)
+
+
+@socketio.on('subscribe', namespace=LIVE_NAMESPACE)
+def on_live_subscribe(data):
+    """Meldet die Verbindung für Ticker an. Antwortet mit den zuletzt verschickten Kursen."""
+    if not session.get('user_id'):
+        return {"tickers": [], "prices": {}}
+    tickers = QuoteBroadcaster.subscribe(request.sid, (data or {}).get('tickers'), get_db())
+    for ticker in tickers:
+        join_room(QuoteBroadcaster.room(ticker))
+    QuoteBroadcaster.ensure_started(socketio, app, get_db)
+    return {"tickers": tickers, "prices": QuoteBroadcaster.last_prices(tickers)}
+
+
+@socketio.on('unsubscribe', namespace=LIVE_NAMESPACE)
+def on_live_unsubscribe(data):
+    for ticker in QuoteBroadcaster.unsubscribe(request.sid, (data or {}).get('tickers') or []):
+        leave_room(QuoteBroadcaster.room(ticker))
+
+
+@socketio.on('disconnect', namespace=LIVE_NAMESPACE)
+def on_live_disconnect():
+    QuoteBroadcaster.unsubscribe(request.sid)
+    UserEventRelay.disconnect(request.sid)
+
+
 if __name__ == '__main__':
     # siehe init_app_data()
     # use_reloader=False ist wichtig, damit der Scheduler nur einmal startet
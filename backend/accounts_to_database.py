@@ -386,6 +386,7 @@ class AccountEndpoint:
         # Zeitstempel der Änderung aktualisieren
         now_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         conn.execute("UPDATE settings SET last_name_change = ? WHERE user_id_fk = ?", (now_str, user_id))
+        Settings.invalidate(user_id)
 
         return {"success": True, "message": "Benutzername erfolgreich geändert."}
 
@@ -0,0 +1,67 @@
+# backend/chart_data.py
+"""
+Kompakte Chart-Daten für das Frontend (static/js/charts.js).
+Statt eine komplette Plotly-Figur als HTML zu schicken, werden nur die Datenreihen übertragen:
+spaltenweise, als little-endian Binärarrays in base64. Zeitstempel sind float64 (Sekunden),
+Kurse float32 (reicht für die Darstellung). Farben, Achsen und Dark/Light-Mode macht der Browser.
+Mit max_points werden die Reihen vorher auf die darstellbare Anzahl verkleinert (backend/downsampling.py).
+"""
+
+import base64
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from backend.downsampling import aggregate_ohlc, downsample_line
+
+
+def encode_column(values, dtype: str) -> str:
+    """Kodiert eine Zahlenreihe als base64 (dtype z.B. 'float32' oder 'float64', little-endian)."""
+    array = np.asarray(values, dtype=np.dtype(dtype).newbyteorder('<'))
+    return base64.b64encode(array.tobytes()).decode('ascii')
+
+
+def wall_clock_seconds(index: pd.DatetimeIndex) -> np.ndarray:
+    """
+    Zeitstempel als Sekunden in der Ortszeit der Börse. Plotly zeigt Zahlen-Daten ohne Zeitzone an,
+    so stehen die Kerzen wie bisher auf der Börsenzeit (wichtig für die Lücken außerhalb der Handelszeit).
+    """
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.values.astype('datetime64[s]').astype(np.int64)
+
+
+def ohlc_payload(frame: pd.DataFrame, max_points: int | None = None) -> dict:
+    """
+    Spalten t, o, h, l, c, v aus einem history()-DataFrame.
+    'bucket' gibt an, wie viele Kerzen zu einer zusammengefasst wurden (1 = keine).
+    """
+    bucket = 1
+    if max_points is not None:
+        frame, bucket = aggregate_ohlc(frame, max_points)
+    return {
+        "encoding": "base64-le",
+        "length": len(frame),
+        "bucket": bucket,
+        "t": encode_column(wall_clock_seconds(frame.index), 'float64'),
+        "o": encode_column(frame['Open'], 'float32'),
+        "h": encode_column(frame['High'], 'float32'),
+        "l": encode_column(frame['Low'], 'float32'),
+        "c": encode_column(frame['Close'], 'float32'),
+        "v": encode_column(frame['Volume'], 'float32'),
+    }
+
+
+def line_payload(history: list[dict], max_points: int | None = None) -> dict:
+    """Spalten t und y aus einer Historie (Liste von {'date', 'net_worth'}, beliebig sortiert)."""
+    history = sorted(history, key=lambda item: item['date'])
+    # Die Zeitpunkte sind lokale Serverzeit ohne Zone -> ebenfalls als Wanduhrzeit übertragen
+    times = [datetime.fromisoformat(item['date']).replace(tzinfo=timezone.utc).timestamp() for item in history]
+    values = [item['net_worth'] for item in history]
+    if max_points is not None:
+        times, values = downsample_line(times, values, max_points)
+    return {
+        "encoding": "base64-le",
+        "length": len(times),
+        "t": encode_column(times, 'float64'),
+        "y": encode_column(values, 'float64'),  # Cent-genau
+    }
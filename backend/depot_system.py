@@ -1,21 +1,25 @@
 # backend/depot_system.py
 
+import hashlib
+import json
 import sqlite3
-import yfinance as yf
-import pandas as pd  # yfinance gibt pandas-Datenstrukturen zurück
 from backend.accounts_to_database import AccountEndpoint
+from backend.quote_service import QuoteService
+
+MAX_SNAPSHOT_LENGTH = 8000  # Zeichen, mehr braucht auch ein großes Depot nicht
 
 class DepotEndpoint:
     """Bündelt die Logik zur Abfrage und Berechnung von Depot-Daten."""
 
     @staticmethod
-    def get_depot_details(conn: sqlite3.Connection, user_id: int) -> dict | None:
+    def get_depot_details(conn: sqlite3.Connection, user_id: int, cached_only: bool = False) -> dict | None:
         """
         Sammelt alle relevanten Informationen für die Depot-Ansicht eines Benutzers.
         - Barbestand
         - Aktienpositionen
         - Aktuelle Kurse und Werte
         - Gesamtvermögen
+        Mit cached_only=True werden nur die zwischengespeicherten Kurse verwendet (kein Abruf bei yfinance).
         """
         cursor = conn.cursor()
 
@@ -37,49 +41,39 @@ class DepotEndpoint:
 
         # 3. Aktuelle Kurse für alle Ticker im Depot abfragen (falls vorhanden)
         if tickers:
-            try:
-                # Batch-Download für bessere Performance
-                data = yf.download(tickers, period="1d", progress=False, group_by='ticker', auto_adjust=True)
-                for ticker, quantity, avg_price in positions_raw:
-                    current_price = None
-                    current_value = None
-                    absolute_profit = None
-                    relative_profit = None
-
-                    if not data.empty and ticker in data and not pd.isna(data[ticker]['Close'].iloc[-1]):
-                        current_price = data[ticker]['Close'].iloc[-1]
-                        current_value = quantity * current_price
-                        portfolio_value += current_value
-
-                        # Gewinn/Verlust berechnen
-                        purchase_value = avg_price * quantity
-                        if purchase_value > 0:
-                            absolute_profit = current_value - purchase_value
-                            relative_profit = (absolute_profit / purchase_value) * 100
-                        else: # Should not happen if quantity > 0
-                            absolute_profit = 0
-                            relative_profit = 0
-
-
-                    positions_detailed.append({
-                        "ticker": ticker,
-                        "quantity": quantity,
-                        "average_purchase_price": avg_price,
-                        "current_price": current_price,
-                        "current_value": current_value,
-                        "absolute_profit": absolute_profit,
-                        "relative_profit": relative_profit,
-                    })
-
-            except Exception as e:
-                print(f"Fehler beim Abrufen der Depot-Preise: {e}")
-                # Fallback, um das Depot auch ohne Live-Preise anzuzeigen
-                for ticker, quantity, avg_price in positions_raw:
-                    positions_detailed.append({
-                        "ticker": ticker, "quantity": quantity, "average_purchase_price": avg_price,
-                        "current_price": None, "current_value": None,
-                        "absolute_profit": None, "relative_profit": None,
-                    })
+            # Batch-Abfrage über den zentralen Kursdienst (Cache, Tabelle 'quotes', ein gemeinsamer Download)
+            if cached_only:
+                prices = QuoteService.get_cached_prices(tickers, conn=conn)
+            else:
+                prices = QuoteService.get_prices(tickers, conn=conn)
+            for ticker, quantity, avg_price in positions_raw:
+                current_price = prices.get(ticker)
+                current_value = None
+                absolute_profit = None
+                relative_profit = None
+
+                if current_price is not None:
+                    current_value = quantity * current_price
+                    portfolio_value += current_value
+
+                    # Gewinn/Verlust berechnen
+                    purchase_value = avg_price * quantity
+                    if purchase_value > 0:
+                        absolute_profit = current_value - purchase_value
+                        relative_profit = (absolute_profit / purchase_value) * 100
+                    else: # Should not happen if quantity > 0
+                        absolute_profit = 0
+                        relative_profit = 0
+
+                positions_detailed.append({
+                    "ticker": ticker,
+                    "quantity": quantity,
+                    "average_purchase_price": avg_price,
+                    "current_price": current_price,
+                    "current_value": current_value,
+                    "absolute_profit": absolute_profit,
+                    "relative_profit": relative_profit,
+                })
 
         # 4. Gesamtergebnis zusammenstellen
         total_net_worth = cash_balance + portfolio_value
@@ -95,6 +89,56 @@ class DepotEndpoint:
             "prices_missing": prices_missing
         }
 
+    @staticmethod
+    def valuation_etag(depot: dict) -> str:
+        """Prüfsumme über Barbestand, Positionen und Kurse. Gleiche Prüfsumme = gleiche Bewertung."""
+        state = [depot["cash_balance"]] + [
+            [pos["ticker"], pos["quantity"], pos["average_purchase_price"], pos["current_price"]]
+            for pos in sorted(depot["positions"], key=lambda pos: pos["ticker"])
+        ]
+        return hashlib.sha1(json.dumps(state).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def valuation_snapshot(depot: dict) -> dict:
+        """Die Werte, gegen die die nächste Bewertung ihre Änderungen rechnet. Der Browser hält sie und schickt sie mit."""
+        return {
+            "total_net_worth": depot["total_net_worth"],
+            "positions": {pos["ticker"]: pos["current_value"] for pos in depot["positions"]},
+        }
+
+    @staticmethod
+    def parse_snapshot(raw: str | None) -> dict | None:
+        """Liest einen vom Browser geschickten Snapshot (JSON wie valuation_snapshot). Ungültig -> None."""
+        if not raw or len(raw) > MAX_SNAPSHOT_LENGTH:
+            return None
+        try:
+            data = json.loads(raw)
+            total = float(data["total_net_worth"])
+            positions = {str(ticker): None if value is None else float(value)
+                         for ticker, value in dict(data["positions"]).items()}
+        except (ValueError, TypeError, KeyError):
+            return None
+        return {"total_net_worth": total, "positions": positions}
+
+    @staticmethod
+    def add_valuation_deltas(depot: dict, snapshot: dict | None) -> dict:
+        """
+        Ergänzt die Bewertung um die Änderungen seit snapshot (siehe valuation_snapshot):
+        pro Position 'value_change', dazu 'total_change' und die Liste 'removed_tickers'.
+        Ohne snapshot oder ohne Kurs ist die Änderung None.
+        """
+        previous = (snapshot or {}).get("positions", {})
+        for pos in depot["positions"]:
+            old_value = previous.get(pos["ticker"], 0.0) if snapshot else None
+            if pos["current_value"] is None or old_value is None:
+                pos["value_change"] = None
+            else:
+                pos["value_change"] = pos["current_value"] - old_value
+        current_tickers = {pos["ticker"] for pos in depot["positions"]}
+        depot["removed_tickers"] = [ticker for ticker in previous if ticker not in current_tickers]
+        depot["total_change"] = depot["total_net_worth"] - snapshot["total_net_worth"] if snapshot else None
+        return depot
+
     @staticmethod
     def get_most_popular_stocks(conn: sqlite3.Connection) -> dict[str, float]:
         """
@@ -0,0 +1,102 @@
+# backend/downsampling.py
+"""
+Verkleinert Datenreihen für Charts auf so viele Punkte, wie auf der Breite überhaupt darstellbar sind.
+- Linien (Depotverlauf): Largest-Triangle-Three-Buckets (LTTB). Pro Abschnitt bleibt der Punkt, der mit
+  dem zuvor gewählten Punkt und dem Mittel des nächsten Abschnitts das größte Dreieck bildet. So bleiben
+  Spitzen und Einbrüche sichtbar, anders als bei jedem n-ten Punkt.
+- Kerzen: jeweils k aufeinanderfolgende Kerzen werden zu einer zusammengefasst (erstes Open, höchstes High,
+  tiefstes Low, letztes Close, Summe Volume). Über Handelspausen (Nacht, Wochenende) hinweg wird nicht
+  zusammengefasst.
+"""
+
+import math
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHART_WIDTH = 1200  # px, wenn der Browser keine Breite mitschickt
+MIN_CHART_WIDTH = 100
+MAX_CHART_WIDTH = 4000
+PIXELS_PER_CANDLE = 3  # Körper + Abstand, darunter sind Kerzen nicht mehr zu unterscheiden
+PIXELS_PER_LINE_POINT = 1
+GAP_FACTOR = 1.5  # Abstand > GAP_FACTOR * üblicher Abstand gilt als Handelspause
+
+
+def max_points_for_width(width: int | None, pixels_per_point: float) -> int:
+    """Wie viele Punkte auf einem Chart mit width Pixeln Breite sinnvoll sind."""
+    if width is None:
+        width = DEFAULT_CHART_WIDTH
+    width = min(max(int(width), MIN_CHART_WIDTH), MAX_CHART_WIDTH)
+    return max(int(width / pixels_per_point), 2)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Gibt die Indizes der Punkte zurück, die LTTB behält (aufsteigend, erster und letzter immer dabei).
+    x muss aufsteigend sortiert sein.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Die Punkte zwischen erstem und letztem werden in threshold - 2 Abschnitte geteilt
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # Mittelwert des nächsten Abschnitts (beim letzten Abschnitt: der letzte Punkt)
+        next_start, next_end = end, edges[bucket + 2] if bucket + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # Doppelte Dreiecksfläche aus vorherigem Punkt, Kandidat und Mittelwert
+        areas = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def downsample_line(x, y, max_points: int) -> tuple[np.ndarray, np.ndarray]:
+    """Verkleinert eine Linie mit LTTB auf höchstens max_points Punkte."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    indices = lttb_indices(x, y, max_points)
+    return x[indices], y[indices]
+
+
+def aggregate_ohlc(frame: pd.DataFrame, max_bars: int) -> tuple[pd.DataFrame, int]:
+    """
+    Fasst die Kerzen eines history()-DataFrames zusammen, bis es höchstens max_bars sind.
+    Gibt den neuen DataFrame und die Anzahl Kerzen pro zusammengefasster Kerze zurück (1 = unverändert).
+    """
+    n = len(frame)
+    if n <= max_bars or max_bars < 1:
+        return frame, 1
+
+    times = frame.index.values.astype('datetime64[s]').astype(np.int64)
+    steps = np.diff(times)
+    gap_starts = np.flatnonzero(steps > GAP_FACTOR * np.median(steps)) + 1 if len(steps) else np.array([], dtype=np.int64)
+    segment_starts = np.concatenate(([0], gap_starts))
+    if len(segment_starts) >= max_bars:
+        segment_starts = np.array([0])  # Zu viele Pausen, dann eben darüber hinweg zusammenfassen
+
+    # Jeder Abschnitt beginnt eine neue Kerze, daher pro Abschnitt höchstens eine zusätzliche
+    bars_per_bucket = math.ceil(n / max(max_bars - len(segment_starts), 1))
+    segment_ends = np.append(segment_starts[1:], n)
+    starts = np.concatenate([np.arange(start, end, bars_per_bucket)
+                             for start, end in zip(segment_starts, segment_ends)])
+
+    aggregated = pd.DataFrame({
+        'Open': frame['Open'].to_numpy()[starts],
+        'High': np.maximum.reduceat(frame['High'].to_numpy(dtype=np.float64), starts),
+        'Low': np.minimum.reduceat(frame['Low'].to_numpy(dtype=np.float64), starts),
+        'Close': frame['Close'].to_numpy()[np.append(starts[1:], n) - 1],
+        'Volume': np.add.reduceat(frame['Volume'].fillna(0).to_numpy(dtype=np.float64), starts),
+    }, index=frame.index[starts])
+    return aggregated, bars_per_bucket
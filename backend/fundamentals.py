@@ -0,0 +1,205 @@
+# backend/fundamentals.py
+"""
+Cache für die Stammdaten einer Aktie (yf.Ticker(t).info).
+.info ist ein langsamer, großer Abruf und wurde pro Seitenaufruf mehrfach für denselben Ticker gemacht.
+Die Felder werden nach Änderungshäufigkeit getrennt:
+- schnelle Felder (Kurs, Volumen, Tageshoch, ...) gelten QUICK_FIELDS_TTL_SECONDS und werden über das
+  leichte fast_info nachgeladen
+- alle anderen Felder (Name, Branche, Marktkapitalisierung, ...) gelten INFO_TTL_SECONDS, erst dann wird
+  .info neu geholt
+Zwischengespeichert wird pro Prozess im Speicher und, wenn eine Verbindung übergeben wird,
+in der Tabelle 'fundamentals' (gemeinsam für alle Worker).
+Die Abrufe bei yfinance blockieren im C-Code (curl) und laufen deshalb über eventlet.tpool.
+Eine eventlet.Timeout beendet dabei nur das Warten, nicht den Thread. Damit hängende Abrufe den Pool von tpool
+(20 Threads) nicht füllen, laufen sie über fetch_limited: höchstens MAX_PARALLEL_FETCHES gleichzeitig,
+und ein Platz wird erst frei, wenn der Thread wirklich fertig ist. Wo yfinance eine Frist kennt
+(history, download), wird zusätzlich YFINANCE_TIMEOUT_SECONDS übergeben.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+import eventlet
+from eventlet import tpool
+from eventlet.semaphore import Semaphore
+import yfinance as yf
+
+INFO_TTL_SECONDS = 24 * 60 * 60
+QUICK_FIELDS_TTL_SECONDS = 60
+MEMORY_CACHE_SIZE = 256
+MAX_PARALLEL_FETCHES = 8  # Gleichzeitige .info-Abrufe pro Worker, deutlich unter den 20 Threads von tpool
+YFINANCE_TIMEOUT_SECONDS = 10  # HTTP-Frist für Abrufe, bei denen yfinance eine annimmt
+
+# .info-Feld -> Attribut von fast_info
+QUICK_FIELDS = {
+    'currentPrice': 'last_price',
+    'regularMarketPrice': 'last_price',
+    'volume': 'last_volume',
+    'regularMarketVolume': 'last_volume',
+    'dayHigh': 'day_high',
+    'dayLow': 'day_low',
+    'open': 'open',
+    'previousClose': 'previous_close',
+}
+
+
+class FundamentalsCache:
+    """Liefert das .info-Dictionary eines Tickers aus dem Cache oder von yfinance."""
+
+    # ticker -> (info, info_geholt_um, schnelle_felder, schnelle_felder_geholt_um), Zeiten als unix-zeit
+    _memory: OrderedDict[str, tuple[dict, float, dict, float]] = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_info(ticker: str, conn: sqlite3.Connection | None = None) -> dict:
+        """
+        Gibt das .info-Dictionary für ticker zurück (eine Kopie, darf verändert werden).
+        Fehler beim Abruf von .info werden weitergegeben, damit die Aufrufer sie wie bisher behandeln.
+        """
+        now = time.time()
+        entry = FundamentalsCache._read_memory(ticker)
+        if (entry is None or now - entry[1] > INFO_TTL_SECONDS) and conn is not None:
+            stored = FundamentalsCache._read_stored(conn, ticker)
+            if stored is not None:
+                entry = stored
+                FundamentalsCache._remember(ticker, entry)
+
+        if entry is None or now - entry[1] > INFO_TTL_SECONDS:
+            # Alles neu holen, die schnellen Felder sind darin enthalten
+            entry = FundamentalsCache.remember_info(ticker, fetch_limited(_fetch_info, ticker), conn)
+        elif now - entry[3] > QUICK_FIELDS_TTL_SECONDS:
+            quick = fetch_limited(FundamentalsCache._fetch_quick_fields, ticker)
+            if quick is not None:
+                entry = (entry[0], entry[1], quick, now)
+                FundamentalsCache._write(ticker, entry, conn)
+
+        info = dict(entry[0])
+        info.update({field: value for field, value in entry[2].items() if value is not None})
+        return info
+
+    @staticmethod
+    def remember_info(ticker: str, info: dict, conn: sqlite3.Connection | None = None) -> tuple[dict, float, dict, float]:
+        """Legt ein frisch geholtes .info ab (z.B. aus der Ticker-Prüfung). Die schnellen Felder kommen daraus."""
+        now = time.time()
+        entry = (info, now, {field: info.get(field) for field in QUICK_FIELDS}, now)
+        FundamentalsCache._write(ticker, entry, conn)
+        return entry
+
+    @staticmethod
+    def _fetch_quick_fields(ticker: str) -> dict | None:
+        """
+        Holt nur Kurs, Volumen usw. über fast_info. Gibt bei Fehlern None zurück (alte Werte bleiben).
+        Läuft in einem Thread von tpool, fasst also weder Cache noch Datenbank an.
+        """
+        try:
+            fast_info = yf.Ticker(ticker).fast_info
+            values = {}
+            for field, attribute in QUICK_FIELDS.items():
+                try:
+                    value = fast_info[attribute]
+                except (KeyError, TypeError):
+                    value = None
+                # numpy-Typen in normale Zahlen umwandeln, damit sie als JSON gespeichert werden können
+                if value is not None:
+                    value = int(value) if 'volume' in attribute else float(value)
+                values[field] = value
+            return values
+        except Exception as e:
+            print(f"[Stammdaten] fast_info für '{ticker}' fehlgeschlagen, verwende ältere Werte: {e}")
+            return None
+
+    @staticmethod
+    def _read_memory(ticker: str) -> tuple[dict, float, dict, float] | None:
+        with FundamentalsCache._lock:
+            entry = FundamentalsCache._memory.get(ticker)
+            if entry is not None:
+                FundamentalsCache._memory.move_to_end(ticker)
+            return entry
+
+    @staticmethod
+    def _remember(ticker: str, entry: tuple[dict, float, dict, float]):
+        """Legt einen Eintrag im Speicher ab, die am längsten unbenutzten fallen heraus."""
+        with FundamentalsCache._lock:
+            FundamentalsCache._memory[ticker] = entry
+            FundamentalsCache._memory.move_to_end(ticker)
+            while len(FundamentalsCache._memory) > MEMORY_CACHE_SIZE:
+                FundamentalsCache._memory.popitem(last=False)
+
+    @staticmethod
+    def _write(ticker: str, entry: tuple[dict, float, dict, float], conn: sqlite3.Connection | None):
+        FundamentalsCache._remember(ticker, entry)
+        if conn is not None:
+            FundamentalsCache._store(conn, ticker, entry)
+
+    @staticmethod
+    def _read_stored(conn: sqlite3.Connection, ticker: str) -> tuple[dict, float, dict, float] | None:
+        sql = "SELECT info_json, info_fetched_at, quick_json, quick_fetched_at FROM fundamentals WHERE ticker = ?"
+        try:
+            cursor = conn.cursor()
+            cursor.execute(sql, (ticker,))
+            row = cursor.fetchone()
+        except sqlite3.Error as e:
+            print(f"[Stammdaten] Tabelle 'fundamentals' konnte nicht gelesen werden: {e}")
+            return None
+        if row is None:
+            return None
+        info_json, info_fetched_at, quick_json, quick_fetched_at = row
+        return json.loads(info_json), _to_unix(info_fetched_at), json.loads(quick_json), _to_unix(quick_fetched_at)
+
+    @staticmethod
+    def _store(conn: sqlite3.Connection, ticker: str, entry: tuple[dict, float, dict, float]):
+        info, info_fetched_at, quick, quick_fetched_at = entry
+        sql = """
+            INSERT INTO fundamentals (ticker, info_json, info_fetched_at, quick_json, quick_fetched_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(ticker) DO UPDATE SET
+                info_json = excluded.info_json, info_fetched_at = excluded.info_fetched_at,
+                quick_json = excluded.quick_json, quick_fetched_at = excluded.quick_fetched_at
+        """
+        try:
+            conn.execute(sql, (ticker, json.dumps(info, default=str), _to_timestamp(info_fetched_at),
+                               json.dumps(quick, default=str), _to_timestamp(quick_fetched_at)))
+        except sqlite3.Error as e:
+            print(f"[Stammdaten] Stammdaten für '{ticker}' konnten nicht gespeichert werden: {e}")
+
+
+_fetch_slots = Semaphore(MAX_PARALLEL_FETCHES)
+
+
+def fetch_limited(function, *args):
+    """
+    Führt function(*args) über tpool aus, höchstens MAX_PARALLEL_FETCHES gleichzeitig.
+    Der Abruf läuft in einem eigenen Greenlet, das den Platz erst nach dem Ende des Threads freigibt,
+    auch wenn der Aufrufer nach einer eventlet.Timeout nicht mehr wartet.
+    """
+    _fetch_slots.acquire()
+
+    def run():
+        # Fehler zurückgeben statt werfen, sonst gibt eventlet sie im Greenlet zusätzlich aus
+        try:
+            return tpool.execute(function, *args), None
+        except Exception as e:
+            return None, e
+        finally:
+            _fetch_slots.release()
+
+    result, error = eventlet.spawn(run).wait()
+    if error is not None:
+        raise error
+    return result
+
+
+def _fetch_info(ticker: str) -> dict:
+    """Das komplette .info von yfinance. Läuft in einem Thread von tpool."""
+    return yf.Ticker(ticker).info or {}
+
+
+def _to_timestamp(unix_time: float) -> str:
+    return datetime.fromtimestamp(unix_time).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _to_unix(timestamp: str) -> float:
+    return datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S').timestamp()
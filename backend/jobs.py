@@ -1,9 +1,54 @@
-from app import app, get_db, update_popular_charts_cache
+"""
+Die zeitgesteuerten Jobs (Orders, Leaderboard, Daily) und der Scheduler, der sie ausführt.
+Damit jeder Job pro Auslösung nur EINMAL im ganzen Deployment läuft, darf der Scheduler nur in
+einem einzigen Prozess laufen. Dafür sorgt eine Dateisperre (flock): nur der Prozess, der sie hält,
+startet den Scheduler. Stirbt er, gibt das Betriebssystem die Sperre frei und der nächste Prozess
+(z.B. der von gunicorn neu gestartete Worker) übernimmt.
+
+Der Scheduler kann auch als eigener Prozess gestartet werden:
+    python -m backend.jobs
+Die gunicorn-Worker starten dann keinen eigenen Scheduler, weil die Sperre schon vergeben ist.
+Worker ohne Sperre versuchen es alle SCHEDULER_LOCK_RETRY_SECONDS erneut (z.B. nach einem Reload mit HUP,
+wenn der alte Worker die Sperre erst nach dem Start der neuen freigibt).
+"""
+import eventlet
+import fcntl
+import os
+import time
+from functools import wraps
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.blocking import BlockingScheduler
+
+from app import app, get_db, update_popular_charts_cache, update_stock_fragments_cache
 from backend.trading import TradingEndpoint
 from backend.leaderboard import LeaderboardEndpoint
 from backend.accounts_to_database import AccountEndpoint
+from backend.order_book import ORDER_BOOK
+from backend.order_queue import OrderQueue
+from backend.ohlc_store import OhlcStore
+from backend.user_events import UserEvents
+
+SCHEDULER_LOCK_FILE = "backend/scheduler.lock"
+SCHEDULER_LOCK_RETRY_SECONDS = 30  # So oft versuchen Worker ohne Sperre erneut, sie zu bekommen
+MARKET_ORDER_INTERVAL_SECONDS = 2  # So lange wartet ein eingereihter Market-Auftrag höchstens auf den Job
 
+_scheduler_lock_handle = None  # Muss offen bleiben, solange der Prozess die Sperre hält
+
+
+def timed_job(job):
+    """Dekorator, der die Laufzeit jedes Jobs protokolliert."""
+    @wraps(job)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return job(*args, **kwargs)
+        finally:
+            duration = time.perf_counter() - start
+            print(f"[Scheduler] Job '{job.__name__}' in {duration:.2f} s beendet (PID {os.getpid()}).")
+    return wrapper
 
+
+@timed_job
 def scheduled_order_processing_job():
     """Wird vom Scheduler aufgerufen, um offene Aufträge zu verarbeiten."""
     # app_context wird benötigt, damit der Hintergrund-Thread auf die App und die DB zugreifen kann
@@ -16,6 +61,20 @@ def scheduled_order_processing_job():
         except Exception as e:
             print(f"[Scheduler] Fehler im Job 'process_open_orders': {e}")
 
+def scheduled_market_order_job():
+    """
+    Führt die eingereihten Market-Aufträge aus (siehe backend/order_queue.py).
+    Läuft alle paar Sekunden, daher ohne timed_job und nur mit Ausgabe, wenn es etwas zu tun gab.
+    """
+    with app.app_context():
+        db = get_db()
+        try:
+            OrderQueue.process_pending(db)
+            db.commit()
+        except Exception as e:
+            print(f"[Scheduler] Fehler im Job 'market_order_job': {e}")
+
+@timed_job
 def scheduled_leaderboard_processing_job():
     with app.app_context():
         db = get_db()
@@ -28,16 +87,83 @@ def scheduled_leaderboard_processing_job():
         except Exception as e:
             print(f"[Scheduler] Fehler im Job 'leaderboard_processing_job': {e}")
 
+@timed_job
 def scheduled_daily_processing_job():
     with app.app_context():
         db = get_db()
         try:
             print("Starte Daily Scheduler")
             LeaderboardEndpoint.decimate_entries(db)
+            # Orderbuch neu aufbauen, damit woanders stornierte Aufträge nicht liegen bleiben
+            ORDER_BOOK.rebuild(db)
             result = AccountEndpoint.delete_unverified_users(db)
             print(result.get("message"))
             # Proaktives Caching der beliebten Charts
             update_popular_charts_cache(db)
+            update_stock_fragments_cache(db)
+            print(f"{OhlcStore.prune(db)} veraltete Kerzen gelöscht.")
+            print(f"{UserEvents.prune(db)} alte Push-Nachrichten gelöscht.")
             db.commit()
         except Exception as e:
-            print(f"[Scheduler] Fehler im Job 'leaderboard_processing_job': {e}")
\ No newline at end of file
+            print(f"[Scheduler] Fehler im Job 'leaderboard_processing_job': {e}")
+
+
+def create_scheduler(scheduler_class=BackgroundScheduler):
+    """
+    Erstellt den Scheduler mit allen Jobs, startet ihn aber NICHT.
+    max_instances=1 und coalesce=True verhindern, dass sich ein langsamer Job mit sich selbst überholt
+    oder verpasste Auslösungen mehrfach nachgeholt werden.
+    """
+    scheduler = scheduler_class(daemon=True, timezone="Europe/Berlin",
+                                job_defaults={'max_instances': 1, 'coalesce': True})
+    scheduler.add_job(scheduled_order_processing_job, 'cron', minute='*')  # Jede Minute
+    scheduler.add_job(scheduled_market_order_job, 'interval', seconds=MARKET_ORDER_INTERVAL_SECONDS)
+    scheduler.add_job(scheduled_daily_processing_job, 'cron', hour='5', minute='0')  # Um 5:00 Uhr
+    scheduler.add_job(scheduled_leaderboard_processing_job, 'cron', minute='*/10')  # Wenn Minuten teilbar durch 10
+    return scheduler
+
+
+def acquire_scheduler_lock(lock_file: str = SCHEDULER_LOCK_FILE) -> bool:
+    """
+    Versucht, die Scheduler-Sperre zu bekommen, ohne zu warten.
+    Gibt True zurück, wenn dieser Prozess den Scheduler starten darf.
+    """
+    global _scheduler_lock_handle
+    if _scheduler_lock_handle is not None:
+        return True
+    handle = open(lock_file, 'a+')
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        handle.close()
+        return False
+    handle.seek(0)
+    handle.truncate()
+    handle.write(str(os.getpid()))
+    handle.flush()
+    _scheduler_lock_handle = handle
+    return True
+
+
+def start_scheduler_when_leader(scheduler, on_start=None) -> bool:
+    """
+    Startet den Scheduler, sobald dieser Prozess die Sperre bekommt. Ist sie vergeben, wird es in einem
+    Greenlet alle SCHEDULER_LOCK_RETRY_SECONDS erneut versucht, bis der Prozess sie bekommt.
+    on_start wird nach dem Start aufgerufen. Gibt True zurück, wenn der Scheduler sofort gestartet wurde.
+    """
+    if acquire_scheduler_lock():
+        scheduler.start()
+        if on_start:
+            on_start()
+        return True
+    eventlet.spawn_after(SCHEDULER_LOCK_RETRY_SECONDS, start_scheduler_when_leader, scheduler, on_start)
+    return False
+
+
+if __name__ == '__main__':
+    # Eigenständiger Scheduler-Prozess
+    if not acquire_scheduler_lock():
+        print("[Scheduler] Ein anderer Prozess führt den Scheduler bereits aus. Beende.")
+    else:
+        print(f"[Scheduler] Starte eigenständigen Scheduler (PID: {os.getpid()}).")
+        create_scheduler(BlockingScheduler).start()
@@ -6,15 +6,19 @@ indem es den Barbestand mit dem Wert des Aktien-Depots kombiniert.
 Aktienwerte werden über die yfinance-Bibliothek abgefragt.
 """
 
+import heapq
 import sqlite3
 import collections
 from datetime import datetime
+import numpy as np
+import pandas as pd
 from yfinance.exceptions import YFPricesMissingError
 
 from backend.accounts_to_database import AccountEndpoint
 from backend.user_settings import Settings
 from backend.utilities import Utilities
 from backend.depot_system import DepotEndpoint
+from backend.quote_service import QuoteService
 
 link_color = "#e017c0" #Instagram-Farbe
 
@@ -84,22 +88,9 @@ class LeaderboardEndpoint:
 
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
-        #sql = "SELECT user_id_fk, net_worth, last_updated FROM leaderboard ORDER BY net_worth DESC LIMIT ? OFFSET ?"
-        sql = (
-            "WITH RankedEntries AS ("
-                   "SELECT user_id_fk, net_worth, last_updated, ROW_NUMBER() "
-                        "OVER("
-                            "PARTITION BY user_id_fk "
-                            "ORDER BY last_updated DESC"
-                        ") "
-                        "as rn FROM leaderboard"
-                ") "
-               "SELECT user_id_fk, net_worth, last_updated "
-               "FROM RankedEntries "
-               "WHERE rn = 1 "
-               "ORDER BY net_worth DESC "
-               "LIMIT ? OFFSET ?;"
-               )
+        # leaderboard_latest hält pro User nur den neuesten Eintrag -> einfacher Index-Zugriff,
+        # unabhängig davon, wie viel Historie sich in 'leaderboard' angesammelt hat
+        sql = "SELECT user_id_fk, net_worth, last_updated FROM leaderboard_latest ORDER BY net_worth DESC LIMIT ? OFFSET ?"
         cursor.execute(sql, (page_size, offset))
 
         paginated_data = [dict(row) for row in cursor.fetchall()]
@@ -150,27 +141,68 @@ class LeaderboardEndpoint:
 
         net_worth = depot_data['total_net_worth']
 
-        # 4. Aktualisiere oder füge den Eintrag im Leaderboard hinzu (Upsert)
+        # 4. Eintrag in der Historie und in leaderboard_latest speichern
         now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        sql_upsert = """
-            INSERT INTO leaderboard (user_id_fk, net_worth, last_updated)
-            VALUES (?, ?, ?)
-        """
-        cursor.execute(sql_upsert, (user_id, net_worth, now))
+        LeaderboardEndpoint._record_net_worths(conn, [(user_id, net_worth, now)])
 
         return True
 
     @staticmethod
-    def insert_all_current_net_worths(conn: sqlite3.Connection) -> dict:
+    def _record_net_worths(conn: sqlite3.Connection, rows: list[tuple[int, float, str]]):
+        """
+        Schreibt (user_id, net_worth, zeitpunkt) in die Historie 'leaderboard' und hält
+        'leaderboard_latest' in derselben Transaktion auf dem neuesten Stand.
         """
-        Berechnet das Gesamtvermögen für ALLE Benutzer und aktualisiert das Leaderboard.
-        Dies ist eine aufwendige Operation.
+        cursor = conn.cursor()
+        cursor.executemany("INSERT INTO leaderboard (user_id_fk, net_worth, last_updated) VALUES (?, ?, ?)", rows)
+        sql_upsert_latest = """
+            INSERT INTO leaderboard_latest (user_id_fk, net_worth, last_updated)
+            VALUES (?, ?, ?)
+            ON CONFLICT(user_id_fk) DO UPDATE SET
+                net_worth = excluded.net_worth, last_updated = excluded.last_updated
         """
-        print("Starte die Berechnung des Gesamtvermögens für alle Benutzer. Dies kann einen Moment dauern...")
-        all_users = AccountEndpoint.get_all_user_ids(conn)
-        for user_id in all_users:
-            LeaderboardEndpoint.insert_current_net_worth_for_user(conn, user_id)
-        return {"success": True}
+        cursor.executemany(sql_upsert_latest, rows)
+
+    @staticmethod
+    def insert_all_current_net_worths(conn: sqlite3.Connection, tries: int = 3) -> dict:
+        """
+        Berechnet das Gesamtvermögen für ALLE Benutzer in einem Durchlauf und aktualisiert das Leaderboard.
+        Statt eines Downloads pro Benutzer werden alle Depots auf einmal gelesen, die Kurse
+        aller Ticker gemeinsam geholt und alle Zeilen mit einem einzigen executemany geschrieben.
+        Benutzer, für deren Positionen kein Kurs ermittelt werden konnte, werden übersprungen.
+        """
+        print("Starte die Berechnung des Gesamtvermögens für alle Benutzer...")
+        users = pd.read_sql_query("SELECT user_id, money FROM all_users", conn)
+        depot = pd.read_sql_query("SELECT user_id_fk, ticker, quantity FROM stock_depot", conn)
+
+        # 1. Kurse für die Vereinigung aller Ticker holen, fehlende bis zu drei mal nachladen
+        prices: dict[str, float | None] = {}
+        tickers = depot['ticker'].unique().tolist()
+        for i in range(tries):
+            missing = [ticker for ticker in tickers if prices.get(ticker) is None]
+            if not missing:
+                break
+            if i > 0:
+                print(f"Versuch {i + 1}/{tries}: {len(missing)} Kurse fehlen noch.")
+            prices.update(QuoteService.get_prices(missing, conn=conn))
+
+        # 2. Depotwerte vektorisiert berechnen und mit dem Barbestand verbinden
+        depot['price'] = depot['ticker'].map(prices).astype(float)
+        depot['value'] = depot['quantity'] * depot['price']
+        portfolio_values = depot.groupby('user_id_fk')['value'].sum()
+        users_missing_prices = set(depot.loc[depot['price'].isna(), 'user_id_fk'])
+
+        net_worths = users.set_index('user_id')['money'].add(portfolio_values, fill_value=0.0)
+        net_worths = net_worths[~net_worths.index.isin(users_missing_prices)]
+
+        # 3. Alle Einträge auf einmal schreiben
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        rows = [(int(user_id), float(net_worth), now) for user_id, net_worth in net_worths.items()]
+        LeaderboardEndpoint._record_net_worths(conn, rows)
+
+        if users_missing_prices:
+            print(f"{len(users_missing_prices)} Benutzer übersprungen, da Kurse fehlen.")
+        return {"success": True, "updated": len(rows), "skipped": len(users_missing_prices)}
 
     @staticmethod
     def delete_row(conn: sqlite3.Connection, row_id: int):
@@ -196,6 +228,56 @@ class LeaderboardEndpoint:
         except sqlite3.Error as e:
             print(f"Ein Datenbankfehler ist aufgetreten: {e}")
 
+    @staticmethod
+    def get_user_history(conn: sqlite3.Connection, user_id: int, since: str | None = None,
+                         max_points: int | None = None) -> list[dict]:
+        """
+        Holt die Vermögens-Historie EINES Benutzers (neueste zuerst), im selben Format wie
+        fetch_and_group_leaderboard() sie pro Benutzer liefert. Nutzt den Index (user_id_fk, last_updated).
+
+        :param since: optional, nur Einträge ab diesem Zeitpunkt ('%Y-%m-%d %H:%M:%S')
+        :param max_points: optional, dünnt die Historie gleichmäßig auf höchstens so viele Punkte aus.
+                           Der neueste und der älteste Eintrag bleiben immer erhalten.
+        :return: list[dict] mit den Schlüsseln date, net_worth und row_id
+        """
+        sql = "SELECT id, last_updated, net_worth FROM leaderboard WHERE user_id_fk = ?"
+        params = [user_id]
+        if since is not None:
+            sql += " AND last_updated >= ?"
+            params.append(since)
+        sql += " ORDER BY last_updated DESC"
+
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        history = [{"date": last_updated, "net_worth": net_worth, "row_id": row_id}
+                   for row_id, last_updated, net_worth in cursor.fetchall()]
+
+        if max_points is not None and 2 <= max_points < len(history):
+            step = (len(history) - 1) / (max_points - 1)
+            history = [history[round(i * step)] for i in range(max_points)]
+        return history
+
+    @staticmethod
+    def get_user_history_summary(conn: sqlite3.Connection, user_id: int) -> dict:
+        """
+        Kurzfassung der Vermögens-Historie EINES Benutzers, ohne sie ganz zu laden: Anzahl der Einträge
+        (höchstens bis 2 gezählt) und der älteste und neueste Wert. Drei kurze Zugriffe über den Index
+        (user_id_fk, last_updated).
+
+        :return: dict mit den Schlüsseln entries, oldest_net_worth und newest_net_worth (ohne Einträge None)
+        """
+        sql = """
+            SELECT
+                (SELECT COUNT(*) FROM (SELECT 1 FROM leaderboard WHERE user_id_fk = ? LIMIT 2)),
+                (SELECT net_worth FROM leaderboard WHERE user_id_fk = ? ORDER BY last_updated ASC LIMIT 1),
+                (SELECT net_worth FROM leaderboard WHERE user_id_fk = ? ORDER BY last_updated DESC LIMIT 1)
+        """
+        cursor = conn.cursor()
+        cursor.execute(sql, (user_id, user_id, user_id))
+        entries, oldest_net_worth, newest_net_worth = cursor.fetchone()
+        return {"entries": entries, "oldest_net_worth": oldest_net_worth, "newest_net_worth": newest_net_worth}
+
+    #unused
     @staticmethod
     def fetch_and_group_leaderboard(conn: sqlite3.Connection) -> dict:
         """
@@ -235,72 +317,92 @@ class LeaderboardEndpoint:
 
     @staticmethod
     def decimate_entries(conn:sqlite3.Connection, target:int=1000, use_time_delta=True):
-        use_time_delta = True #INOP
+        """
+        Dünnt die Historie jedes Benutzers auf höchstens target Einträge aus.
+        Die Benutzer werden nacheinander verarbeitet, es ist also immer nur die Historie EINES Benutzers
+        im Speicher. Pro Benutzer:
+          1. Bei drei gleichen aufeinanderfolgenden Werten wird der mittlere gelöscht.
+          2. Solange es zu viele Einträge gibt, wird der Abstand zwischen zwei Nachbarn mit der kürzesten
+             Zeitspanne zusammengelegt (Heap statt min() über die ganze Liste -> O(n log n)).
+        Der älteste und der neueste Eintrag bleiben immer erhalten.
+
+        :param use_time_delta: INOP, es wird immer nach Zeitabständen ausgedünnt
+        """
         if target < 10:
             return
-        all_data = LeaderboardEndpoint.fetch_and_group_leaderboard(conn)
 
-        to_delete_rows = []
-
-        for user_id, data in all_data.items():
-            user_to_delete_rows = []
-
-            # gleiche Werte Löschen
-            if len(data) >= 2:
-                for i in range(len(data) - 3, -1, -1):
-                    # in der Mitte löschen. Es wird bei 3 gleichen Werten der Wert in der mitte gelöscht
-                    if data[i]['net_worth'] == data[i + 1]['net_worth'] == data[i + 2]['net_worth']:
-                        user_to_delete_rows.append(data[i + 1]['row_id'])
-                        data.pop(i + 1)
-
-            if use_time_delta:
+        cursor = conn.cursor()
+        cursor.execute("SELECT DISTINCT user_id_fk FROM leaderboard")
+        user_ids = [row[0] for row in cursor.fetchall()]
 
-                delta = [data[i]["datetime"] - data[i - 1]["datetime"] for i in range(1, len(data))]
+        deleted = 0
+        for user_id in user_ids:
+            cursor.execute(
+                "SELECT id, last_updated, net_worth FROM leaderboard WHERE user_id_fk = ? ORDER BY last_updated",
+                (user_id,)
+            )
+            rows = cursor.fetchall()
+            if len(rows) < 3:
+                continue
 
-                while len(data) > target:
-                    minimum_delta = min(delta)
-                    index_min_delta = delta.index(minimum_delta)
-                    if index_min_delta == 0:
-                        index_min_delta = 1
+            row_ids = np.array([row[0] for row in rows], dtype=np.int64)
+            times = np.array([row[1] for row in rows], dtype='datetime64[s]').astype(np.int64)
+            net_worths = np.array([row[2] for row in rows], dtype=float)
 
-                    user_to_delete_rows.append(
-                        data.pop(index_min_delta)["row_id"]
-                    )
-                    delta[index_min_delta - 1] = delta[index_min_delta - 1] + delta.pop(index_min_delta)
+            # 1. gleiche Werte löschen: Punkte, deren beide Nachbarn denselben Wert haben
+            keep = np.ones(len(rows), dtype=bool)
+            keep[1:-1] = ~((net_worths[:-2] == net_worths[1:-1]) & (net_worths[1:-1] == net_worths[2:]))
 
+            # 2. nach Zeitabständen ausdünnen
+            kept_indices = np.flatnonzero(keep)
+            if len(kept_indices) > target:
+                survivors = LeaderboardEndpoint._merge_smallest_gaps(times[kept_indices], target)
+                keep[kept_indices[~survivors]] = False
 
-                #print(f"{user_id}: {len(user_to_delete_rows)} wurden gelöscht.")
-                to_delete_rows += user_to_delete_rows
-            #
-            #
-            # INOP
-            #
-            #
-            if not use_time_delta:
-                if len(data) >= 3:  # gleiche Werte Löschen
-                    relative_derivative_difference = []
-                    for i in range(len(data) - 1):
-                        delta_0_to_1 = (data[i + 1]["net_worth"] - data[i]["net_worth"]) / (data[i + 1]["datetime"] - data[i]["datetime"]).total_seconds()
-                        delta_0_to_2 = (data[i + 2]["net_worth"] - data[i]["net_worth"]) / (data[i + 2]["datetime"] - data[i]["datetime"]).total_seconds()
+            to_delete = row_ids[~keep]
+            if len(to_delete):
+                cursor.executemany("DELETE FROM leaderboard WHERE id = ?", [(int(row_id),) for row_id in to_delete])
+                deleted += len(to_delete)
 
-                    while len(data) > target:
-                        minimum_delta = min(delta)
-                        index_min_delta = delta.index(minimum_delta)
-                        if index_min_delta == 0:
-                            index_min_delta = 1
+        print(f"{deleted} Zeile(n) erfolgreich gelöscht.")
 
-                        user_to_delete_rows.append(
-                            data.pop(index_min_delta)["row_id"]
-                        )
-                        delta[index_min_delta - 1] = delta[index_min_delta - 1] + delta.pop(index_min_delta)
+    @staticmethod
+    def _merge_smallest_gaps(times: np.ndarray, target: int) -> np.ndarray:
+        """
+        Entfernt aus der aufsteigend sortierten Zeitreihe times so lange den Punkt am kürzesten Abstand,
+        bis nur noch target Punkte übrig sind. Gibt eine Maske der verbleibenden Punkte zurück.
+        Entfernt wird der jüngere Punkt des Abstands, außer es ist der neueste Eintrag, dann der ältere.
+        Veraltete Heap-Einträge (Nachbar wurde inzwischen entfernt) werden beim Herausnehmen verworfen.
+        """
+        n = len(times)
+        alive = np.ones(n, dtype=bool)
+        previous = list(range(-1, n - 1))
+        following = list(range(1, n + 1))
+        gaps = np.diff(times)
+        heap = [(int(gaps[i]), i, i + 1) for i in range(n - 1)]
+        heapq.heapify(heap)
+
+        remaining = n
+        while remaining > target and heap:
+            _, left, right = heapq.heappop(heap)
+            if not (alive[left] and alive[right] and following[left] == right):
+                continue
+            victim = left if right == n - 1 else right
 
+            before, after = previous[victim], following[victim]
+            alive[victim] = False
+            following[before] = after
+            if after < n:
+                previous[after] = before
+                heapq.heappush(heap, (int(times[after] - times[before]), before, after))
+            remaining -= 1
 
-        LeaderboardEndpoint.delete_multiple_rows(conn, to_delete_rows)
+        return alive
 
     @staticmethod
     def get_all_user_ids(conn) -> list[int]:
 
-        sql_query = "SELECT DISTINCT user_id_fk FROM leaderboard;"
+        sql_query = "SELECT user_id_fk FROM leaderboard_latest;"
 
         cursor = conn.cursor()
         cursor.execute(sql_query)
@@ -312,7 +414,7 @@ class LeaderboardEndpoint:
     @staticmethod
     def count_users(conn) -> int:
         # wie LeaderboardEndpont.get_all_user_ids() nur mit count
-        sql_query = "SELECT COUNT(DISTINCT user_id_fk) FROM leaderboard;"
+        sql_query = "SELECT COUNT(*) FROM leaderboard_latest;"
 
         cursor = conn.cursor()
         cursor.execute(sql_query)
@@ -0,0 +1,282 @@
+# backend/ohlc_store.py
+"""
+Lokaler Speicher für Kursverläufe (OHLCV-Kerzen) pro (Ticker, Intervall).
+Statt bei jedem Chart die komplette Historie mit stock.history() zu laden, werden die Kerzen in
+der Tabelle 'ohlc_bars' gehalten. Bei einem Aufruf wird nur das fehlende Ende seit der letzten
+gespeicherten Kerze nachgeladen. Die komplette Historie wird nur geholt, wenn ein längerer Zeitraum
+als bisher verlangt wird oder yfinance die alten Kurse angepasst hat (Split/Dividende, auto_adjust).
+
+'ohlc_meta' merkt sich pro (Ticker, Intervall), ab wann lückenlos gespeichert ist, wann zuletzt
+geholt wurde und in welcher Zeitzone die Börse liegt (für die Achsen im Chart).
+stock.history() blockiert im C-Code (curl) und läuft deshalb über eventlet.tpool.
+
+Kurze Zeiträume wie '5d' meinen bei yfinance Handelstage, nicht Kalendertage. Sie werden deshalb
+nicht über eine Uhrzeit abgeschnitten, sondern es werden die letzten N Handelstage (in der Zeitzone
+der Börse) aus den gespeicherten Kerzen genommen (SESSION_PERIODS).
+"""
+
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+import pandas as pd
+from eventlet import tpool
+import yfinance as yf
+
+from backend.fundamentals import YFINANCE_TIMEOUT_SECONDS
+
+INTRADAY_FRESHNESS_SECONDS = 60  # So lange gelten Minuten-/Stundenkerzen als aktuell
+DAILY_FRESHNESS_SECONDS = 15 * 60  # Tages-, Wochen- und Monatskerzen
+ADJUSTMENT_TOLERANCE = 1e-4  # Relative Abweichung, ab der eine Kerze als nachträglich angepasst gilt
+
+# Wie weit yfinance für ein Intervall höchstens zurückreicht. Ältere Kerzen werden nie angezeigt.
+INTRADAY_HORIZON = {
+    '1m': timedelta(days=7),
+    '2m': timedelta(days=60), '5m': timedelta(days=60), '15m': timedelta(days=60),
+    '30m': timedelta(days=60), '90m': timedelta(days=60),
+    '60m': timedelta(days=730), '1h': timedelta(days=730),
+}
+
+# Zeiträume in Handelstagen (wie yfinance sie versteht)
+SESSION_PERIODS = {'1d': 1, '2d': 2, '3d': 3, '4d': 4, '5d': 5}
+
+PERIOD_DELTAS = {
+    '1d': timedelta(days=1), '5d': timedelta(days=5), '7d': timedelta(days=7),
+    '1mo': timedelta(days=31), '2mo': timedelta(days=62), '60d': timedelta(days=60),
+    '3mo': timedelta(days=92), '6mo': timedelta(days=183), '1y': timedelta(days=366),
+    '2y': timedelta(days=731), '730d': timedelta(days=730), '5y': timedelta(days=1827),
+    '10y': timedelta(days=3653),
+}
+
+
+class OhlcStore:
+    """Liefert Kursverläufe wie stock.history(), aber aus dem lokalen Speicher."""
+
+    @staticmethod
+    def get_history(conn: sqlite3.Connection, ticker: str, period: str = "1y", interval: str = "1d") -> pd.DataFrame:
+        """
+        Gibt die Kerzen für period/interval als DataFrame (Open, High, Low, Close, Volume) mit
+        Zeitindex in der Zeitzone der Börse zurück, wie stock.history(auto_adjust=True, prepost=False).
+        Kann yfinance nicht erreicht werden, werden die gespeicherten Kerzen geliefert. Gibt es keine,
+        wird der Fehler weitergegeben.
+        """
+        now = datetime.now(timezone.utc)
+        sessions = SESSION_PERIODS.get(period)
+        meta = OhlcStore._read_meta(conn, ticker, interval)
+        last_ts = OhlcStore._last_timestamps(conn, ticker, interval)
+        if sessions:
+            # None = noch keine N Handelstage lückenlos gespeichert -> komplett holen
+            requested_start = OhlcStore._session_start(conn, ticker, interval, sessions, meta)
+        else:
+            requested_start = OhlcStore._period_start(period, now)
+
+        try:
+            if requested_start is None or \
+                    OhlcStore._needs_full_fetch(meta, last_ts, requested_start, interval, now):
+                OhlcStore._fetch_full(conn, ticker, period, interval, requested_start, meta, last_ts)
+            elif time.time() - meta['last_fetch'] > OhlcStore._freshness(interval):
+                if not OhlcStore._fetch_tail(conn, ticker, interval, last_ts):
+                    # Alte Kurse wurden angepasst -> alles verwerfen und neu holen
+                    OhlcStore._delete(conn, ticker, interval)
+                    OhlcStore._fetch_full(conn, ticker, period, interval, requested_start, None, [])
+        except Exception as e:
+            if not last_ts:
+                raise
+            print(f"[OHLC] Kurse für '{ticker}' ({interval}) konnten nicht aktualisiert werden, zeige gespeicherte: {e}")
+
+        if sessions:
+            # Nach dem Abruf neu bestimmen, es kann ein neuer Handelstag dazugekommen sein
+            meta = OhlcStore._read_meta(conn, ticker, interval)
+            requested_start = OhlcStore._session_start(conn, ticker, interval, sessions, meta)
+            if requested_start is None:
+                requested_start = meta['covered_from'] if meta else 0  # Weniger Handelstage gibt es nicht
+        return OhlcStore._read_bars(conn, ticker, interval, requested_start)
+
+    @staticmethod
+    def prune(conn: sqlite3.Connection) -> int:
+        """Löscht Minuten- und Stundenkerzen, die älter sind, als yfinance sie überhaupt anbietet."""
+        cursor = conn.cursor()
+        deleted = 0
+        now = datetime.now(timezone.utc)
+        for interval, horizon in INTRADAY_HORIZON.items():
+            cursor.execute("DELETE FROM ohlc_bars WHERE interval = ? AND ts < ?",
+                           (interval, int((now - horizon).timestamp())))
+            deleted += cursor.rowcount
+        return deleted
+
+    @staticmethod
+    def _needs_full_fetch(meta: dict | None, last_ts: list[int], requested_start: int, interval: str,
+                          now: datetime) -> bool:
+        if meta is None or not last_ts:
+            return True
+        if meta['covered_from'] > requested_start:
+            return True  # Es wird ein längerer Zeitraum verlangt als bisher gespeichert
+        horizon = INTRADAY_HORIZON.get(interval)
+        # Das fehlende Ende liegt weiter zurück, als yfinance für dieses Intervall noch liefert
+        return horizon is not None and last_ts[-1] < (now - horizon).timestamp()
+
+    @staticmethod
+    def _fetch_full(conn: sqlite3.Connection, ticker: str, period: str, interval: str, requested_start: int | None,
+                    meta: dict | None, last_ts: list[int]):
+        """Holt den ganzen Zeitraum. Ohne requested_start (Handelstage) gilt der Beginn, den yfinance liefert."""
+        frame = tpool.execute(_download_history, ticker, period=period, interval=interval)
+        if frame.empty:
+            return
+        first_new = int(frame.index[0].timestamp())
+        if requested_start is None:
+            requested_start = first_new
+        if meta is not None and last_ts and last_ts[-1] >= first_new:
+            # Neue und gespeicherte Kerzen überlappen -> der lückenlose Bereich wird größer
+            covered_from = min(meta['covered_from'], requested_start)
+        else:
+            OhlcStore._delete(conn, ticker, interval)
+            covered_from = requested_start
+        OhlcStore._store_bars(conn, ticker, interval, frame)
+        OhlcStore._store_meta(conn, ticker, interval, covered_from, str(frame.index.tz or 'UTC'))
+
+    @staticmethod
+    def _fetch_tail(conn: sqlite3.Connection, ticker: str, interval: str, last_ts: list[int]) -> bool:
+        """
+        Holt die Kerzen ab der vorletzten gespeicherten. Die letzte kann noch unvollständig sein und
+        wird überschrieben, die vorletzte dient als Vergleich: weicht sie ab, hat yfinance die Historie
+        angepasst und es wird False zurückgegeben.
+        """
+        start = datetime.fromtimestamp(last_ts[0], tz=timezone.utc)
+        frame = tpool.execute(_download_history, ticker, start=start, interval=interval)
+        if frame.empty:
+            OhlcStore._touch_meta(conn, ticker, interval)
+            return True
+
+        if len(last_ts) == 2:
+            stored_close = OhlcStore._close_at(conn, ticker, interval, last_ts[0])
+            fetched = frame[frame.index == pd.Timestamp(last_ts[0], unit='s', tz='UTC')]
+            if stored_close and not fetched.empty:
+                if abs(float(fetched['Close'].iloc[0]) - stored_close) / stored_close > ADJUSTMENT_TOLERANCE:
+                    return False
+
+        OhlcStore._store_bars(conn, ticker, interval, frame)
+        OhlcStore._touch_meta(conn, ticker, interval)
+        return True
+
+    @staticmethod
+    def _period_start(period: str, now: datetime) -> int:
+        """Beginn des Zeitraums als unix-zeit. 'max' = 0 (alles)."""
+        if period == 'max':
+            return 0
+        if period == 'ytd':
+            return int(datetime(now.year, 1, 1, tzinfo=timezone.utc).timestamp())
+        return int((now - PERIOD_DELTAS.get(period, PERIOD_DELTAS['1y'])).timestamp())
+
+    @staticmethod
+    def _session_start(conn: sqlite3.Connection, ticker: str, interval: str, sessions: int,
+                       meta: dict | None) -> int | None:
+        """
+        Zeitstempel der ersten Kerze der letzten `sessions` Handelstage im lückenlos gespeicherten Bereich.
+        Gibt None zurück, wenn dort weniger Handelstage liegen.
+        """
+        if meta is None:
+            return None
+        tz = ZoneInfo(meta['tz'])
+        cursor = conn.cursor()
+        # Rückwärts lesen und aufhören, sobald ein Handelstag zu viel erreicht ist
+        cursor.execute("""
+            SELECT ts FROM ohlc_bars WHERE ticker = ? AND interval = ? AND ts >= ?
+            ORDER BY ts DESC
+        """, (ticker, interval, meta['covered_from']))
+        dates = set()
+        first_ts = None
+        for (ts,) in cursor:
+            session_date = datetime.fromtimestamp(ts, tz).date()
+            if session_date not in dates:
+                if len(dates) == sessions:
+                    return first_ts
+                dates.add(session_date)
+            first_ts = ts
+        # Ab covered_from ist lückenlos gespeichert, genau N Handelstage reichen also
+        return first_ts if len(dates) == sessions else None
+
+    @staticmethod
+    def _freshness(interval: str) -> int:
+        return INTRADAY_FRESHNESS_SECONDS if interval in INTRADAY_HORIZON else DAILY_FRESHNESS_SECONDS
+
+    @staticmethod
+    def _read_meta(conn: sqlite3.Connection, ticker: str, interval: str) -> dict | None:
+        cursor = conn.cursor()
+        cursor.execute("SELECT covered_from, last_fetch, tz FROM ohlc_meta WHERE ticker = ? AND interval = ?",
+                       (ticker, interval))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        covered_from, last_fetch, tz = row
+        return {"covered_from": covered_from, "last_fetch": last_fetch, "tz": tz}
+
+    @staticmethod
+    def _last_timestamps(conn: sqlite3.Connection, ticker: str, interval: str) -> list[int]:
+        """Die Zeitstempel der letzten beiden gespeicherten Kerzen, aufsteigend."""
+        cursor = conn.cursor()
+        cursor.execute("SELECT ts FROM ohlc_bars WHERE ticker = ? AND interval = ? ORDER BY ts DESC LIMIT 2",
+                       (ticker, interval))
+        return sorted(row[0] for row in cursor.fetchall())
+
+    @staticmethod
+    def _close_at(conn: sqlite3.Connection, ticker: str, interval: str, ts: int) -> float | None:
+        cursor = conn.cursor()
+        cursor.execute("SELECT close FROM ohlc_bars WHERE ticker = ? AND interval = ? AND ts = ?",
+                       (ticker, interval, ts))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _read_bars(conn: sqlite3.Connection, ticker: str, interval: str, start: int) -> pd.DataFrame:
+        meta = OhlcStore._read_meta(conn, ticker, interval)
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT ts, open, high, low, close, volume FROM ohlc_bars
+            WHERE ticker = ? AND interval = ? AND ts >= ?
+            ORDER BY ts
+        """, (ticker, interval, start))
+        frame = pd.DataFrame(cursor.fetchall(), columns=['ts', 'Open', 'High', 'Low', 'Close', 'Volume'])
+        index = pd.to_datetime(frame.pop('ts'), unit='s', utc=True)
+        frame.index = pd.DatetimeIndex(index).tz_convert(meta['tz'] if meta else 'UTC')
+        frame.index.name = 'Datetime' if interval in INTRADAY_HORIZON else 'Date'
+        return frame
+
+    @staticmethod
+    def _store_bars(conn: sqlite3.Connection, ticker: str, interval: str, frame: pd.DataFrame):
+        frame = frame.dropna(subset=['Open', 'High', 'Low', 'Close'])
+        rows = [
+            (ticker, interval, int(ts.timestamp()), float(o), float(h), float(l), float(c), int(v or 0))
+            for ts, o, h, l, c, v in zip(frame.index, frame['Open'], frame['High'], frame['Low'],
+                                         frame['Close'], frame['Volume'].fillna(0))
+        ]
+        conn.executemany("""
+            INSERT INTO ohlc_bars (ticker, interval, ts, open, high, low, close, volume)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(ticker, interval, ts) DO UPDATE SET
+                open = excluded.open, high = excluded.high, low = excluded.low,
+                close = excluded.close, volume = excluded.volume
+        """, rows)
+
+    @staticmethod
+    def _store_meta(conn: sqlite3.Connection, ticker: str, interval: str, covered_from: int, tz: str):
+        conn.execute("""
+            INSERT INTO ohlc_meta (ticker, interval, covered_from, last_fetch, tz)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(ticker, interval) DO UPDATE SET
+                covered_from = excluded.covered_from, last_fetch = excluded.last_fetch, tz = excluded.tz
+        """, (ticker, interval, covered_from, time.time(), tz))
+
+    @staticmethod
+    def _touch_meta(conn: sqlite3.Connection, ticker: str, interval: str):
+        conn.execute("UPDATE ohlc_meta SET last_fetch = ? WHERE ticker = ? AND interval = ?",
+                     (time.time(), ticker, interval))
+
+    @staticmethod
+    def _delete(conn: sqlite3.Connection, ticker: str, interval: str):
+        conn.execute("DELETE FROM ohlc_bars WHERE ticker = ? AND interval = ?", (ticker, interval))
+        conn.execute("DELETE FROM ohlc_meta WHERE ticker = ? AND interval = ?", (ticker, interval))
+
+
+def _download_history(ticker: str, **kwargs) -> pd.DataFrame:
+    """stock.history() mit den Einstellungen des Speichers. Läuft in einem Thread von tpool."""
+    return yf.Ticker(ticker).history(auto_adjust=True, prepost=False, timeout=YFINANCE_TIMEOUT_SECONDS, **kwargs)
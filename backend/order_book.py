@@ -0,0 +1,156 @@
+# backend/order_book.py
+"""
+Orderbuch für die bedingten Aufträge (LIMIT_BUY, LIMIT_SELL, STOP_LOSS_SELL).
+Die offenen Aufträge werden pro Ticker in nach Preis sortierten Listen gehalten,
+so dass zu einem neuen Kurs nur die ausgelösten Aufträge in O(log n + k) gefunden werden.
+Das Buch lebt nur im Scheduler-Prozess und wird nur dort geschrieben: neue Aufträge werden über die
+fortlaufende order_id nachgeladen (sync), sobald sie festgeschrieben sind. Die Web-Worker fassen es nicht an.
+Stornierte Aufträge bleiben bis zum Auslösen oder bis zum täglichen rebuild im Buch, die Abrechnung
+ändert nur Aufträge, die noch 'OPEN' sind, und wirft sie dann hinaus.
+"""
+
+import bisect
+import math
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class Order:
+    order_id: int
+    user_id_fk: int
+    ticker: str
+    order_type: str
+    quantity: float
+    status: str
+    created_at: str
+    limit_price: Optional[float] = None
+    stop_price: Optional[float] = None
+    executed_at: Optional[str] = None
+    executed_price: Optional[float] = None
+
+    @property
+    def trigger_price(self) -> float:
+        """Der Preis, bei dem der Auftrag ausgelöst (und ausgeführt) wird."""
+        return self.stop_price if self.order_type == 'STOP_LOSS_SELL' else self.limit_price
+
+
+class _TickerBook:
+    """Sortierte Listen von (trigger_preis, order_id) für einen einzelnen Ticker."""
+
+    def __init__(self):
+        self.limit_buys: list[tuple[float, int]] = []  # ausgelöst, wenn Kurs <= Limit
+        self.limit_sells: list[tuple[float, int]] = []  # ausgelöst, wenn Kurs >= Limit
+        self.stop_losses: list[tuple[float, int]] = []  # ausgelöst, wenn Kurs <= Stop
+
+    def side(self, order_type: str) -> list[tuple[float, int]]:
+        if order_type == 'LIMIT_BUY':
+            return self.limit_buys
+        if order_type == 'LIMIT_SELL':
+            return self.limit_sells
+        return self.stop_losses
+
+    def crossed_ids(self, price: float) -> list[int]:
+        # Bei Kauf-Limit und Stop-Loss liegen die ausgelösten Einträge am oberen Ende der Liste,
+        # beim Verkaufs-Limit am unteren. bisect findet die Grenze jeweils in O(log n).
+        first_buy = bisect.bisect_left(self.limit_buys, (price,))
+        first_stop = bisect.bisect_left(self.stop_losses, (price,))
+        last_sell = bisect.bisect_right(self.limit_sells, (price, math.inf))
+        return ([order_id for _, order_id in self.limit_buys[first_buy:]]
+                + [order_id for _, order_id in self.stop_losses[first_stop:]]
+                + [order_id for _, order_id in self.limit_sells[:last_sell]])
+
+    def is_empty(self) -> bool:
+        return not (self.limit_buys or self.limit_sells or self.stop_losses)
+
+
+class OrderBook:
+    """Hält alle offenen bedingten Aufträge eines Prozesses, gruppiert nach Ticker."""
+
+    CONDITIONAL_ORDER_TYPES = ('LIMIT_BUY', 'LIMIT_SELL', 'STOP_LOSS_SELL')
+
+    def __init__(self):
+        self._books: dict[str, _TickerBook] = {}
+        self._orders: dict[int, Order] = {}
+        self._last_synced_order_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def add(self, order: Order):
+        """Trägt einen offenen Auftrag ein. Bereits bekannte Aufträge werden ignoriert."""
+        if order.order_type not in OrderBook.CONDITIONAL_ORDER_TYPES or order.trigger_price is None:
+            return
+        with self._lock:
+            if order.order_id in self._orders:
+                return
+            self._orders[order.order_id] = order
+            book = self._books.setdefault(order.ticker, _TickerBook())
+            bisect.insort(book.side(order.order_type), (order.trigger_price, order.order_id))
+
+    def remove(self, order_id: int) -> Order | None:
+        """Entfernt einen Auftrag (ausgeführt, storniert oder fehlgeschlagen) aus dem Buch."""
+        with self._lock:
+            order = self._orders.pop(order_id, None)
+            if order is None:
+                return None
+            book = self._books[order.ticker]
+            side = book.side(order.order_type)
+            index = bisect.bisect_left(side, (order.trigger_price, order.order_id))
+            if index < len(side) and side[index] == (order.trigger_price, order.order_id):
+                side.pop(index)
+            if book.is_empty():
+                del self._books[order.ticker]
+            return order
+
+    def crossed(self, ticker: str, price: float) -> list[Order]:
+        """Gibt alle Aufträge für ticker zurück, die beim Kurs price ausgelöst werden (älteste zuerst)."""
+        with self._lock:
+            book = self._books.get(ticker)
+            if book is None:
+                return []
+            order_ids = sorted(book.crossed_ids(price))
+            return [self._orders[order_id] for order_id in order_ids]
+
+    def tickers(self) -> set[str]:
+        """Alle Ticker, für die es offene Aufträge gibt."""
+        with self._lock:
+            return set(self._books.keys())
+
+    def sync(self, conn: sqlite3.Connection) -> int:
+        """
+        Lädt nur die offenen Aufträge nach, die seit dem letzten Abgleich hinzugekommen sind
+        (z.B. von einem anderen gunicorn-Worker platziert). Gibt die Anzahl neuer Aufträge zurück.
+        """
+        placeholders = ', '.join(['?'] * len(OrderBook.CONDITIONAL_ORDER_TYPES))
+        sql = f"""
+            SELECT * FROM orders
+            WHERE status = 'OPEN' AND order_id > ? AND order_type IN ({placeholders})
+            ORDER BY order_id
+        """
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute(sql, (self._last_synced_order_id, *OrderBook.CONDITIONAL_ORDER_TYPES))
+        new_orders = [Order(**dict(row)) for row in cursor.fetchall()]
+        conn.row_factory = None
+
+        for order in new_orders:
+            self.add(order)
+        if new_orders:
+            self._last_synced_order_id = max(self._last_synced_order_id, new_orders[-1].order_id)
+        return len(new_orders)
+
+    def rebuild(self, conn: sqlite3.Connection) -> int:
+        """Baut das Buch komplett neu aus der Tabelle auf (z.B. einmal täglich, um Altlasten zu entfernen)."""
+        with self._lock:
+            self._books = {}
+            self._orders = {}
+            self._last_synced_order_id = 0
+        return self.sync(conn)
+
+
+# Ein Orderbuch pro Prozess, benutzt wird es nur im Scheduler (siehe backend/jobs.py)
+ORDER_BOOK = OrderBook()
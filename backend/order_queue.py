@@ -0,0 +1,176 @@
+# backend/order_queue.py
+"""
+Warteschlange für Market-Aufträge.
+Früher wurde ein Market-Auftrag direkt in der Webanfrage ausgeführt. Dafür musste der Worker auf den
+Kurs von yfinance warten. Jetzt wird der Auftrag nur in 'order_queue' eingetragen, die Anfrage kehrt
+sofort mit der queue_id zurück. Der Job process_pending() (alle paar Sekunden im Scheduler) holt alle
+wartenden Aufträge, fragt die Kurse aller betroffenen Ticker mit einem Abruf ab und führt die Aufträge aus.
+Der Status kann über /api/order-status/<queue_id> abgefragt werden.
+
+Ablauf eines Eintrags: PENDING -> PROCESSING -> EXECUTED / FAILED
+"""
+
+import sqlite3
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from backend.accounts_to_database import AccountEndpoint
+from backend.quote_service import QuoteService
+
+MARKET_ORDER_TYPES = ('MARKET_BUY', 'MARKET_SELL')
+MARKET_ORDER_QUOTE_MAX_AGE = 15  # Sekunden, Market-Aufträge sollen zu einem frischen Kurs laufen
+STALE_CLAIM_MINUTES = 5  # Ist ein Job dazwischen abgestürzt, werden seine Einträge danach erneut versucht
+
+
+class OrderQueue:
+    """Einreihen, Abarbeiten und Abfragen der Market-Aufträge."""
+
+    @staticmethod
+    def enqueue(conn: sqlite3.Connection, user_id: int, ticker: str, order_type: str, quantity: int) -> dict:
+        """Reiht einen Market-Auftrag ein. Gibt die queue_id zurück, es wird kein Kurs abgefragt."""
+        if order_type not in MARKET_ORDER_TYPES:
+            return {"success": False, "message": f"Unbekannter Market-Auftragstyp: {order_type}"}
+        if not quantity or quantity <= 0:
+            return {"success": False, "message": "Die Menge muss größer als 0 sein."}
+        precheck = OrderQueue._precheck(conn, user_id, ticker, order_type, quantity)
+        if precheck is not None:
+            return precheck
+        sql = """
+            INSERT INTO order_queue (user_id_fk, ticker, order_type, quantity, status, created_at)
+            VALUES (?, ?, ?, ?, 'PENDING', ?)
+        """
+        try:
+            cursor = conn.cursor()
+            cursor.execute(sql, (user_id, ticker, order_type, quantity, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+        except sqlite3.Error as e:
+            return {"success": False, "message": f"Datenbankfehler: {e}"}
+        return {"success": True, "queue_id": cursor.lastrowid,
+                "message": f"Market-Auftrag für {quantity} {ticker} angenommen, er wird in wenigen Sekunden ausgeführt."}
+
+    @staticmethod
+    def _precheck(conn: sqlite3.Connection, user_id: int, ticker: str, order_type: str, quantity: int) -> dict | None:
+        """
+        Die Prüfungen der früheren direkten Ausführung, damit der User den Fehler sofort sieht statt später
+        als FAILED: Guthaben beim Kauf (mit dem zuletzt bekannten Kurs, ohne Abruf bei yfinance) und
+        Bestand beim Verkauf. Gibt die Fehlermeldung zurück oder None. Verbindlich prüft erst die Abrechnung.
+        """
+        # Import hier, weil backend.trading diese Datei für place_order importiert
+        from backend.trading import TradingEndpoint
+
+        if order_type == 'MARKET_BUY':
+            price = QuoteService.get_cached_prices([ticker], conn=conn).get(ticker)
+            balance = AccountEndpoint.get_balance(conn, user_id=user_id)
+            if balance is None or (price is not None and balance < price * quantity):
+                return {"success": False, "message": "Nicht genügend Guthaben für diesen Kauf."}
+        else:
+            position = TradingEndpoint.get_user_position(conn, user_id, ticker)
+            if position is None or position['quantity'] < quantity:
+                return {"success": False, "message": "Nicht genügend Aktien im Depot für diesen Verkauf."}
+        return None
+
+    @staticmethod
+    def get_status(conn: sqlite3.Connection, user_id: int, queue_id: int) -> dict | None:
+        """Status eines Eintrags. Nur für den Besitzer, sonst None."""
+        sql = """
+            SELECT queue_id, ticker, order_type, quantity, status, message, order_id_fk, created_at, processed_at
+            FROM order_queue WHERE queue_id = ? AND user_id_fk = ?
+        """
+        cursor = conn.cursor()
+        cursor.execute(sql, (queue_id, user_id))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        keys = ('queue_id', 'ticker', 'order_type', 'quantity', 'status', 'message', 'order_id', 'created_at',
+                'processed_at')
+        return dict(zip(keys, row))
+
+    @staticmethod
+    def get_pending_for_user(conn: sqlite3.Connection, user_id: int) -> list[dict]:
+        """Die noch nicht ausgeführten Market-Aufträge eines Users (älteste zuerst)."""
+        sql = """
+            SELECT queue_id, ticker, order_type, quantity, created_at FROM order_queue
+            WHERE user_id_fk = ? AND status IN ('PENDING', 'PROCESSING')
+            ORDER BY queue_id
+        """
+        cursor = conn.cursor()
+        cursor.execute(sql, (user_id,))
+        keys = ('queue_id', 'ticker', 'order_type', 'quantity', 'created_at')
+        return [dict(zip(keys, row)) for row in cursor.fetchall()]
+
+    @staticmethod
+    def process_pending(conn: sqlite3.Connection) -> int:
+        """
+        Führt alle wartenden Market-Aufträge aus. Die Kurse aller betroffenen Ticker werden gemeinsam
+        über den Kursdienst geholt, danach wird jeder Auftrag einzeln abgerechnet und festgeschrieben,
+        damit ein fehlgeschlagener Auftrag die anderen nicht mit zurückrollt.
+        Gibt die Anzahl bearbeiteter Aufträge zurück.
+        """
+        # Import hier, weil backend.trading diese Datei für place_order importiert
+        from backend.trading import TradingEndpoint
+
+        orders = OrderQueue._claim(conn)
+        if not orders:
+            return 0
+
+        by_ticker = defaultdict(list)
+        for order in orders:
+            by_ticker[order['ticker']].append(order)
+        prices = QuoteService.get_prices(by_ticker.keys(), conn=conn, max_age=MARKET_ORDER_QUOTE_MAX_AGE)
+        conn.commit()  # Neu geholte Kurse festschreiben, danach eine Transaktion pro Auftrag
+
+        for ticker, ticker_orders in by_ticker.items():
+            price = prices.get(ticker)
+            for order in ticker_orders:
+                # Abrechnung (settle_trade als SAVEPOINT) und Statuswechsel in einer Transaktion
+                conn.execute("BEGIN IMMEDIATE")
+                if not price:
+                    result = {"success": False, "message": f"Konnte aktuellen Preis für {ticker} nicht abrufen."}
+                else:
+                    try:
+                        result = TradingEndpoint._execute_market_trade(
+                            conn, order['user_id_fk'], ticker, order['quantity'],
+                            is_buy=order['order_type'] == 'MARKET_BUY', price=price)
+                    except Exception as e:
+                        result = {"success": False, "message": f"Fehler bei der Ausführung: {e}"}
+                OrderQueue._finish(conn, order['queue_id'], result)
+                conn.commit()
+        print(f"[Order-Queue] {len(orders)} Market-Aufträge für {len(by_ticker)} Ticker bearbeitet.")
+        return len(orders)
+
+    @staticmethod
+    def _claim(conn: sqlite3.Connection) -> list[dict]:
+        """
+        Markiert alle wartenden Einträge als PROCESSING und gibt sie zurück (nach queue_id sortiert).
+        Einträge, die seit STALE_CLAIM_MINUTES in PROCESSING hängen, werden erneut übernommen.
+        Da Abrechnung und Statuswechsel in derselben Transaktion passieren, wird dabei nichts doppelt ausgeführt.
+        """
+        now = datetime.now()
+        stale_before = (now - timedelta(minutes=STALE_CLAIM_MINUTES)).strftime('%Y-%m-%d %H:%M:%S')
+        cursor = conn.cursor()
+        # Meistens ist die Warteschlange leer: dann nur lesen und die Schreibsperre gar nicht erst holen
+        cursor.execute("""
+            SELECT 1 FROM order_queue
+            WHERE status = 'PENDING' OR (status = 'PROCESSING' AND claimed_at < ?)
+            LIMIT 1
+        """, (stale_before,))
+        if cursor.fetchone() is None:
+            return []
+        sql = """
+            UPDATE order_queue SET status = 'PROCESSING', claimed_at = ?
+            WHERE status = 'PENDING' OR (status = 'PROCESSING' AND claimed_at < ?)
+            RETURNING queue_id, user_id_fk, ticker, order_type, quantity
+        """
+        cursor.execute(sql, (now.strftime('%Y-%m-%d %H:%M:%S'), stale_before))
+        keys = ('queue_id', 'user_id_fk', 'ticker', 'order_type', 'quantity')
+        orders = sorted((dict(zip(keys, row)) for row in cursor.fetchall()), key=lambda order: order['queue_id'])
+        conn.commit()
+        return orders
+
+    @staticmethod
+    def _finish(conn: sqlite3.Connection, queue_id: int, result: dict):
+        sql = """
+            UPDATE order_queue SET status = ?, message = ?, order_id_fk = ?, processed_at = ?
+            WHERE queue_id = ?
+        """
+        conn.execute(sql, ('EXECUTED' if result.get('success') else 'FAILED', result.get('message'),
+                           result.get('order_id'), datetime.now().strftime('%Y-%m-%d %H:%M:%S'), queue_id))
@@ -0,0 +1,133 @@
+# backend/quote_broadcaster.py
+"""
+Live-Kurse über Socket.IO (Namespace '/live').
+Die Seiten melden die Ticker, die sie anzeigen, mit 'subscribe' an und landen pro Ticker im Raum
+'quote:<TICKER>'. Eine Hintergrund-Aufgabe pro Worker fragt alle angemeldeten Ticker gemeinsam alle
+QUOTE_BROADCAST_INTERVAL_SECONDS über den Kursdienst ab (ein Abruf für alle Ticker, dazu der gemeinsame
+Cache in 'quotes') und schickt nur geänderte Kurse als 'quote' in den jeweiligen Raum.
+Die Last bei yfinance hängt damit von der Zahl der verschiedenen Ticker ab, nicht von den Seitenaufrufen.
+Damit diese Zahl begrenzt bleibt, werden nur bekannte Ticker angenommen (siehe TickerValidity.known) und
+pro Worker höchstens MAX_POLLED_TICKERS verschiedene abgefragt. Anmelden dürfen sich nur eingeloggte Benutzer.
+"""
+
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+from backend.quote_service import QuoteService
+from backend.ticker_validity import TickerValidity
+
+LIVE_NAMESPACE = '/live'
+QUOTE_BROADCAST_INTERVAL_SECONDS = 15
+MAX_TICKERS_PER_CLIENT = 50
+MAX_POLLED_TICKERS = 500  # Verschiedene Ticker pro Worker, die regelmäßig abgefragt werden
+TICKER_PATTERN = re.compile(r"^[A-Z0-9.\-^=]{1,15}$")
+
+
+class QuoteBroadcaster:
+    """Merkt sich, welche Verbindung welche Ticker sehen will, und verteilt die Kurse."""
+
+    _subscriptions: dict[str, set[str]] = {}  # ticker -> sids der Verbindungen
+    _last_prices: dict[str, float] = {}  # ticker -> zuletzt verschickter Kurs
+    _lock = threading.Lock()
+    _task = None
+
+    @staticmethod
+    def room(ticker: str) -> str:
+        return f"quote:{ticker}"
+
+    @staticmethod
+    def subscribe(sid: str, tickers, conn: sqlite3.Connection) -> list[str]:
+        """
+        Meldet eine Verbindung für Ticker an. Gibt die angenommenen Ticker zurück.
+        Angenommen werden nur bekannte Ticker, und neue nur, solange MAX_POLLED_TICKERS nicht erreicht ist.
+        """
+        candidates = list(dict.fromkeys(
+            ticker for ticker in (str(t).strip().upper() for t in (tickers or [])[:MAX_TICKERS_PER_CLIENT])
+            if TICKER_PATTERN.match(ticker)
+        ))
+        known = TickerValidity.known(conn, candidates)
+        accepted = []
+        with QuoteBroadcaster._lock:
+            already = sum(sid in sids for sids in QuoteBroadcaster._subscriptions.values())
+            for ticker in candidates:
+                if ticker not in known:
+                    continue
+                if ticker not in QuoteBroadcaster._subscriptions and \
+                        len(QuoteBroadcaster._subscriptions) >= MAX_POLLED_TICKERS:
+                    continue
+                sids = QuoteBroadcaster._subscriptions.setdefault(ticker, set())
+                if sid not in sids:
+                    if already >= MAX_TICKERS_PER_CLIENT:
+                        break
+                    sids.add(sid)
+                    already += 1
+                accepted.append(ticker)
+        return accepted
+
+    @staticmethod
+    def unsubscribe(sid: str, tickers=None) -> list[str]:
+        """Meldet Ticker ab (ohne tickers: alle, z.B. beim Trennen). Gibt die abgemeldeten Ticker zurück."""
+        removed = []
+        with QuoteBroadcaster._lock:
+            wanted = None if tickers is None else {str(ticker).strip().upper() for ticker in tickers}
+            for ticker, sids in list(QuoteBroadcaster._subscriptions.items()):
+                if (wanted is None or ticker in wanted) and sid in sids:
+                    sids.discard(sid)
+                    removed.append(ticker)
+                    if not sids:
+                        del QuoteBroadcaster._subscriptions[ticker]
+                        QuoteBroadcaster._last_prices.pop(ticker, None)
+        return removed
+
+    @staticmethod
+    def last_prices(tickers: list[str]) -> dict[str, float]:
+        """Die zuletzt verschickten Kurse, damit neue Abonnenten nicht bis zur nächsten Runde warten."""
+        with QuoteBroadcaster._lock:
+            return {ticker: QuoteBroadcaster._last_prices[ticker]
+                    for ticker in tickers if ticker in QuoteBroadcaster._last_prices}
+
+    @staticmethod
+    def ensure_started(socketio, app, get_db, interval: float = QUOTE_BROADCAST_INTERVAL_SECONDS):
+        """Startet die Hintergrund-Aufgabe dieses Workers beim ersten Abonnenten."""
+        with QuoteBroadcaster._lock:
+            if QuoteBroadcaster._task is not None:
+                return
+            QuoteBroadcaster._task = socketio.start_background_task(
+                QuoteBroadcaster._run, socketio, app, get_db, interval)
+
+    @staticmethod
+    def _run(socketio, app, get_db, interval: float):
+        while True:
+            socketio.sleep(interval)
+            try:
+                with app.app_context():
+                    QuoteBroadcaster.broadcast_once(socketio, get_db(), max_age=interval)
+            except Exception as e:
+                print(f"[Live-Kurse] Fehler beim Verteilen der Kurse: {e}")
+
+    @staticmethod
+    def broadcast_once(socketio, conn, max_age: float = QUOTE_BROADCAST_INTERVAL_SECONDS) -> int:
+        """Fragt alle abonnierten Ticker gemeinsam ab und verschickt die geänderten. Gibt deren Anzahl zurück."""
+        with QuoteBroadcaster._lock:
+            tickers = list(QuoteBroadcaster._subscriptions)
+        if not tickers:
+            return 0
+
+        prices = QuoteService.get_prices(tickers, conn=conn, max_age=max_age)
+        now_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        changed = {}
+        with QuoteBroadcaster._lock:
+            for ticker, price in prices.items():
+                if price is None or ticker not in QuoteBroadcaster._subscriptions:
+                    continue
+                previous = QuoteBroadcaster._last_prices.get(ticker)
+                if previous != price:
+                    QuoteBroadcaster._last_prices[ticker] = price
+                    changed[ticker] = (price, previous)
+
+        for ticker, (price, previous) in changed.items():
+            socketio.emit('quote', {"ticker": ticker, "price": price, "previous": previous, "time": now_str},
+                          to=QuoteBroadcaster.room(ticker), namespace=LIVE_NAMESPACE)
+        return len(changed)
@@ -0,0 +1,237 @@
+# backend/quote_service.py
+"""
+Zentraler Kursdienst für alle Preisabfragen über yfinance.
+Kurse werden in zwei Stufen zwischengespeichert:
+1. pro Prozess im Speicher (schnell, aber nur für diesen gunicorn-Worker sichtbar)
+2. in der SQLite-Tabelle 'quotes' (gemeinsam für alle Worker und den Scheduler), Zeitpunkte in UTC
+Erst wenn beide Stufen veraltet sind, wird yfinance gefragt. Fehlende Kurse werden
+gesammelt mit einem einzigen yf.download geholt und gleichzeitige Anfragen für
+denselben Ticker warten auf denselben Abruf.
+yf.download blockiert im C-Code (curl), deshalb läuft der Abruf über eventlet.tpool in einem echten Thread,
+damit die anderen Greenlets (Anfragen, Socket.IO) in der Zeit weiterlaufen.
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from eventlet import tpool
+import yfinance as yf
+
+from backend.fundamentals import YFINANCE_TIMEOUT_SECONDS
+
+QUOTE_TTL_SECONDS = 60  # So lange gilt ein Kurs als aktuell
+IN_FLIGHT_TIMEOUT_SECONDS = 30  # Maximale Wartezeit auf den Abruf eines anderen Threads
+QUOTE_SOURCE = 'yfinance'
+CLOCK_SLACK_SECONDS = 5  # Einträge, die weiter in der Zukunft liegen, stammen nicht aus UTC und gelten als veraltet
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class QuoteService:
+    """Bündelt alle Kursabfragen und zählt, wie viele Abrufe bei yfinance gespart werden."""
+
+    _cache: dict[str, tuple[float, float]] = {}  # ticker -> (preis, zeitpunkt des abrufs als unix-zeit)
+    _in_flight: dict[str, threading.Event] = {}  # ticker -> Event, das nach dem Abruf gesetzt wird
+    _lock = threading.Lock()
+    _stats = {"hits": 0, "db_hits": 0, "misses": 0, "coalesced": 0, "upstream_calls": 0, "upstream_errors": 0}
+
+    @staticmethod
+    def get_price(ticker: str, conn: sqlite3.Connection | None = None,
+                  max_age: float = QUOTE_TTL_SECONDS) -> float | None:
+        """Gibt den aktuellen Kurs eines einzelnen Tickers zurück oder None."""
+        return QuoteService.get_prices([ticker], conn=conn, max_age=max_age).get(ticker)
+
+    @staticmethod
+    def get_prices(tickers, conn: sqlite3.Connection | None = None,
+                   max_age: float = QUOTE_TTL_SECONDS) -> dict[str, float | None]:
+        """
+        Gibt die aktuellen Kurse für mehrere Ticker zurück.
+        Wird eine Verbindung übergeben, wird die Tabelle 'quotes' als zweite Cache-Stufe
+        gelesen und mit neu geholten Kursen aktualisiert.
+        Ticker, für die kein Kurs ermittelt werden konnte, haben den Wert None.
+        """
+        result: dict[str, float | None] = {}
+        missing: list[str] = []
+        now = time.time()
+
+        # 1. Cache im Speicher
+        with QuoteService._lock:
+            for ticker in {t for t in tickers if t}:
+                cached = QuoteService._cache.get(ticker)
+                if cached and now - cached[1] <= max_age:
+                    result[ticker] = cached[0]
+                    QuoteService._stats["hits"] += 1
+                else:
+                    missing.append(ticker)
+
+        # 2. Gemeinsamer Cache in der Datenbank (von anderen Workern geholte Kurse)
+        if missing and conn is not None:
+            stored = QuoteService._read_stored_quotes(conn, missing, now - max_age)
+            if stored:
+                with QuoteService._lock:
+                    for ticker, (price, fetched_at) in stored.items():
+                        QuoteService._cache[ticker] = (price, fetched_at)
+                        result[ticker] = price
+                        QuoteService._stats["db_hits"] += 1
+                missing = [ticker for ticker in missing if ticker not in stored]
+
+        # 3. Rest bei yfinance holen, laufende Abrufe anderer Requests mitbenutzen
+        to_fetch: list[str] = []
+        to_wait: dict[str, threading.Event] = {}
+        with QuoteService._lock:
+            for ticker in missing:
+                if ticker in QuoteService._in_flight:
+                    to_wait[ticker] = QuoteService._in_flight[ticker]
+                    QuoteService._stats["coalesced"] += 1
+                else:
+                    QuoteService._in_flight[ticker] = threading.Event()
+                    to_fetch.append(ticker)
+                    QuoteService._stats["misses"] += 1
+
+        if to_fetch:
+            fetched: dict[str, float | None] = {}
+            fetched_at = time.time()
+            try:
+                fetched = QuoteService._download(to_fetch)
+            finally:
+                # Auch bei Fehlern müssen wartende Requests wieder freigegeben werden
+                with QuoteService._lock:
+                    for ticker in to_fetch:
+                        if fetched.get(ticker) is not None:
+                            QuoteService._cache[ticker] = (fetched[ticker], fetched_at)
+                        QuoteService._in_flight.pop(ticker).set()
+            for ticker in to_fetch:
+                result[ticker] = fetched.get(ticker)
+            if conn is not None:
+                QuoteService._store_quotes(conn, fetched, fetched_at)
+
+        for ticker, event in to_wait.items():
+            event.wait(IN_FLIGHT_TIMEOUT_SECONDS)
+            # Nach Zeitüberschreitung oder fehlgeschlagenem Abruf steht evtl. nur ein alter Kurs im Cache
+            with QuoteService._lock:
+                cached = QuoteService._cache.get(ticker)
+            result[ticker] = cached[0] if cached and time.time() - cached[1] <= max_age else None
+
+        return result
+
+    @staticmethod
+    def get_cached_prices(tickers, conn: sqlite3.Connection | None = None) -> dict[str, float | None]:
+        """
+        Gibt die zuletzt bekannten Kurse zurück, egal wie alt, und fragt yfinance nie.
+        Erst der Speicher, dann die Tabelle 'quotes'. Ticker ohne bekannten Kurs haben den Wert None.
+        """
+        result: dict[str, float | None] = {}
+        missing: list[str] = []
+        with QuoteService._lock:
+            for ticker in {t for t in tickers if t}:
+                cached = QuoteService._cache.get(ticker)
+                if cached:
+                    result[ticker] = cached[0]
+                    QuoteService._stats["hits"] += 1
+                else:
+                    missing.append(ticker)
+
+        stored = QuoteService._read_stored_quotes(conn, missing, 0) if missing and conn is not None else {}
+        with QuoteService._lock:
+            for ticker in missing:
+                if ticker in stored:
+                    QuoteService._cache[ticker] = stored[ticker]
+                    QuoteService._stats["db_hits"] += 1
+                result[ticker] = stored[ticker][0] if ticker in stored else None
+        return result
+
+    @staticmethod
+    def get_stats() -> dict:
+        """Gibt die Zähler für Cache-Treffer und Abrufe bei yfinance zurück."""
+        with QuoteService._lock:
+            stats = dict(QuoteService._stats)
+            stats["cached_tickers"] = len(QuoteService._cache)
+        served_without_upstream = stats["hits"] + stats["db_hits"] + stats["coalesced"]
+        lookups = served_without_upstream + stats["misses"]
+        stats["hit_rate"] = served_without_upstream / lookups if lookups else 0.0
+        return stats
+
+    @staticmethod
+    def _read_stored_quotes(conn: sqlite3.Connection, tickers: list[str],
+                            oldest_allowed: float) -> dict[str, tuple[float, float]]:
+        """
+        Liest alle Kurse aus 'quotes', die nicht älter als oldest_allowed (unix-zeit) sind.
+        Einträge aus der Zukunft (z.B. noch in Ortszeit gespeichert) werden ignoriert.
+        """
+        placeholders = ', '.join(['?'] * len(tickers))
+        sql = f"""
+            SELECT ticker, price, fetched_at FROM quotes
+            WHERE ticker IN ({placeholders}) AND fetched_at >= ? AND fetched_at <= ?
+        """
+        newest_allowed = time.time() + CLOCK_SLACK_SECONDS
+        try:
+            cursor = conn.cursor()
+            cursor.execute(sql, (*tickers, _to_utc_string(oldest_allowed), _to_utc_string(newest_allowed)))
+            rows = cursor.fetchall()
+        except sqlite3.Error as e:
+            print(f"[Kursdienst] Tabelle 'quotes' konnte nicht gelesen werden: {e}")
+            return {}
+        return {ticker: (price, _from_utc_string(fetched_at)) for ticker, price, fetched_at in rows}
+
+    @staticmethod
+    def _store_quotes(conn: sqlite3.Connection, prices: dict[str, float | None], fetched_at: float):
+        """
+        Schreibt neu geholte Kurse in 'quotes', damit andere Worker sie mitbenutzen können.
+        Ohne laufende Transaktion des Aufrufers wird das in einer eigenen kurzen Transaktion sofort
+        festgeschrieben (auch auf reinen Lese-Wegen). Läuft schon eine, wird nichts Fremdes mit
+        festgeschrieben, die Kurse gehören dann zu ihr.
+        """
+        fetched_at_str = _to_utc_string(fetched_at)
+        rows = [(ticker, price, fetched_at_str, QUOTE_SOURCE) for ticker, price in prices.items() if price is not None]
+        if not rows:
+            return
+        sql = """
+            INSERT INTO quotes (ticker, price, fetched_at, source)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(ticker) DO UPDATE SET
+                price = excluded.price, fetched_at = excluded.fetched_at, source = excluded.source
+        """
+        own_transaction = not conn.in_transaction
+        try:
+            conn.executemany(sql, rows)
+            if own_transaction:
+                conn.commit()
+        except sqlite3.Error as e:
+            if own_transaction:
+                conn.rollback()
+            print(f"[Kursdienst] Kurse konnten nicht in 'quotes' gespeichert werden: {e}")
+
+    @staticmethod
+    def _download(tickers: list[str]) -> dict[str, float | None]:
+        """Holt die letzten Schlusskurse aller übergebenen Ticker mit einem einzigen yf.download."""
+        prices: dict[str, float | None] = {ticker: None for ticker in tickers}
+        with QuoteService._lock:
+            QuoteService._stats["upstream_calls"] += 1
+        try:
+            data = tpool.execute(yf.download, tickers, period="1d", progress=False, group_by='ticker', auto_adjust=True,
+                                 timeout=YFINANCE_TIMEOUT_SECONDS)
+        except Exception as e:
+            print(f"[Kursdienst] Fehler beim Abrufen der Kurse von yfinance: {e}")
+            with QuoteService._lock:
+                QuoteService._stats["upstream_errors"] += 1
+            return prices
+
+        if data is None or data.empty:
+            return prices
+
+        for ticker in tickers:
+            try:
+                closes = data[ticker]['Close'].dropna()
+            except KeyError:
+                continue
+            if not closes.empty:
+                prices[ticker] = float(closes.iloc[-1])
+        return prices
+
+
+def _to_utc_string(unix_time: float) -> str:
+    return datetime.fromtimestamp(unix_time, tz=timezone.utc).strftime(TIMESTAMP_FORMAT)
+
+
+def _from_utc_string(timestamp: str) -> float:
+    return datetime.strptime(timestamp, TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc).timestamp()
@@ -0,0 +1,158 @@
+# backend/symbol_index.py
+"""
+Lokales Symbolverzeichnis für die Aktiensuche.
+Die Tabelle 'symbols' wird aus jeder Antwort von Alpha Vantage und aus importierten CSV-Listen
+(z.B. LISTING_STATUS von Alpha Vantage) gefüllt. Gesucht wird über den FTS5-Index 'symbols_fts'
+(Präfixsuche auf Symbol und Name), ohne FTS5 über LIKE. Nur wenn lokal nichts gefunden wird,
+muss die Suche noch bei Alpha Vantage nachfragen.
+
+CSV importieren:
+    python -m backend.symbol_index listing_status.csv
+"""
+
+import csv
+import re
+import sqlite3
+import sys
+
+SEARCH_LIMIT = 10
+
+
+class SymbolIndex:
+    """Suchen und Befüllen des lokalen Symbolverzeichnisses."""
+
+    @staticmethod
+    def search(conn: sqlite3.Connection, query: str, limit: int = SEARCH_LIMIT) -> list[dict]:
+        """
+        Sucht nach Symbolen, deren Symbol oder Name mit den Wörtern der Anfrage beginnt.
+        Exakte Symbol-Treffer stehen vorne, danach Symbol-Präfixe, danach die Relevanz (bm25).
+        Die Ergebnisse haben dieselben Schlüssel wie die 'bestMatches' von Alpha Vantage.
+        """
+        words = re.findall(r"\w+", query)
+        if not words:
+            return []
+
+        if SymbolIndex._has_fts(conn):
+            rows = SymbolIndex._search_fts(conn, query, words, limit)
+        else:
+            rows = SymbolIndex._search_like(conn, query, limit)
+
+        return [
+            {
+                '1. symbol': symbol, '2. name': name, '3. type': symbol_type,
+                '4. region': region or exchange, '8. currency': currency, 'exchange': exchange,
+            }
+            for symbol, name, exchange, symbol_type, currency, region in rows
+        ]
+
+    @staticmethod
+    def _search_fts(conn: sqlite3.Connection, query: str, words: list[str], limit: int) -> list[tuple]:
+        # Jedes Wort als Präfix, alle Wörter müssen vorkommen: "tes"* AND "mot"*
+        match = " AND ".join(f'"{word}"*' for word in words)
+        symbol_query = query.strip().upper()
+        sql = """
+            SELECT s.symbol, s.name, s.exchange, s.type, s.currency, s.region
+            FROM symbols_fts
+            JOIN symbols AS s ON s.symbol_id = symbols_fts.rowid
+            WHERE symbols_fts MATCH ?
+            ORDER BY s.symbol = ? DESC, s.symbol LIKE ? DESC, bm25(symbols_fts, 10.0, 1.0)
+            LIMIT ?
+        """
+        cursor = conn.cursor()
+        cursor.execute(sql, (match, symbol_query, f"{symbol_query}%", limit))
+        return cursor.fetchall()
+
+    @staticmethod
+    def _search_like(conn: sqlite3.Connection, query: str, limit: int) -> list[tuple]:
+        symbol_query = query.strip().upper()
+        sql = """
+            SELECT symbol, name, exchange, type, currency, region
+            FROM symbols
+            WHERE symbol LIKE ? OR name LIKE ?
+            ORDER BY symbol = ? DESC, symbol LIKE ? DESC, length(name)
+            LIMIT ?
+        """
+        cursor = conn.cursor()
+        cursor.execute(sql, (f"{symbol_query}%", f"%{query.strip()}%", symbol_query, f"{symbol_query}%", limit))
+        return cursor.fetchall()
+
+    @staticmethod
+    def _has_fts(conn: sqlite3.Connection) -> bool:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'symbols_fts'")
+        return cursor.fetchone() is not None
+
+    @staticmethod
+    def ingest_alpha_vantage(conn: sqlite3.Connection, matches: list[dict]) -> int:
+        """Übernimmt die 'bestMatches' einer Alpha-Vantage-Antwort ins Verzeichnis."""
+        rows = [
+            {
+                'symbol': match.get('1. symbol'), 'name': match.get('2. name'), 'exchange': None,
+                'type': match.get('3. type'), 'currency': match.get('8. currency'), 'region': match.get('4. region'),
+            }
+            for match in matches
+        ]
+        return SymbolIndex.upsert(conn, rows)
+
+    @staticmethod
+    def upsert(conn: sqlite3.Connection, rows: list[dict]) -> int:
+        """
+        Fügt Symbole ein oder aktualisiert sie. Leere Felder überschreiben keine bekannten Werte,
+        so ergänzen sich CSV-Import (Börse) und Alpha Vantage (Region, Währung).
+        Gibt die Anzahl geschriebener Zeilen zurück.
+        """
+        values = [
+            (row['symbol'].strip().upper(), row['name'].strip(), row.get('exchange') or None,
+             row.get('type') or None, row.get('currency') or None, row.get('region') or None)
+            for row in rows if row.get('symbol') and row.get('name')
+        ]
+        if not values:
+            return 0
+        sql = """
+            INSERT INTO symbols (symbol, name, exchange, type, currency, region)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(symbol) DO UPDATE SET
+                name = excluded.name,
+                exchange = COALESCE(excluded.exchange, symbols.exchange),
+                type = COALESCE(excluded.type, symbols.type),
+                currency = COALESCE(excluded.currency, symbols.currency),
+                region = COALESCE(excluded.region, symbols.region)
+        """
+        try:
+            conn.executemany(sql, values)
+        except sqlite3.Error as e:
+            print(f"[Symbolverzeichnis] Symbole konnten nicht gespeichert werden: {e}")
+            return 0
+        return len(values)
+
+    @staticmethod
+    def import_csv(conn: sqlite3.Connection, path: str) -> int:
+        """
+        Importiert eine CSV-Liste. Unterstützt das LISTING_STATUS-Format von Alpha Vantage
+        (symbol,name,exchange,assetType,...) und einfache Listen mit symbol,name,exchange,type,currency.
+        Delistete Einträge werden übersprungen.
+        """
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            rows = []
+            for line in reader:
+                line = {key.strip().lower(): (value or '').strip() for key, value in line.items() if key}
+                if line.get('status', 'active').lower() != 'active':
+                    continue
+                rows.append({
+                    'symbol': line.get('symbol'), 'name': line.get('name'),
+                    'exchange': line.get('exchange'), 'type': line.get('type') or line.get('assettype'),
+                    'currency': line.get('currency'), 'region': line.get('region'),
+                })
+        return SymbolIndex.upsert(conn, rows)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print("Aufruf: python -m backend.symbol_index <liste.csv>")
+        sys.exit(1)
+    db = sqlite3.connect("backend/StockBroker.db")
+    count = SymbolIndex.import_csv(db, sys.argv[1])
+    db.commit()
+    db.close()
+    print(f"{count} Symbole importiert.")
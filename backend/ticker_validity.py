@@ -0,0 +1,159 @@
+# backend/ticker_validity.py
+"""
+Prüft, ob Ticker (z.B. aus der Alpha-Vantage-Suche) bei yfinance handelbar sind.
+Die Prüfungen laufen parallel, jede mit eigener Frist, und das Ergebnis wird in der Tabelle
+'ticker_validity' gespeichert, so dass derselbe Ticker nicht bei jeder Suche neu geprüft wird.
+
+yfinance blockiert im C-Code (curl), deshalb laufen die Abrufe über eventlet.tpool in echten Threads.
+In diesen Threads wird nur yfinance gefragt. Datenbank und FundamentalsCache (grüne Locks) werden nur
+vom aufrufenden Greenlet gelesen und beschrieben.
+"""
+
+import sqlite3
+from datetime import datetime, timedelta
+import eventlet
+import yfinance as yf
+
+from backend.fundamentals import FundamentalsCache, fetch_limited
+
+VALIDITY_TTL = timedelta(days=7)  # So lange gilt ein gespeichertes Ergebnis
+CHECK_TIMEOUT_SECONDS = 5  # Frist pro Ticker
+MAX_PARALLEL_CHECKS = 10
+
+
+class TickerValidity:
+    """Gespeicherte und parallele Gültigkeitsprüfung von Tickern."""
+
+    @staticmethod
+    def validate_many(conn: sqlite3.Connection, tickers: list[str],
+                      timeout: float = CHECK_TIMEOUT_SECONDS) -> dict[str, bool]:
+        """
+        Gibt für jeden Ticker zurück, ob er bei yfinance gültig ist.
+        Gespeicherte Ergebnisse werden direkt verwendet, der Rest wird parallel geprüft.
+        Ticker, deren Prüfung die Frist überschreitet, gelten als ungültig, werden aber NICHT gespeichert.
+        """
+        tickers = [ticker for ticker in dict.fromkeys(tickers) if ticker]
+        result = TickerValidity._read_stored(conn, tickers)
+        missing = [ticker for ticker in tickers if ticker not in result]
+        if not missing:
+            return result
+
+        pool = eventlet.GreenPool(min(MAX_PARALLEL_CHECKS, len(missing)))
+        checked: dict[str, bool] = {}
+        outcomes = pool.imap(TickerValidity._check_with_deadline, missing, [timeout] * len(missing))
+        for ticker, outcome in zip(missing, outcomes):
+            if outcome is None:
+                print(f"[Ticker-Prüfung] Zeitüberschreitung bei '{ticker}'.")
+                result[ticker] = False
+                continue
+            is_valid, info = outcome
+            checked[ticker] = is_valid
+            result[ticker] = is_valid
+            if info:
+                # Die Stammdaten wurden ohnehin geholt, also gleich für die Detailseite merken
+                FundamentalsCache.remember_info(ticker, info, conn)
+
+        TickerValidity._store(conn, checked)
+        return result
+
+    @staticmethod
+    def is_valid(conn: sqlite3.Connection, ticker: str) -> bool:
+        """Prüft einen einzelnen Ticker (mit Cache)."""
+        return TickerValidity.validate_many(conn, [ticker]).get(ticker, False)
+
+    @staticmethod
+    def known(conn: sqlite3.Connection, tickers: list[str]) -> set[str]:
+        """
+        Gibt die Ticker zurück, die schon bekannt sind, ohne yfinance zu fragen: als gültig geprüft,
+        im Symbolverzeichnis oder mit einem schon einmal geholten Kurs.
+        """
+        if not tickers:
+            return set()
+        placeholders = ', '.join(['?'] * len(tickers))
+        sql = f"""
+            SELECT ticker FROM ticker_validity WHERE ticker IN ({placeholders}) AND is_valid = 1
+            UNION SELECT symbol FROM symbols WHERE symbol IN ({placeholders})
+            UNION SELECT ticker FROM quotes WHERE ticker IN ({placeholders})
+        """
+        try:
+            cursor = conn.cursor()
+            cursor.execute(sql, (*tickers, *tickers, *tickers))
+            return {row[0] for row in cursor.fetchall()}
+        except sqlite3.Error as e:
+            print(f"[Ticker-Prüfung] Bekannte Ticker konnten nicht gelesen werden: {e}")
+            return set()
+
+    @staticmethod
+    def _check_with_deadline(ticker: str, timeout: float) -> tuple[bool, dict | None] | None:
+        """
+        Führt die Prüfung in einem Thread aus (über fetch_limited, siehe backend/fundamentals.py).
+        Gibt None zurück, wenn die Frist abläuft. Die Wartezeit auf einen freien Platz zählt zur Frist.
+        """
+        try:
+            with eventlet.Timeout(timeout):
+                return fetch_limited(TickerValidity.check_ticker, ticker, timeout)
+        except eventlet.Timeout:
+            return None
+
+    @staticmethod
+    def check_ticker(ticker_symbol: str, timeout: float = CHECK_TIMEOUT_SECONDS) -> tuple[bool, dict | None]:
+        """
+        Überprüft zuverlässiger, ob ein Ticker auf yfinance gültig ist und Marktdaten hat.
+        Gibt (gültig, info) zurück, info ist das geholte .info oder None.
+        Läuft in einem Thread von tpool und fragt deshalb nur yfinance, ohne Cache und Datenbank.
+        Der Verlauf wird mit der Frist timeout abgefragt. .info bietet in yfinance keine eigene Frist,
+        dort gilt das Zeitlimit von yfinance selbst, der Thread endet also in jedem Fall.
+        """
+        if not ticker_symbol:
+            return False, None
+        try:
+            info = yf.Ticker(ticker_symbol).info or {}
+        except Exception:
+            # Jede Exception (z.B. HTTP-Fehler bei ungültigen Tickern) bedeutet,
+            # dass der Ticker nicht gültig ist.
+            return False, None
+
+        # Primärer Check: Ist ein Preis verfügbar? Das ist die wichtigste Bedingung.
+        if info.get('regularMarketPrice') is not None or info.get('currentPrice') is not None:
+            return True, info
+
+        # Sekundärer Check: Wenn .info keine Preisdaten liefert (z.B. bei Indizes),
+        # prüfen, ob zumindest historische Daten vorhanden sind.
+        if 'longName' in info or 'shortName' in info:
+            try:
+                if not yf.Ticker(ticker_symbol).history(period="5d", interval="1d", timeout=timeout).empty:
+                    return True, info
+            except Exception:
+                pass
+        return False, info or None
+
+    @staticmethod
+    def _read_stored(conn: sqlite3.Connection, tickers: list[str]) -> dict[str, bool]:
+        if not tickers:
+            return {}
+        placeholders = ', '.join(['?'] * len(tickers))
+        sql = f"SELECT ticker, is_valid FROM ticker_validity WHERE ticker IN ({placeholders}) AND checked_at >= ?"
+        oldest_allowed = (datetime.now() - VALIDITY_TTL).strftime('%Y-%m-%d %H:%M:%S')
+        try:
+            cursor = conn.cursor()
+            cursor.execute(sql, (*tickers, oldest_allowed))
+            return {ticker: bool(is_valid) for ticker, is_valid in cursor.fetchall()}
+        except sqlite3.Error as e:
+            print(f"[Ticker-Prüfung] Tabelle 'ticker_validity' konnte nicht gelesen werden: {e}")
+            return {}
+
+    @staticmethod
+    def _store(conn: sqlite3.Connection, results: dict[str, bool]):
+        if not results:
+            return
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        sql = """
+            INSERT INTO ticker_validity (ticker, is_valid, checked_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT(ticker) DO UPDATE SET
+                is_valid = excluded.is_valid, checked_at = excluded.checked_at
+        """
+        try:
+            conn.executemany(sql, [(ticker, int(is_valid), now) for ticker, is_valid in results.items()])
+        except sqlite3.Error as e:
+            print(f"[Ticker-Prüfung] Ergebnisse konnten nicht gespeichert werden: {e}")
@@ -1,138 +1,161 @@
 # backend/trading.py
 import sqlite3
-import yfinance as yf
 from datetime import datetime
-import pandas as pd
-from dataclasses import dataclass
 from typing import Optional
 
 # Lokale Imports
-from backend.utilities import Utilities
-from backend.accounts_to_database import AccountEndpoint
-
-
-@dataclass
-class Order:
-    order_id: int
-    user_id_fk: int
-    ticker: str
-    order_type: str
-    quantity: float
-    status: str
-    created_at: str
-    limit_price: Optional[float] = None
-    stop_price: Optional[float] = None
-    executed_at: Optional[str] = None
-    executed_price: Optional[float] = None
+from backend.quote_service import QuoteService
+from backend.order_book import ORDER_BOOK
+from backend.order_queue import OrderQueue, MARKET_ORDER_TYPES
+from backend.user_events import UserEvents
 
 
 class TradingEndpoint:
-    # Die Methoden _get_current_price und _update_depot bleiben unverändert
     @staticmethod
-    def _get_current_price(ticker: str) -> float | None:
-        # ... (keine Änderungen)
+    def _get_current_price(ticker: str, conn: sqlite3.Connection | None = None) -> float | None:
+        """Holt den aktuellen Kurs über den zentralen Kursdienst (Cache im Speicher und in 'quotes')."""
+        return QuoteService.get_price(ticker, conn=conn)
+
+    @staticmethod
+    def settle_trade(conn: sqlite3.Connection, user_id: int, ticker: str, quantity: int, price: float,
+                     is_buy: bool, order_type: str, order_id: int | None = None) -> dict:
+        """
+        Rechnet einen Trade in EINER Transaktion ab: Kontostand, Depot und 'orders'.
+        Der Kontostand wird über user_id mit einem einzigen bedingten UPDATE ... RETURNING geändert,
+        das Depot per UPSERT. Läuft schon eine Transaktion (z.B. in der Order-Queue), wird ein
+        SAVEPOINT verwendet, sonst BEGIN IMMEDIATE, damit kein anderer Schreiber dazwischenkommt.
+
+        :param order_id: ein offener Auftrag (Limit/Stop), der als ausgeführt markiert wird.
+                         Ohne order_id wird der Trade als neuer Auftrag protokolliert (Market).
+        :return: {"success", "message", "order_id", "balance"}
+        """
+        nested = conn.in_transaction
+        conn.execute("SAVEPOINT settle_trade" if nested else "BEGIN IMMEDIATE")
         try:
-            stock = yf.Ticker(ticker)
-            info = stock.info
-            price = info.get('currentPrice', info.get('regularMarketPrice'))
-            if price: return float(price)
-            hist = stock.history(period="1d")
-            if not hist.empty: return float(hist['Close'].iloc[-1])
-            return None
+            result = TradingEndpoint._apply_trade(conn, user_id, ticker, quantity, price, is_buy, order_type, order_id)
         except Exception:
-            return None
+            TradingEndpoint._end_settlement(conn, nested, success=False)
+            raise
+        TradingEndpoint._end_settlement(conn, nested, success=result['success'])
+        return result
 
     @staticmethod
-    def _update_depot(conn: sqlite3.Connection, user_id: int, ticker: str, quantity: float, purchase_price: float,
-                      is_buy: bool):
-        # ... (keine Änderungen)
+    def _end_settlement(conn: sqlite3.Connection, nested: bool, success: bool):
+        if nested:
+            if not success:
+                conn.execute("ROLLBACK TO settle_trade")
+            conn.execute("RELEASE settle_trade")
+        elif success:
+            conn.commit()
+        else:
+            conn.rollback()
+
+    @staticmethod
+    def _apply_trade(conn: sqlite3.Connection, user_id: int, ticker: str, quantity: int, price: float,
+                     is_buy: bool, order_type: str, order_id: int | None) -> dict:
         cursor = conn.cursor()
-        cursor.execute("SELECT quantity, average_purchase_price FROM stock_depot WHERE user_id_fk = ? AND ticker = ?",
-                       (user_id, ticker))
-        position = cursor.fetchone()
+        total_value = price * quantity
         now_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+        if order_id is not None:
+            # Nur ausführen, wenn der Auftrag in der Zwischenzeit nicht storniert wurde
+            cursor.execute("""
+                UPDATE orders SET status = 'EXECUTED', executed_at = ?, executed_price = ?
+                WHERE order_id = ? AND status = 'OPEN'
+            """, (now_str, price, order_id))
+            if cursor.rowcount == 0:
+                return {"success": False, "message": "Der Auftrag ist nicht mehr offen."}
+
         if is_buy:
-            if position:
-                old_quantity, old_avg_price = position
-                new_quantity = old_quantity + quantity
-                new_avg_price = ((old_avg_price * old_quantity) + (purchase_price * quantity)) / new_quantity
-                cursor.execute(
-                    "UPDATE stock_depot SET quantity = ?, average_purchase_price = ?, last_updated = ? WHERE user_id_fk = ? AND ticker = ?",
-                    (new_quantity, new_avg_price, now_str, user_id, ticker))
-            else:
-                cursor.execute(
-                    "INSERT INTO stock_depot (user_id_fk, ticker, quantity, average_purchase_price, last_updated) VALUES (?, ?, ?, ?, ?)",
-                    (user_id, ticker, quantity, purchase_price, now_str))
+            cursor.execute("UPDATE all_users SET money = money - ? WHERE user_id = ? AND money >= ? RETURNING money",
+                           (total_value, user_id, total_value))
+            row = cursor.fetchone()
+            if row is None:
+                return {"success": False, "message": "Nicht genügend Guthaben für diesen Kauf."}
+            # Im SET beziehen sich quantity und average_purchase_price auf die alten Werte der Zeile
+            cursor.execute("""
+                INSERT INTO stock_depot (user_id_fk, ticker, quantity, average_purchase_price, last_updated)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(user_id_fk, ticker) DO UPDATE SET
+                    average_purchase_price = (average_purchase_price * quantity
+                                              + excluded.average_purchase_price * excluded.quantity)
+                                             / (quantity + excluded.quantity),
+                    quantity = quantity + excluded.quantity,
+                    last_updated = excluded.last_updated
+                RETURNING quantity, average_purchase_price
+            """, (user_id, ticker, quantity, price, now_str))
+            balance = row[0]
+            position = cursor.fetchone()
         else:
-            if not position or position[0] < quantity:
-                raise ValueError("Nicht genügend Aktien zum Verkaufen vorhanden.")
-            new_quantity = position[0] - quantity
-            if new_quantity > 0:
-                cursor.execute(
-                    "UPDATE stock_depot SET quantity = ?, last_updated = ? WHERE user_id_fk = ? AND ticker = ?",
-                    (new_quantity, now_str, user_id, ticker))
-            else:
+            cursor.execute("""
+                UPDATE stock_depot SET quantity = quantity - ?, last_updated = ?
+                WHERE user_id_fk = ? AND ticker = ? AND quantity >= ?
+                RETURNING quantity, average_purchase_price
+            """, (quantity, now_str, user_id, ticker, quantity))
+            position = cursor.fetchone()
+            if position is None:
+                return {"success": False, "message": "Nicht genügend Aktien zum Verkaufen vorhanden."}
+            if position[0] <= 0:
                 cursor.execute("DELETE FROM stock_depot WHERE user_id_fk = ? AND ticker = ?", (user_id, ticker))
+                position = None
+            cursor.execute("UPDATE all_users SET money = money + ? WHERE user_id = ? RETURNING money",
+                           (total_value, user_id))
+            row = cursor.fetchone()
+            if row is None:
+                return {"success": False, "message": "Benutzerkonto nicht gefunden."}
+            balance = row[0]
+
+        if order_id is None:
+            cursor.execute("""
+                INSERT INTO orders
+                (user_id_fk, ticker, order_type, quantity, status, created_at, executed_at, executed_price)
+                VALUES (?, ?, ?, ?, 'EXECUTED', ?, ?, ?)
+            """, (user_id, ticker, order_type, quantity, now_str, now_str, price))
+            order_id = cursor.lastrowid
+
+        # Push an die Browser des Benutzers (wird mit dem Trade festgeschrieben, siehe backend/user_events.py)
+        position_dict = None if position is None else {"quantity": position[0], "average_purchase_price": position[1]}
+        depot_change = {"ticker": ticker, "balance": balance, "position": position_dict}
+        UserEvents.record_many(conn, user_id, [
+            ("order_filled", {"order_id": order_id, "order_type": order_type, "quantity": quantity,
+                              "price": price, "executed_at": now_str, **depot_change}),
+            ("depot_changed", depot_change),
+        ])
+
+        action = "gekauft" if is_buy else "verkauft"
+        return {"success": True, "message": f"{quantity} {ticker} für {price:.2f} € pro Aktie {action}.",
+                "order_id": order_id, "balance": balance}
 
     @staticmethod
-    def _execute_market_trade(conn: sqlite3.Connection, user_id: int, ticker: str, quantity: int, is_buy: bool) -> dict:
+    def _execute_market_trade(conn: sqlite3.Connection, user_id: int, ticker: str, quantity: int, is_buy: bool,
+                              price: float | None = None) -> dict:
         """
         Führt einen Market-Trade aus, aktualisiert Kontostand sowie Depot
-        und protokolliert den Trade in der 'orders'-Tabelle.
+        und protokolliert den Trade in der 'orders'-Tabelle (alles über settle_trade).
+        :param price: bereits ermittelter Kurs (von der Order-Queue), sonst wird er hier abgefragt
         """
-        price = TradingEndpoint._get_current_price(ticker)
+        if price is None:
+            price = TradingEndpoint._get_current_price(ticker, conn)
         if not price:
             return {"success": False, "message": f"Konnte aktuellen Preis für {ticker} nicht abrufen."}
 
-        total_cost = price * quantity
-        username = Utilities.get_username(conn, user_id)
         order_type = 'MARKET_BUY' if is_buy else 'MARKET_SELL'
-        now_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-        # Transaktionslogik
-        if is_buy:
-            current_balance = AccountEndpoint.get_balance(conn, user_id=user_id)
-            if current_balance is None or current_balance < total_cost:
-                return {"success": False, "message": "Nicht genügend Guthaben für diesen Kauf."}
-            AccountEndpoint.update_balance(conn, username, -total_cost)
-            TradingEndpoint._update_depot(conn, user_id, ticker, quantity, price, is_buy=True)
-            message = f"{quantity} {ticker} für {price:.2f} € pro Aktie gekauft."
-        else:  # is_sell
-            try:
-                TradingEndpoint._update_depot(conn, user_id, ticker, quantity, price, is_buy=False)
-                AccountEndpoint.update_balance(conn, username, total_cost)
-                message = f"{quantity} {ticker} für {price:.2f} € pro Aktie verkauft."
-            except ValueError as e:
-                return {"success": False, "message": str(e)}
-
-        # NEU: Protokollierung des ausgeführten Trades in der 'orders'-Tabelle
-        try:
-            sql_log_order = """
-                    INSERT INTO orders 
-                    (user_id_fk, ticker, order_type, quantity, status, created_at, executed_at, executed_price)
-                    VALUES (?, ?, ?, ?, 'EXECUTED', ?, ?, ?)
-                """
-            params = (user_id, ticker, order_type, quantity, now_str, now_str, price)
-            cursor = conn.cursor()
-            cursor.execute(sql_log_order, params)
+        result = TradingEndpoint.settle_trade(conn, user_id, ticker, quantity, price, is_buy, order_type)
+        if result['success']:
             print(f"Market-Trade für User {user_id} ({ticker}) erfolgreich in 'orders' protokolliert.")
-        except sqlite3.Error as e:
-            # Wenn die Protokollierung fehlschlägt, ist der Trade trotzdem durch.
-            # Wir geben eine Warnung aus, machen aber ein Rollback der Finanztransaktion.
-            print(f"WARNUNG: Finanztransaktion erfolgreich, aber Protokollierung in 'orders' fehlgeschlagen: {e}")
-
-        return {"success": True, "message": message}
+        return result
 
     @staticmethod
     def place_order(conn: sqlite3.Connection, user_id: int, order_details: dict) -> dict:
-        # ... (keine Änderungen)
+        """
+        Platziert einen Auftrag. Market-Aufträge werden nur in die Order-Queue eingereiht
+        (Rückgabe enthält die queue_id) und im Hintergrund ausgeführt, siehe backend/order_queue.py.
+        """
         order_type = order_details.get('order_type')
         ticker = order_details.get('ticker')
         quantity = order_details.get('quantity')
-        if order_type == 'MARKET_BUY':
-            return TradingEndpoint._execute_market_trade(conn, user_id, ticker, quantity, is_buy=True)
-        if order_type == 'MARKET_SELL':
-            return TradingEndpoint._execute_market_trade(conn, user_id, ticker, quantity, is_buy=False)
+        if order_type in MARKET_ORDER_TYPES:
+            return OrderQueue.enqueue(conn, user_id, ticker, order_type, quantity)
         limit_price = order_details.get('limit_price')
         stop_price = order_details.get('stop_price')
         if (order_type in ['LIMIT_BUY', 'LIMIT_SELL'] and not limit_price) or \
@@ -144,6 +167,7 @@ class TradingEndpoint:
         try:
             cursor = conn.cursor()
             cursor.execute(sql, params)
+            # Ins Orderbuch kommt der Auftrag erst über ORDER_BOOK.sync im Scheduler (nach dem Commit)
             return {"success": True, "message": "Auftrag erfolgreich platziert."}
         except sqlite3.Error as e:
             return {"success": False, "message": f"Datenbankfehler: {e}"}
@@ -216,78 +240,44 @@ class TradingEndpoint:
     @staticmethod
     def process_open_orders(conn: sqlite3.Connection):
         """
-        Überprüft alle offenen Aufträge mithilfe der Order-Datenklasse.
+        Überprüft die offenen Aufträge mithilfe des Orderbuchs.
+        Pro Ticker werden nur die Aufträge angefasst, die beim aktuellen Kurs ausgelöst werden.
         """
         print(f"[{datetime.now()}] Starte Verarbeitung offener Aufträge...")
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM orders WHERE status = 'OPEN'")
-
-        # Rohdaten aus der DB in strukturierte Order-Objekte umwandeln
-        orders_raw = cursor.fetchall()
-        if not orders_raw:
+        # Nur neu hinzugekommene Aufträge nachladen, statt die ganze Tabelle zu lesen
+        ORDER_BOOK.sync(conn)
+        tickers = ORDER_BOOK.tickers()
+        if not tickers:
             print("Keine offenen Aufträge gefunden.")
             return
-        open_orders: list[Order] = [Order(**dict(row)) for row in orders_raw]
 
-        tickers = {order.ticker for order in open_orders}
-        try:
-            data = yf.download(list(tickers), period="1d", progress=False, group_by='ticker', auto_adjust=True)
-            if data.empty:
-                print("Konnte keine Preisdaten von yfinance abrufen.")
-                return
-        except Exception as e:
-            print(f"Fehler beim Abrufen der Kurse von yfinance: {e}")
+        prices = QuoteService.get_prices(tickers, conn=conn)
+        if not any(price is not None for price in prices.values()):
+            print("Konnte keine Preisdaten von yfinance abrufen.")
             return
 
-        for order in open_orders:
-            try:
-                # Sicherer Zugriff auf Preisdaten
-                if order.ticker in data and not pd.isna(data[order.ticker]['Close'].iloc[-1]):
-                    current_price = data[order.ticker]['Close'].iloc[-1]
-                else:
-                    continue
-            except (KeyError, IndexError):
+        # Jeder Auftrag wird in seiner eigenen Transaktion abgerechnet
+        conn.commit()
+        for ticker, current_price in prices.items():
+            if current_price is None:
                 continue
 
-            execute = False
-            execution_price = 0.0
-
-            # Typsicherer Zugriff auf Attribute des Order-Objekts
-            if order.order_type == 'LIMIT_BUY' and current_price <= order.limit_price:
-                execute = True
-                execution_price = order.limit_price
-            elif order.order_type == 'LIMIT_SELL' and current_price >= order.limit_price:
-                execute = True
-                execution_price = order.limit_price
-            elif order.order_type == 'STOP_LOSS_SELL' and current_price <= order.stop_price:
-                execute = True
-                execution_price = order.stop_price
-
-            if execute:
+            for order in ORDER_BOOK.crossed(ticker, current_price):
+                print(f"Führe Auftrag {order.order_id} aus...")
+                is_buy = 'BUY' in order.order_type
                 try:
-                    print(f"Führe Auftrag {order.order_id} aus...")
-                    username = Utilities.get_username(conn, order.user_id_fk)
-                    is_buy = 'BUY' in order.order_type
-                    total_value = execution_price * order.quantity
-
-                    if is_buy:
-                        AccountEndpoint.update_balance(conn, username, -total_value)
-                        TradingEndpoint._update_depot(conn, order.user_id_fk, order.ticker, order.quantity,
-                                                      execution_price, is_buy=True)
-                    else:  # SELL
-                        TradingEndpoint._update_depot(conn, order.user_id_fk, order.ticker, order.quantity,
-                                                      execution_price, is_buy=False)
-                        AccountEndpoint.update_balance(conn, username, total_value)
+                    result = TradingEndpoint.settle_trade(conn, order.user_id_fk, order.ticker, order.quantity,
+                                                          order.trigger_price, is_buy, order.order_type,
+                                                          order_id=order.order_id)
+                except sqlite3.Error as e:
+                    result = {"success": False, "message": str(e)}
 
-                    update_sql = "UPDATE orders SET status = 'EXECUTED', executed_at = ?, executed_price = ? WHERE order_id = ?"
-                    cursor.execute(update_sql,
-                                   (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), execution_price, order.order_id))
+                if result['success']:
                     print(f"Auftrag {order.order_id} erfolgreich ausgeführt.")
-
-                except Exception as e:
-                    print(f"Fehler bei der Ausführung von Auftrag {order.order_id}: {e}")
-                    cursor.execute("UPDATE orders SET status = 'FAILED' WHERE order_id = ?", (order.order_id,))
-
-        conn.commit()
-        conn.row_factory = None
\ No newline at end of file
+                else:
+                    print(f"Fehler bei der Ausführung von Auftrag {order.order_id}: {result['message']}")
+                    # Trifft keine Zeile, wenn der Auftrag inzwischen storniert wurde
+                    conn.execute("UPDATE orders SET status = 'FAILED' WHERE order_id = ? AND status = 'OPEN'",
+                                 (order.order_id,))
+                    conn.commit()
+                ORDER_BOOK.remove(order.order_id)
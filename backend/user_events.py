@@ -0,0 +1,132 @@
+# backend/user_events.py
+"""
+Push-Nachrichten an die Browser eines Benutzers (Socket.IO, Namespace '/live', Raum 'user:<id>').
+Aufträge werden im Scheduler ausgeführt, die Verbindung des Benutzers hängt aber an irgendeinem
+gunicorn-Worker. Deshalb schreibt die Abrechnung die Nachrichten in die Tabelle 'user_events'
+(in derselben Transaktion wie der Trade, es geht also keine verloren und keine kommt zu früh).
+Jeder Worker mit angemeldeten Benutzern liest alle RELAY_INTERVAL_SECONDS die neuen Einträge
+und schickt sie an den Raum des Benutzers.
+
+Ereignisse:
+- order_filled:  ein Auftrag wurde ausgeführt (Auftrag, Kurs, neuer Kontostand, neue Position)
+- depot_changed: Kontostand und Position eines Tickers haben sich geändert
+"""
+
+import json
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from backend.quote_broadcaster import LIVE_NAMESPACE
+
+RELAY_INTERVAL_SECONDS = 2
+RELAY_BATCH_SIZE = 500
+EVENT_RETENTION = timedelta(days=1)
+
+
+class UserEvents:
+    """Schreiben, Lesen und Aufräumen der Tabelle 'user_events'."""
+
+    @staticmethod
+    def room(user_id: int) -> str:
+        return f"user:{user_id}"
+
+    @staticmethod
+    def record_many(conn: sqlite3.Connection, user_id: int, events: list[tuple[str, dict]]):
+        """Schreibt Ereignisse (event_type, payload) für einen Benutzer. Läuft in der Transaktion des Aufrufers."""
+        now_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        conn.executemany(
+            "INSERT INTO user_events (user_id_fk, event_type, payload_json, created_at) VALUES (?, ?, ?, ?)",
+            [(user_id, event_type, json.dumps(payload), now_str) for event_type, payload in events])
+
+    @staticmethod
+    def latest_id(conn: sqlite3.Connection) -> int:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MAX(event_id) FROM user_events")
+        row = cursor.fetchone()
+        return row[0] or 0
+
+    @staticmethod
+    def fetch_since(conn: sqlite3.Connection, last_event_id: int, limit: int = RELAY_BATCH_SIZE) -> list[tuple]:
+        """Neue Ereignisse nach last_event_id als (event_id, user_id, event_type, payload), aufsteigend."""
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT event_id, user_id_fk, event_type, payload_json FROM user_events
+            WHERE event_id > ? ORDER BY event_id LIMIT ?
+        """, (last_event_id, limit))
+        return [(event_id, user_id, event_type, json.loads(payload))
+                for event_id, user_id, event_type, payload in cursor.fetchall()]
+
+    @staticmethod
+    def prune(conn: sqlite3.Connection) -> int:
+        """Löscht Ereignisse, die älter als EVENT_RETENTION sind (die Seiten laden dann ohnehin neu)."""
+        oldest_allowed = (datetime.now() - EVENT_RETENTION).strftime('%Y-%m-%d %H:%M:%S')
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM user_events WHERE created_at < ?", (oldest_allowed,))
+        return cursor.rowcount
+
+
+class UserEventRelay:
+    """Gibt neue Ereignisse aus 'user_events' an die Socket.IO-Räume dieses Workers weiter."""
+
+    _connected: dict[str, int] = {}  # sid -> user_id der angemeldeten Verbindungen dieses Workers
+    _last_event_id: int | None = None
+    _lock = threading.Lock()
+    _task = None
+
+    @staticmethod
+    def connect(sid: str, user_id: int):
+        with UserEventRelay._lock:
+            UserEventRelay._connected[sid] = user_id
+
+    @staticmethod
+    def disconnect(sid: str):
+        with UserEventRelay._lock:
+            UserEventRelay._connected.pop(sid, None)
+
+    @staticmethod
+    def ensure_started(socketio, app, get_db, interval: float = RELAY_INTERVAL_SECONDS):
+        """Startet die Hintergrund-Aufgabe dieses Workers bei der ersten angemeldeten Verbindung."""
+        with UserEventRelay._lock:
+            if UserEventRelay._task is not None:
+                return
+            UserEventRelay._task = socketio.start_background_task(
+                UserEventRelay._run, socketio, app, get_db, interval)
+
+    @staticmethod
+    def _run(socketio, app, get_db, interval: float):
+        while True:
+            try:
+                with app.app_context():
+                    UserEventRelay.relay_once(socketio, get_db())
+            except Exception as e:
+                print(f"[Push] Fehler beim Weitergeben der Ereignisse: {e}")
+            socketio.sleep(interval)
+
+    @staticmethod
+    def relay_once(socketio, conn: sqlite3.Connection) -> int:
+        """
+        Schickt alle neuen Ereignisse an die Räume der Benutzer, die mit diesem Worker verbunden sind.
+        Beim ersten Aufruf wird nur die aktuelle Position gemerkt, alte Ereignisse werden nicht nachgeschickt.
+        Gibt die Anzahl verschickter Ereignisse zurück.
+        """
+        if UserEventRelay._last_event_id is None:
+            UserEventRelay._last_event_id = UserEvents.latest_id(conn)
+            return 0
+
+        with UserEventRelay._lock:
+            connected_users = set(UserEventRelay._connected.values())
+        if not connected_users:
+            # Niemand verbunden: nur weiterspulen, damit später keine alten Ereignisse kommen
+            UserEventRelay._last_event_id = UserEvents.latest_id(conn)
+            return 0
+        sent = 0
+        while True:
+            events = UserEvents.fetch_since(conn, UserEventRelay._last_event_id)
+            for event_id, user_id, event_type, payload in events:
+                UserEventRelay._last_event_id = event_id
+                if user_id in connected_users:
+                    socketio.emit(event_type, payload, to=UserEvents.room(user_id), namespace=LIVE_NAMESPACE)
+                    sent += 1
+            if len(events) < RELAY_BATCH_SIZE:
+                return sent
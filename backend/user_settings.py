@@ -1,9 +1,19 @@
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
 from backend.utilities import Utilities
 
+SETTINGS_CACHE_SIZE = 1024
+SETTINGS_CACHE_TTL_SECONDS = 300  # Obergrenze, falls ein anderer Worker geändert hat und die Sitzung das nicht weiß
+
 class Settings:
     """Verwaltet die Einstellungen eines Benutzers."""
 
+    # (user_id, settings_version) -> (einstellungen, geladen_um als unix-zeit), pro Worker
+    _cache: OrderedDict[tuple[int, int], tuple[dict | None, float]] = OrderedDict()
+    _lock = threading.Lock()
+
     @staticmethod
     def initialize_settings_for_user(conn: sqlite3.Connection, user_id: int):
         """Erstellt einen Standard-Eintrag in der Settings-Tabelle für einen neuen Benutzer."""
@@ -22,6 +32,37 @@ class Settings:
         conn.row_factory = None
         return dict(settings_data) if settings_data else None
 
+    @staticmethod
+    def get_cached_settings(get_conn, user_id: int, version: int = 0) -> dict | None:
+        """
+        Wie get_settings, aber aus dem Speicher dieses Workers. Die Version kommt aus der Sitzung und wird
+        bei jeder Änderung erhöht, damit auch andere Worker neu laden. get_conn wird nur bei einem
+        Fehltreffer aufgerufen, ohne Fehltreffer wird also keine Verbindung geöffnet.
+        Zurück kommt eine Kopie, der Aufrufer darf sie verändern, ohne den Cache zu beschädigen.
+        """
+        key = (user_id, version)
+        now = time.time()
+        with Settings._lock:
+            entry = Settings._cache.get(key)
+            if entry is not None and now - entry[1] <= SETTINGS_CACHE_TTL_SECONDS:
+                Settings._cache.move_to_end(key)
+                return dict(entry[0]) if entry[0] is not None else None
+
+        settings = Settings.get_settings(get_conn(), user_id)
+        with Settings._lock:
+            Settings._cache[key] = (settings, now)
+            Settings._cache.move_to_end(key)
+            while len(Settings._cache) > SETTINGS_CACHE_SIZE:
+                Settings._cache.popitem(last=False)
+        return dict(settings) if settings is not None else None
+
+    @staticmethod
+    def invalidate(user_id: int):
+        """Entfernt alle zwischengespeicherten Einstellungen eines Benutzers aus diesem Worker."""
+        with Settings._lock:
+            for key in [key for key in Settings._cache if key[0] == user_id]:
+                del Settings._cache[key]
+
     @staticmethod
     def update_instagram_link(conn: sqlite3.Connection, user_id: int, ig_link: str | None):
         """Aktualisiert oder löscht den Instagram-Link eines Benutzers."""
@@ -29,12 +70,14 @@ class Settings:
             return
         sql = "UPDATE settings SET ig_link = ? WHERE user_id_fk = ?"
         conn.execute(sql, (ig_link, user_id))
+        Settings.invalidate(user_id)
 
     @staticmethod
     def update_dark_mode(conn: sqlite3.Connection, user_id: int, dark_mode_status: bool):
         """Schaltet den Dark Mode für einen Benutzer um."""
         sql = "UPDATE settings SET dark_mode = ? WHERE user_id_fk = ?"
         conn.execute(sql, (1 if dark_mode_status else 0, user_id))
+        Settings.invalidate(user_id)
 
     @staticmethod
     def get_link(conn: sqlite3.Connection, user_id:int) -> int | None:
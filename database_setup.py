@@ -58,11 +58,63 @@ def create_orders_table(conn):
             FOREIGN KEY (user_id_fk) REFERENCES all_users (user_id) ON DELETE CASCADE
         );
     """)
-    # Indizes für schnellere Abfragen der Orders eines Users und nach Status
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_user_id ON orders (user_id_fk);")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (status);")
+    # Zusammengesetzte Indizes für "Orders eines Users nach Status, neueste zuerst"
+    # und für den Scheduler ("alle offenen Orders, nach Ticker gruppiert")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_user_status_created ON orders (user_id_fk, status, created_at);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_status_ticker ON orders (status, ticker);")
+    # Die alten einspaltigen Indizes sind Präfixe der neuen und damit überflüssig
+    cursor.execute("DROP INDEX IF EXISTS idx_orders_user_id;")
+    cursor.execute("DROP INDEX IF EXISTS idx_orders_status;")
     print("Tabelle 'orders' erstellt oder bereits vorhanden.")
 
+def create_order_queue_table(conn):
+    """
+    Erstellt die Tabelle order_queue. Market-Aufträge werden hier eingereiht und vom
+    Hintergrund-Job (backend/order_queue.py) ausgeführt, die Webanfrage wartet nicht auf den Kurs.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS order_queue (
+            queue_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id_fk INTEGER NOT NULL,
+            ticker TEXT NOT NULL,
+            order_type TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'PENDING',
+            message TEXT,
+            order_id_fk INTEGER,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            claimed_at TIMESTAMP,
+            processed_at TIMESTAMP,
+            FOREIGN KEY (user_id_fk) REFERENCES all_users (user_id) ON DELETE CASCADE,
+            FOREIGN KEY (order_id_fk) REFERENCES orders (order_id) ON DELETE SET NULL
+        );
+    """)
+    # Der Job sucht nur die unerledigten Einträge, die Seite "Meine Orders" die eines Users
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_order_queue_status ON order_queue (status, claimed_at);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_order_queue_user_status ON order_queue (user_id_fk, status);")
+    print("Tabelle 'order_queue' erstellt oder bereits vorhanden.")
+
+def create_user_events_table(conn):
+    """
+    Erstellt die Tabelle user_events (Ausgang für Push-Nachrichten an den Browser, z.B. ausgeführte Aufträge).
+    Wird in derselben Transaktion wie der Trade geschrieben und von jedem Worker an seine Socket.IO-Verbindungen
+    weitergegeben (backend/user_events.py). Alte Einträge löscht der tägliche Job.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_events (
+            event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id_fk INTEGER NOT NULL,
+            event_type TEXT NOT NULL,
+            payload_json TEXT NOT NULL,
+            created_at TIMESTAMP NOT NULL,
+            FOREIGN KEY (user_id_fk) REFERENCES all_users (user_id) ON DELETE CASCADE
+        );
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_events_created_at ON user_events (created_at);")
+    print("Tabelle 'user_events' erstellt oder bereits vorhanden.")
+
 def create_secure_tokens_table(conn):
     """Erstellt die Tabelle secure_tokens."""
     cursor = conn.cursor()
@@ -112,24 +164,225 @@ def create_leaderboard_table(conn):
             FOREIGN KEY (user_id_fk) REFERENCES all_users (user_id) ON DELETE CASCADE
         );
     """)
-    # Index für schnellen Zugriff auf den Rang eines Users
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_leaderboard_user_id ON leaderboard (user_id_fk);")
+    # Index für den neuesten Eintrag eines Users (ROW_NUMBER() ... ORDER BY last_updated DESC)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_leaderboard_user_updated ON leaderboard (user_id_fk, last_updated DESC);")
+    cursor.execute("DROP INDEX IF EXISTS idx_leaderboard_user_id;")  # Präfix des neuen Index
     print("Tabelle 'leaderboard' erstellt oder bereits vorhanden.")
 
-def create_cached_charts_table(conn):
-    """Erstellt die Tabelle cached_charts."""
+def create_leaderboard_latest_table(conn):
+    """
+    Erstellt die Tabelle leaderboard_latest: genau eine Zeile pro User mit seinem neuesten Eintrag
+    aus 'leaderboard'. Wird bei jedem Insert in derselben Transaktion mitgepflegt.
+    """
     cursor = conn.cursor()
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS cached_charts (
-            ticker TEXT NOT NULL,
-            dark_mode INTEGER NOT NULL,
-            chart_html TEXT NOT NULL,
+        CREATE TABLE IF NOT EXISTS leaderboard_latest (
+            user_id_fk INTEGER PRIMARY KEY,
+            net_worth REAL NOT NULL,
+            last_updated TIMESTAMP NOT NULL,
+            FOREIGN KEY (user_id_fk) REFERENCES all_users (user_id) ON DELETE CASCADE
+        );
+    """)
+    # Index für die sortierte, seitenweise Ausgabe des Leaderboards
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_leaderboard_latest_net_worth ON leaderboard_latest (net_worth DESC);")
+    # Bestehende Datenbanken: aus der Historie befüllen (nur neuere Einträge überschreiben)
+    cursor.execute("""
+        INSERT INTO leaderboard_latest (user_id_fk, net_worth, last_updated)
+        SELECT user_id_fk, net_worth, last_updated FROM (
+            SELECT user_id_fk, net_worth, last_updated,
+                   ROW_NUMBER() OVER (PARTITION BY user_id_fk ORDER BY last_updated DESC) AS rn
+            FROM leaderboard
+        ) WHERE rn = 1
+        ON CONFLICT(user_id_fk) DO UPDATE SET
+            net_worth = excluded.net_worth, last_updated = excluded.last_updated
+        WHERE excluded.last_updated > leaderboard_latest.last_updated;
+    """)
+    print("Tabelle 'leaderboard_latest' erstellt oder bereits vorhanden.")
+
+def create_cached_chart_data_table(conn):
+    """
+    Erstellt die Tabelle cached_chart_data (Daten der Chart-Widgets, einmal pro Ticker).
+    Die alte Tabelle cached_charts mit fertigem HTML pro Farbmodus wird nicht mehr gebraucht.
+    """
+    cursor = conn.cursor()
+    cursor.execute("DROP TABLE IF EXISTS cached_charts;")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cached_chart_data (
+            ticker TEXT PRIMARY KEY,
+            chart_data TEXT NOT NULL,
             company_name TEXT,
+            last_updated TIMESTAMP NOT NULL
+        );
+    """)
+    print("Tabelle 'cached_chart_data' erstellt oder bereits vorhanden.")
+
+def create_cached_fragments_table(conn):
+    """Erstellt die Tabelle cached_fragments (fertiges HTML der Tabellen auf der Aktien-Detailseite)."""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cached_fragments (
+            ticker TEXT NOT NULL,
+            section TEXT NOT NULL,
+            html TEXT NOT NULL,
             last_updated TIMESTAMP NOT NULL,
-            PRIMARY KEY (ticker, dark_mode)
+            PRIMARY KEY (ticker, section)
         );
     """)
-    print("Tabelle 'cached_charts' erstellt oder bereits vorhanden.")
+    print("Tabelle 'cached_fragments' erstellt oder bereits vorhanden.")
+
+def create_quotes_table(conn):
+    """Erstellt die Tabelle quotes (workerübergreifender Kurs-Cache, fetched_at in UTC)."""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS quotes (
+            ticker TEXT PRIMARY KEY,
+            price REAL NOT NULL,
+            fetched_at TIMESTAMP NOT NULL,
+            source TEXT NOT NULL DEFAULT 'yfinance'
+        );
+    """)
+    print("Tabelle 'quotes' erstellt oder bereits vorhanden.")
+
+def create_ticker_validity_table(conn):
+    """Erstellt die Tabelle ticker_validity (Cache: ist ein Ticker bei yfinance handelbar?)."""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ticker_validity (
+            ticker TEXT PRIMARY KEY,
+            is_valid INTEGER NOT NULL,
+            checked_at TIMESTAMP NOT NULL
+        );
+    """)
+    print("Tabelle 'ticker_validity' erstellt oder bereits vorhanden.")
+
+def create_fundamentals_table(conn):
+    """Erstellt die Tabelle fundamentals (Cache für yfinance .info, getrennt nach schnellen und langsamen Feldern)."""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS fundamentals (
+            ticker TEXT PRIMARY KEY,
+            info_json TEXT NOT NULL,
+            info_fetched_at TIMESTAMP NOT NULL,
+            quick_json TEXT NOT NULL,
+            quick_fetched_at TIMESTAMP NOT NULL
+        );
+    """)
+    print("Tabelle 'fundamentals' erstellt oder bereits vorhanden.")
+
+def create_ohlc_tables(conn):
+    """Erstellt die Tabellen ohlc_bars (Kerzen pro Ticker und Intervall) und ohlc_meta."""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ohlc_bars (
+            ticker TEXT NOT NULL,
+            interval TEXT NOT NULL,
+            ts INTEGER NOT NULL,
+            open REAL NOT NULL,
+            high REAL NOT NULL,
+            low REAL NOT NULL,
+            close REAL NOT NULL,
+            volume INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (ticker, interval, ts)
+        ) WITHOUT ROWID;
+    """)
+    print("Tabelle 'ohlc_bars' erstellt oder bereits vorhanden.")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ohlc_meta (
+            ticker TEXT NOT NULL,
+            interval TEXT NOT NULL,
+            covered_from INTEGER NOT NULL,
+            last_fetch REAL NOT NULL,
+            tz TEXT NOT NULL,
+            PRIMARY KEY (ticker, interval)
+        );
+    """)
+    print("Tabelle 'ohlc_meta' erstellt oder bereits vorhanden.")
+
+def create_symbols_table(conn):
+    """
+    Erstellt das lokale Symbolverzeichnis 'symbols' und, falls SQLite mit FTS5 gebaut wurde,
+    den Volltextindex 'symbols_fts' darüber. Trigger halten den Index mit der Tabelle synchron.
+    Der Index verweist über die feste Spalte symbol_id (INTEGER PRIMARY KEY) auf die Tabelle: die implizite
+    rowid einer Tabelle mit TEXT-Primärschlüssel kann VACUUM neu nummerieren. Eine alte Tabelle ohne
+    symbol_id wird umkopiert und der Index danach neu aufgebaut.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM pragma_table_info('symbols')")
+    old_columns = {row[0] for row in cursor.fetchall()}
+    needs_migration = bool(old_columns) and 'symbol_id' not in old_columns
+    if needs_migration:
+        cursor.executescript("""
+            DROP TRIGGER IF EXISTS symbols_ai;
+            DROP TRIGGER IF EXISTS symbols_ad;
+            DROP TRIGGER IF EXISTS symbols_au;
+            DROP TABLE IF EXISTS symbols_fts;
+            ALTER TABLE symbols RENAME TO symbols_old;
+        """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS symbols (
+            symbol_id INTEGER PRIMARY KEY,
+            symbol TEXT NOT NULL UNIQUE,
+            name TEXT NOT NULL,
+            exchange TEXT,
+            type TEXT,
+            currency TEXT,
+            region TEXT
+        );
+    """)
+    if needs_migration:
+        cursor.execute("""
+            INSERT INTO symbols (symbol, name, exchange, type, currency, region)
+            SELECT symbol, name, exchange, type, currency, region FROM symbols_old ORDER BY rowid
+        """)
+        cursor.execute("DROP TABLE symbols_old;")
+        print("Tabelle 'symbols' auf symbol_id umgestellt.")
+    print("Tabelle 'symbols' erstellt oder bereits vorhanden.")
+    try:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS symbols_fts USING fts5(
+                symbol, name, content='symbols', content_rowid='symbol_id', prefix='1 2 3'
+            );
+        """)
+    except sqlite3.OperationalError as e:
+        print(f"FTS5 nicht verfügbar, die Symbolsuche nutzt LIKE: {e}")
+        return
+    cursor.executescript("""
+        CREATE TRIGGER IF NOT EXISTS symbols_ai AFTER INSERT ON symbols BEGIN
+            INSERT INTO symbols_fts (rowid, symbol, name) VALUES (new.symbol_id, new.symbol, new.name);
+        END;
+        CREATE TRIGGER IF NOT EXISTS symbols_ad AFTER DELETE ON symbols BEGIN
+            INSERT INTO symbols_fts (symbols_fts, rowid, symbol, name) VALUES ('delete', old.symbol_id, old.symbol, old.name);
+        END;
+        CREATE TRIGGER IF NOT EXISTS symbols_au AFTER UPDATE ON symbols BEGIN
+            INSERT INTO symbols_fts (symbols_fts, rowid, symbol, name) VALUES ('delete', old.symbol_id, old.symbol, old.name);
+            INSERT INTO symbols_fts (rowid, symbol, name) VALUES (new.symbol_id, new.symbol, new.name);
+        END;
+    """)
+    if needs_migration:
+        cursor.execute("INSERT INTO symbols_fts (symbols_fts) VALUES ('rebuild');")
+    print("Volltextindex 'symbols_fts' erstellt oder bereits vorhanden.")
+
+def create_all_tables(conn):
+    """
+    Erstellt alle Tabellen und Indizes. Alle Schritte sind idempotent, deshalb kann
+    das Skript auch auf einer bestehenden Datenbank laufen, um sie auf den neuesten Stand zu bringen.
+    """
+    create_all_users_table(conn)
+    create_settings_table(conn)
+    create_orders_table(conn)
+    create_order_queue_table(conn)
+    create_user_events_table(conn)
+    create_secure_tokens_table(conn)
+    create_stock_depot_table(conn)
+    create_leaderboard_table(conn)
+    create_leaderboard_latest_table(conn)
+    create_cached_chart_data_table(conn)
+    create_cached_fragments_table(conn)
+    create_quotes_table(conn)
+    create_ticker_validity_table(conn)
+    create_symbols_table(conn)
+    create_fundamentals_table(conn)
+    create_ohlc_tables(conn)
 
 def setup_database(db_path='backend/StockBroker.db'):
     """Führt alle Funktionen zur Erstellung der Tabellen aus."""
@@ -138,13 +391,8 @@ def setup_database(db_path='backend/StockBroker.db'):
         conn = sqlite3.connect(db_path)
         print(f"Datenbankverbindung zu '{db_path}' hergestellt.")
         
-        create_all_users_table(conn)
-        create_settings_table(conn)
-        create_orders_table(conn)
-        create_secure_tokens_table(conn)
-        create_stock_depot_table(conn)
-        create_leaderboard_table(conn)
-        create_cached_charts_table(conn)
+        create_all_tables(conn)
+        conn.execute("PRAGMA optimize;")  # Statistiken für die neuen Indizes aktualisieren
         
         conn.commit()
         print("Datenbank-Setup erfolgreich abgeschlossen.")
@@ -1,30 +1,27 @@
-# gunicorn.conf.py (KORRIGIERTE VERSION)
+# gunicorn.conf.py
 """
 Dieses Skript sorgt dafür, dass der gunicorn-Server Prozesse ausführt, die an die Uhrzeit geknüpft sind.
+Der Scheduler läuft dabei in genau EINEM Prozess: nur der Worker, der die Scheduler-Sperre bekommt,
+startet ihn. Die anderen Worker versuchen es regelmäßig erneut und übernehmen, sobald die Sperre frei wird
+(Worker gestorben, Reload mit HUP). Läuft der Scheduler bereits eigenständig (python -m backend.jobs),
+startet kein Worker einen, solange dieser Prozess läuft.
 """
-from apscheduler.schedulers.background import BackgroundScheduler
-from backend.jobs import scheduled_order_processing_job
-from backend.jobs import scheduled_leaderboard_processing_job
-from backend.jobs import scheduled_daily_processing_job
+from backend.jobs import create_scheduler, start_scheduler_when_leader
 
 # 1. Erstellen und konfigurieren Sie den Scheduler im globalen Bereich der Konfigurationsdatei.
 #    Starten Sie ihn hier aber NICHT.
-scheduler = BackgroundScheduler(daemon=True, timezone="Europe/Berlin")
-scheduler.add_job(scheduled_order_processing_job, 'cron', minute='*')  # Jede Minute
-scheduler.add_job(scheduled_daily_processing_job, 'cron', hour='5', minute='0')  # Um 5:00 Uhr
-scheduler.add_job(scheduled_leaderboard_processing_job, 'cron', minute='*/10')  # Wenn Minuten teilbar durch 10
+scheduler = create_scheduler()
 
 
 def post_fork(server, worker):
     """
     Dieser Hook wird in jedem Worker-Prozess aufgerufen, NACHDEM er erstellt wurde.
-    Dies ist der sichere Ort, um den Scheduler zu starten.
+    Nur der Worker, der die Sperre bekommt, startet den Scheduler. Die anderen versuchen es im
+    Hintergrund weiter und starten ihn, sobald der bisherige Prozess die Sperre freigibt.
     """
-    # 2. Starten Sie den Scheduler erst HIER, innerhalb des Worker-Prozesses.
-    #    Jeder Worker erhält so seinen eigenen, sauberen Scheduler-Thread.
-    scheduler.start()
-    worker.log.info("APScheduler wurde erfolgreich im Worker (PID: %s) gestartet.", worker.pid)
+    def log_started():
+        worker.log.info("APScheduler wurde erfolgreich im Worker (PID: %s) gestartet.", worker.pid)
 
-# Der 'when_ready' Hook wird für den Scheduler nicht mehr benötigt und sollte entfernt werden.
-# def when_ready(server):
-#    ... (dieser Teil ist falsch und sollte gelöscht werden)
\ No newline at end of file
+    if not start_scheduler_when_leader(scheduler, on_start=log_started):
+        worker.log.info("APScheduler läuft bereits in einem anderen Prozess (Worker PID: %s), "
+                        "versuche es später erneut.", worker.pid)
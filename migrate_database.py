@@ -2,7 +2,7 @@
 import sqlite3
 import os
 import datetime
-from database_setup import setup_database
+from database_setup import setup_database, create_leaderboard_latest_table
 
 # Definiere die Pfade
 DB_FOLDER = 'backend'
@@ -48,8 +48,12 @@ def migrate_data():
 
         # Liste der Tabellen, die migriert werden sollen (sqlite_sequence wird ignoriert)
         tables_to_migrate = [
-            'all_users', 'settings', 'orders', 'secure_tokens',
-            'stock_depot', 'leaderboard' # 'cached_charts' wird bewusst ausgelassen
+            'all_users', 'settings', 'orders', 'order_queue', 'secure_tokens',
+            'stock_depot', 'leaderboard' # Caches ('cached_chart_data', 'cached_fragments', 'quotes', 'ticker_validity',
+                                         # 'fundamentals', 'ohlc_bars', 'ohlc_meta') und die kurzlebigen
+                                         # 'user_events' werden bewusst ausgelassen,
+                                         # 'leaderboard_latest' wird aus 'leaderboard' neu aufgebaut,
+                                         # 'symbols' wird per CSV-Import (backend/symbol_index.py) neu befüllt
         ]
 
         for table_name in tables_to_migrate:
@@ -80,6 +84,9 @@ def migrate_data():
                 # aber das Skript versucht, mit der nächsten Tabelle fortzufahren.
                 new_conn.rollback()
 
+        # Abgeleitete Tabellen aus den migrierten Daten neu aufbauen
+        create_leaderboard_latest_table(new_conn)
+
         # Änderungen committen und Verbindungen schließen
         new_conn.commit()
         old_conn.close()
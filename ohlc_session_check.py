@@ -0,0 +1,81 @@
+"""
+Prüft, dass OhlcStore '5d' als fünf Handelstage liest und nicht als fünf Kalendertage.
+Eine Anfrage am Montag muss die Kerzen von Dienstag bis Freitag der Vorwoche und vom Montag enthalten,
+auch nachdem am Dienstag neue Kerzen dazugekommen sind. yfinance wird dabei durch erfundene
+5-Minuten-Kerzen ersetzt, die Datenbank liegt im Speicher.
+Das Skript schlägt fehl (Exit-Code 1), wenn eine Prüfung nicht stimmt.
+
+Aufruf:  python ohlc_session_check.py
+"""
+import sqlite3
+import sys
+from contextlib import redirect_stdout
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+
+import pandas as pd
+
+from backend import ohlc_store
+from backend.ohlc_store import OhlcStore
+from database_setup import create_all_tables
+
+EXCHANGE_TZ = 'America/New_York'
+TICKER = 'TEST'
+
+
+def session_bars(days: list[date]) -> pd.DataFrame:
+    """5-Minuten-Kerzen von 9:30 bis 16:00 Uhr Börsenzeit für die übergebenen Tage."""
+    index = pd.DatetimeIndex([
+        ts for day in days
+        for ts in pd.date_range(datetime.combine(day, time(9, 30)), datetime.combine(day, time(15, 55)),
+                                freq='5min', tz=EXCHANGE_TZ)
+    ])
+    return pd.DataFrame({'Open': 100.0, 'High': 101.0, 'Low': 99.0, 'Close': 100.5, 'Volume': 1000}, index=index)
+
+
+def check() -> int:
+    today = date.today()
+    monday = today - timedelta(days=today.weekday())
+    # Fünf Handelstage, wie yfinance sie am Montag für period='5d' liefert: Di-Fr der Vorwoche und Montag
+    monday_sessions = [monday - timedelta(days=d) for d in (6, 5, 4, 3)] + [monday]
+    tuesday = monday + timedelta(days=1)
+    available = session_bars(monday_sessions + [tuesday])
+
+    def fake_download(ticker, period=None, start=None, interval=None):
+        if start is not None:
+            return available[available.index >= pd.Timestamp(start)]
+        return session_bars(monday_sessions)
+
+    ohlc_store._download_history = fake_download
+
+    conn = sqlite3.connect(":memory:")
+    with redirect_stdout(StringIO()):  # die Erfolgsmeldungen von database_setup unterdrücken
+        create_all_tables(conn)
+
+    problems = 0
+
+    def expect(label: str, frame: pd.DataFrame, expected_days: list[date]):
+        nonlocal problems
+        days = sorted(set(frame.index.date))
+        if days == expected_days:
+            print(f"OK       {label}: {len(days)} Handelstage ({days[0]} bis {days[-1]})")
+        else:
+            print(f"FEHLER   {label}: erwartet {expected_days}, erhalten {days}")
+            problems += 1
+
+    expect("Montag, erster Abruf", OhlcStore.get_history(conn, TICKER, period='5d', interval='5m'), monday_sessions)
+    expect("Montag, aus der Datenbank", OhlcStore.get_history(conn, TICKER, period='5d', interval='5m'),
+           monday_sessions)
+    expect("Montag, period='1d'", OhlcStore.get_history(conn, TICKER, period='1d', interval='5m'), [monday])
+
+    # Am Dienstag ist der Stand veraltet, es kommen nur die neuen Kerzen dazu
+    conn.execute("UPDATE ohlc_meta SET last_fetch = 0 WHERE ticker = ?", (TICKER,))
+    expect("Dienstag, nach dem Nachladen", OhlcStore.get_history(conn, TICKER, period='5d', interval='5m'),
+           monday_sessions[1:] + [tuesday])
+
+    print(f"{problems} Problem(e).")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(check())
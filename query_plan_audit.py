@@ -0,0 +1,110 @@
+"""
+Prüft alle SQL-Befehle in app.py und den backend-Modulen mit EXPLAIN QUERY PLAN.
+Die Befehle werden direkt aus dem Quelltext gelesen (ast), gegen eine leere In-Memory-Datenbank
+mit dem Schema aus database_setup.py geplant und das Skript schlägt fehl (Exit-Code 1), wenn
+einer davon eine Tabelle komplett durchläuft. Das ist jede SCAN-Zeile, auch 'SCAN t USING (COVERING) INDEX':
+dabei wird der ganze Index gelesen. Gezielte Zugriffe (auch Bereiche wie 'col > ?') erscheinen als SEARCH.
+Ausgenommen sind nur FTS5-Abfragen (SCAN ... VIRTUAL TABLE INDEX), die über den Volltextindex laufen.
+
+Aufruf:  python query_plan_audit.py
+"""
+import ast
+import re
+import sqlite3
+import sys
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+from database_setup import create_all_tables
+
+ROOT_DIR = Path(__file__).parent
+SOURCE_FILES = [ROOT_DIR / "app.py", *sorted((ROOT_DIR / "backend").glob("*.py"))]
+SKIPPED_MODULES = {"sql_tests.py"}  # alte Testdatei mit anderem Schema
+
+SQL_START = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH|REPLACE)\b", re.IGNORECASE)
+FULL_SCAN = re.compile(r"^SCAN (\w+)\b(?!.*VIRTUAL TABLE INDEX)")
+
+# Befehle, die bewusst alle Zeilen lesen. Schlüssel: (Modul, Funktion)
+ALLOWED_FULL_SCANS = {
+    ("depot_system.py", "get_most_popular_stocks"): "Aggregat über alle Depots, läuft nur für die Such-Widgets",
+    ("leaderboard.py", "insert_all_current_net_worths"): "Batch-Job liest alle Depots und Kontostände auf einmal",
+    ("accounts_to_database.py", "delete_unverified_users"): "Täglicher Aufräum-Job",
+    ("accounts_to_database.py", "get_all_users_data"): "unused",
+    ("ohlc_store.py", "prune"): "Täglicher Aufräum-Job über alle Ticker",
+    ("symbol_index.py", "_search_like"): "Nur ohne FTS5, Teilstring-Suche im Namen braucht alle Zeilen",
+    ("accounts_to_database.py", "get_all_user_ids"): "unused (nur von get_leaderboard, ebenfalls unused)",
+    ("leaderboard.py", "get_all_user_ids"): "unused",
+    ("leaderboard.py", "get_paginated_leaderboard"): "Läuft den Index auf net_worth in Sortierreihenfolge ab und "
+                                                      "hört nach OFFSET + LIMIT Zeilen auf",
+    ("leaderboard.py", "count_users"): "COUNT(*) über den schmalsten Index, eine Zeile pro Benutzer, "
+                                       "für die Seitenzahl des Leaderboards",
+    ("leaderboard.py", "fetch_and_group_leaderboard"): "Täglicher Ausdünnungs-Job über die ganze Historie",
+    ("leaderboard.py", "decimate_entries"): "Täglicher Ausdünnungs-Job über die ganze Historie",
+    ("app.py", "update_stock_fragments_cache"): "Täglicher Aufräum-Job",
+}
+
+
+def collect_statements(path: Path) -> list[tuple[int, str, str]]:
+    """Gibt (zeile, funktion, sql) für alle SQL-Strings in einer Datei zurück."""
+    tree = ast.parse(path.read_text(encoding="utf-8"))
+    statements = []
+
+    def visit(node, function_name):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            function_name = node.name
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            sql = node.value
+        elif isinstance(node, ast.JoinedStr):
+            # f-Strings: eingesetzte Werte sind Platzhalter-Listen wie '?, ?, ?' -> durch '?' ersetzen
+            sql = "".join(part.value if isinstance(part, ast.Constant) else "?" for part in node.values)
+        else:
+            sql = None
+        if sql is not None and SQL_START.match(sql):
+            statements.append((node.lineno, function_name, sql))
+            return
+        for child in ast.iter_child_nodes(node):
+            visit(child, function_name)
+
+    visit(tree, "<modul>")
+    return statements
+
+
+def audit() -> int:
+    conn = sqlite3.connect(":memory:")
+    with redirect_stdout(StringIO()):  # die Erfolgsmeldungen von database_setup unterdrücken
+        create_all_tables(conn)
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+    problems = 0
+    checked = 0
+    for path in SOURCE_FILES:
+        if path.name in SKIPPED_MODULES:
+            continue
+        for lineno, function_name, sql in collect_statements(path):
+            location = f"{path.name}:{lineno} ({function_name})"
+            try:
+                plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", [None] * sql.count("?")).fetchall()
+            except sqlite3.Error as e:
+                print(f"FEHLER   {location}: {e}")
+                problems += 1
+                continue
+            checked += 1
+
+            scanned = [m.group(1) for m in (FULL_SCAN.match(row[3]) for row in plan) if m and m.group(1) in tables]
+            if not scanned:
+                continue
+            reason = ALLOWED_FULL_SCANS.get((path.name, function_name))
+            if reason:
+                print(f"ERLAUBT  {location}: SCAN {', '.join(scanned)} -> {reason}")
+            else:
+                print(f"SCAN     {location}: {', '.join(scanned)}")
+                print("         " + " ".join(sql.split()))
+                problems += 1
+
+    print(f"{checked} Befehle geprüft, {problems} Problem(e).")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(audit())
@@ -0,0 +1,179 @@
+// static/js/charts.js
+// Gemeinsames Zeichnen der Charts im Browser (Plotly).
+// Der Server schickt nur die Datenreihen (siehe backend/chart_data.py): spaltenweise als
+// base64-kodierte little-endian Arrays. Farben und Dark/Light-Mode werden hier festgelegt.
+
+const StockCharts = (function () {
+
+    const INTERVAL_DISPLAY = {
+        "1m": "1 Min", "2m": "2 Min", "5m": "5 Min", "15m": "15 Min",
+        "30m": "30 Min", "60m": "1 Std", "1h": "1 Std", "90m": "90 Min",
+        "1d": "Täglich", "1wk": "Wöchentlich", "1mo": "Monatlich", "3mo": "Quartalsweise"
+    };
+    const DAILY_INTERVALS = ["1d", "1wk", "1mo", "3mo"];
+
+    // Kodierte Spalte -> Float32Array / Float64Array
+    function decode(base64, type) {
+        const binary = atob(base64);
+        const bytes = new Uint8Array(binary.length);
+        for (let i = 0; i < binary.length; i++) bytes[i] = binary.charCodeAt(i);
+        return type === 'float32' ? new Float32Array(bytes.buffer) : new Float64Array(bytes.buffer);
+    }
+
+    // Sekunden (Wanduhrzeit) -> Datumsstrings ohne Zeitzone, so zeigt Plotly genau diese Uhrzeit an
+    function toDates(seconds) {
+        return Array.from(seconds, s => new Date(s * 1000).toISOString().slice(0, 19));
+    }
+
+    function isDarkMode() {
+        return document.body.classList.contains('dark-mode');
+    }
+
+    function theme() {
+        const dark = isDarkMode();
+        return {
+            font: dark ? '#cdd3da' : '#1c1e21',
+            grid: dark ? 'rgba(255, 255, 255, 0.1)' : 'rgba(0, 0, 0, 0.1)',
+            increasing: '#1a8754',
+            decreasing: dark ? '#FF4136' : '#dc3545'
+        };
+    }
+
+    function showMessage(element, message) {
+        element.innerHTML = '';
+        const p = document.createElement('p');
+        p.className = 'chart-message';
+        p.style.cssText = 'text-align:center; padding:15px; border-radius:4px;';
+        p.textContent = message;
+        element.appendChild(p);
+    }
+
+    // Candlestick-Chart. options: removeGaps, widget (ohne Titel/Achsen, statisch), height, margin
+    function renderCandlestick(element, data, options = {}) {
+        const colors = theme();
+        const widget = !!options.widget;
+        const x = toDates(decode(data.t, 'float64'));
+
+        const trace = {
+            type: 'candlestick', x: x, name: data.ticker,
+            open: decode(data.o, 'float32'), high: decode(data.h, 'float32'),
+            low: decode(data.l, 'float32'), close: decode(data.c, 'float32'),
+            increasing: { line: { color: colors.increasing } },
+            decreasing: { line: { color: colors.decreasing } }
+        };
+
+        let intervalDisplay = INTERVAL_DISPLAY[data.interval] || data.interval;
+        if (data.bucket > 1) intervalDisplay += ` (je ${data.bucket} Kerzen zusammengefasst)`;
+        const title = widget ? '' :
+            `Kurs: ${data.name} (${data.ticker})<br><span style="font-size:0.8em;">Zeitraum: ${data.period_display}, Auflösung: ${intervalDisplay}</span>`;
+
+        const xaxis = { gridcolor: colors.grid, linecolor: colors.grid, zeroline: false,
+                        showticklabels: !widget, rangeslider: { visible: false },
+                        title: { text: widget ? '' : 'Datum / Uhrzeit' } };
+        if (options.removeGaps) {
+            xaxis.rangebreaks = DAILY_INTERVALS.includes(data.interval)
+                ? [{ bounds: ["sat", "mon"] }]
+                : [{ bounds: ["sat", "mon"] }, { pattern: "hour", bounds: [16, 9.5] }];
+        }
+
+        const margin = options.margin || (widget ? { l: 0, r: 30, t: 5, b: 5 } : { l: 50, r: 20, t: 80, b: 50 });
+        const layout = {
+            title: { text: title },
+            margin: margin,
+            paper_bgcolor: 'rgba(0,0,0,0)', plot_bgcolor: 'rgba(0,0,0,0)',
+            font: { color: colors.font },
+            xaxis: xaxis,
+            yaxis: { gridcolor: colors.grid, linecolor: colors.grid, zeroline: false, showticklabels: true,
+                     automargin: widget, title: { text: widget ? '' : 'Preis' } },
+            showlegend: false
+        };
+        if (options.height) layout.height = options.height;
+
+        element.innerHTML = '';
+        Plotly.newPlot(element, [trace], layout, { displayModeBar: false, staticPlot: widget, responsive: true });
+    }
+
+    // Depot-Verlauf: Wert in € links, Veränderung in % rechts
+    function renderPortfolio(element, data, options = {}) {
+        const dark = isDarkMode();
+        const times = decode(data.t, 'float64');
+        const values = Array.from(decode(data.y, 'float64'));
+        const x = toDates(times);
+        const start = values[0];
+        const percent = values.map(v => start !== 0 ? ((v / start) - 1) * 100 : 0);
+        const isGain = values[values.length - 1] > start;
+
+        const fontColor = dark ? '#D3D3D3' : '#444';
+        const gridColor = dark ? 'rgba(255, 255, 255, 0.1)' : 'rgba(230, 230, 230, 0.7)';
+        const lineColor = isGain ? '#1a8754' : (dark ? '#FF4136' : '#dc3545');
+        const tickLabel = (iso) => new Date(iso + 'Z').toLocaleDateString('de-DE', { day: '2-digit', month: 'short', timeZone: 'UTC' });
+
+        const traces = [
+            { x: x, y: values, mode: 'lines', line: { color: lineColor, width: options.lineWidth || 4 },
+              hoverinfo: 'y+x', name: 'Depotwert' },
+            // Unsichtbare Linie nur für die Prozent-Achse rechts
+            { x: x, y: percent, yaxis: 'y2', mode: 'lines', line: { width: 0 }, hoverinfo: 'skip' }
+        ];
+        const layout = {
+            height: options.height || 250,
+            margin: { l: 50, r: 45, t: 5, b: 20 },
+            paper_bgcolor: 'rgba(0,0,0,0)', plot_bgcolor: 'rgba(0,0,0,0)',
+            font: { color: fontColor },
+            showlegend: false,
+            xaxis: { showgrid: false, zeroline: false, fixedrange: true,
+                     tickvals: [x[0], x[x.length - 1]], ticktext: [tickLabel(x[0]), tickLabel(x[x.length - 1])] },
+            yaxis: { tickprefix: '€', gridcolor: gridColor, zeroline: false, fixedrange: true },
+            yaxis2: { overlaying: 'y', side: 'right', showgrid: false, ticksuffix: '%',
+                      tickfont: { color: fontColor }, zeroline: false, fixedrange: true, showticklabels: true },
+            hovermode: 'x unified'
+        };
+
+        element.innerHTML = '';
+        Plotly.newPlot(element, traces, layout, { displayModeBar: false, responsive: true });
+    }
+
+    // Lädt die Kursdaten von /api/chart/... und zeichnet den Candlestick-Chart.
+    // Die Breite wird mitgeschickt, damit der Server nicht mehr Kerzen liefert als darstellbar sind.
+    function loadCandlestick(element, url, options = {}) {
+        showMessage(element, 'Chart wird geladen...');
+        const width = Math.round(element.clientWidth || window.innerWidth);
+        return fetch(url + (url.includes('?') ? '&' : '?') + 'width=' + width)
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) {
+                    showMessage(element, data.message || 'Chart konnte nicht geladen werden.');
+                    return null;
+                }
+                renderCandlestick(element, data, options);
+                return data;
+            })
+            .catch(error => {
+                console.error('Fehler beim Laden des Charts:', error);
+                showMessage(element, 'Chart konnte nicht geladen werden (Netzwerkfehler).');
+                return null;
+            });
+    }
+
+    // Lädt den Depot-Verlauf von /api/portfolio-history, ebenfalls mit der Breite des Graphen.
+    function loadPortfolio(element, url, options = {}) {
+        showMessage(element, 'Verlauf wird geladen...');
+        const width = Math.round(element.clientWidth || window.innerWidth);
+        return fetch(url + (url.includes('?') ? '&' : '?') + 'width=' + width)
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) {
+                    showMessage(element, data.message || 'Verlauf konnte nicht geladen werden.');
+                    return null;
+                }
+                renderPortfolio(element, data, options);
+                return data;
+            })
+            .catch(error => {
+                console.error('Fehler beim Laden des Depot-Verlaufs:', error);
+                showMessage(element, 'Verlauf konnte nicht geladen werden (Netzwerkfehler).');
+                return null;
+            });
+    }
+
+    return { decode, renderCandlestick, renderPortfolio, loadCandlestick, loadPortfolio };
+})();
@@ -0,0 +1,66 @@
+// static/js/live_quotes.js
+// Live-Kurse über Socket.IO (Namespace /live, siehe backend/quote_broadcaster.py).
+// Elemente mit data-live-quote="TICKER" bekommen den neuen Kurs automatisch als Text.
+// Für alles andere (Wert, Gewinn, ...) können Seiten mit LiveQuotes.onQuote(callback) mitlesen.
+// Der Server nimmt die Verbindung nur mit Login an und meldet nur bekannte Ticker an.
+// Über dieselbe Verbindung kommen die Push-Nachrichten des Benutzers
+// (order_filled, depot_changed, siehe backend/user_events.py), abonnierbar mit LiveQuotes.on(name, callback).
+
+const LiveQuotes = (function () {
+
+    let socket = null;
+    const tickers = new Set();
+    const callbacks = [];
+
+    function formatEuro(value) {
+        return '€' + value.toLocaleString('en-US', { minimumFractionDigits: 2, maximumFractionDigits: 2 });
+    }
+
+    function applyQuote(ticker, price, previous) {
+        document.querySelectorAll(`[data-live-quote="${ticker}"]`).forEach(element => {
+            element.textContent = formatEuro(price);
+            if (previous !== null && previous !== undefined && previous !== price) {
+                // Kurz grün/rot aufleuchten lassen
+                element.style.transition = 'color 0.3s';
+                element.style.color = price > previous ? '#198754' : '#dc3545';
+                setTimeout(() => { element.style.color = ''; }, 1500);
+            }
+        });
+        callbacks.forEach(callback => callback(ticker, price, previous));
+    }
+
+    function sendSubscribe() {
+        if (!tickers.size) return;
+        socket.emit('subscribe', { tickers: Array.from(tickers) }, response => {
+            if (!response) return;
+            Object.entries(response.prices || {}).forEach(([ticker, price]) => applyQuote(ticker, price, null));
+        });
+    }
+
+    function connect() {
+        if (socket) return socket;
+        socket = io('/live');
+        // Nach einem Verbindungsabbruch sind die Räume auf dem Server weg -> neu anmelden
+        socket.on('connect', sendSubscribe);
+        socket.on('quote', data => applyQuote(data.ticker, data.price, data.previous));
+        return socket;
+    }
+
+    // Meldet Ticker an. Ohne Angabe werden alle data-live-quote-Elemente der Seite verwendet.
+    function subscribe(list) {
+        const wanted = list || Array.from(document.querySelectorAll('[data-live-quote]'), el => el.dataset.liveQuote);
+        wanted.forEach(ticker => tickers.add(ticker.toUpperCase()));
+        if (socket && socket.connected) sendSubscribe();
+        else connect();
+    }
+
+    function onQuote(callback) {
+        callbacks.push(callback);
+    }
+
+    function on(eventName, callback) {
+        connect().on(eventName, callback);
+    }
+
+    return { subscribe, onQuote, on, connect, formatEuro };
+})();